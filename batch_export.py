@@ -0,0 +1,180 @@
+# batch_export.py – grupni izvoz predračuna i narudžbina u PDF, paralelno na više jezgara
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from database import date_value_key
+from lazy_imports import module_available
+
+# pypdf se uvozi tek pri spajanju u jedan PDF
+PYPDF_AVAILABLE = module_available('pypdf')
+
+# Vrsta dokumenta -> (metoda PDFGenerator-a, metoda Database za izbor po periodu)
+DOCUMENT_KINDS = {
+    'proforma': ('generate_proforma_pdf', 'get_proforma_ids_by_date'),
+    'order': ('generate_order_pdf', 'get_order_ids_by_date'),
+}
+
+OUTPUT_MODES = ('folder', 'zip', 'merged')
+
+# PDFGenerator jednog procesa iz pool-a (svaki proces ima svoju konekciju ka bazi, samo za čitanje)
+_worker_generator = None
+
+
+def _init_worker(db_path):
+    global _worker_generator
+    from database import Database
+    from pdf_generator import PDFGenerator
+    _worker_generator = PDFGenerator(Database.open_read_only(db_path))
+
+
+def _render_document(kind, document_id, output_dir):
+    method = getattr(_worker_generator, DOCUMENT_KINDS[kind][0])
+    return method(document_id, output_dir=output_dir)
+
+
+def get_document_ids(db, kind, date_from, date_to, include_archived=False):
+    """ID-jevi dokumenata u periodu ('dd.mm.yyyy')"""
+    return getattr(db, DOCUMENT_KINDS[kind][1])(date_from, date_to, include_archived)
+
+
+def export_documents(db_path, kind, document_ids, output, mode='folder', workers=None, progress_callback=None):
+    """Generiše PDF za svaki dokument u ProcessPoolExecutor-u.
+
+    mode: 'folder' (output je folder), 'zip' (output je .zip) ili 'merged'
+    (output je jedan .pdf, potreban je paket pypdf).
+    progress_callback(urađeno, ukupno) se zove posle svakog dokumenta; izuzetak
+    iz njega (npr. otkazivanje) prekida izvoz i otkazuje preostale dokumente.
+
+    Vraća dict sa output, files, failed [(id, greška)], count, elapsed i docs_per_sec.
+    """
+    if kind not in DOCUMENT_KINDS:
+        raise ValueError(f"Nepoznata vrsta dokumenta: {kind}")
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Nepoznat način izvoza: {mode}")
+    if mode == 'merged' and not PYPDF_AVAILABLE:
+        raise ImportError("Za spajanje u jedan PDF potreban je paket pypdf.\n\nInstalirajte: pip install pypdf")
+
+    document_ids = list(document_ids)
+    render_dir = output if mode == 'folder' else tempfile.mkdtemp(prefix='pdf_izvoz_')
+    os.makedirs(render_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    files = {}
+    failed = []
+    try:
+        if document_ids:
+            max_workers = min(workers or os.cpu_count() or 1, len(document_ids))
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(os.path.abspath(db_path),)) as executor:
+                futures = {
+                    executor.submit(_render_document, kind, document_id, render_dir): document_id
+                    for document_id in document_ids
+                }
+                try:
+                    for done, future in enumerate(as_completed(futures), 1):
+                        document_id = futures[future]
+                        try:
+                            filename = future.result()
+                        except Exception as e:
+                            failed.append((document_id, str(e)))
+                        else:
+                            if filename:
+                                files[document_id] = filename
+                            else:
+                                failed.append((document_id, "PDF nije kreiran"))
+                        if progress_callback:
+                            progress_callback(done, len(document_ids))
+                except BaseException:
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+
+        # Redosled izlaza prati redosled ulaznih ID-jeva, ne redosled završavanja
+        ordered = [files[document_id] for document_id in document_ids if document_id in files]
+
+        if mode == 'zip':
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for filename in ordered:
+                    archive.write(filename, os.path.basename(filename))
+            ordered = [output]
+        elif mode == 'merged':
+            from pypdf import PdfWriter
+            writer = PdfWriter()
+            for filename in ordered:
+                writer.append(filename)
+            with open(output, 'wb') as f:
+                writer.write(f)
+            ordered = [output]
+    finally:
+        if mode != 'folder':
+            shutil.rmtree(render_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    count = len(files)
+    return {
+        'output': output,
+        'files': ordered,
+        'failed': failed,
+        'count': count,
+        'elapsed': elapsed,
+        'docs_per_sec': count / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def default_output(kind, mode, date_from=None, date_to=None):
+    """Podrazumevano ime izlaza, npr. predracuni_20260101-20260131.zip"""
+    prefix = 'predracuni' if kind == 'proforma' else 'narudzbine'
+    if date_from and date_to:
+        suffix = f"{date_value_key(date_from)}-{date_value_key(date_to)}"
+    else:
+        suffix = datetime.now().strftime('%Y%m%d_%H%M%S')
+    extension = {'folder': '', 'zip': '.zip', 'merged': '.pdf'}[mode]
+    return f"{prefix}_{suffix}{extension}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grupni izvoz predračuna ili narudžbina u PDF (npr. na kraju meseca).")
+    parser.add_argument('kind', choices=sorted(DOCUMENT_KINDS), help="vrsta dokumenata")
+    parser.add_argument('--od', dest='date_from', help="početni datum (dd.mm.yyyy)")
+    parser.add_argument('--do', dest='date_to', help="krajnji datum (dd.mm.yyyy)")
+    parser.add_argument('--ids', type=int, nargs='+', help="ID-jevi dokumenata (umesto perioda)")
+    parser.add_argument('--arhiva', action='store_true', help="uključi i arhivirane dokumente")
+    parser.add_argument('--nacin', dest='mode', choices=OUTPUT_MODES, default='zip', help="folder, zip ili jedan spojen PDF (merged)")
+    parser.add_argument('--izlaz', dest='output', help="putanja izlaznog foldera/fajla")
+    parser.add_argument('--procesi', dest='workers', type=int, help="broj procesa (podrazumevano broj jezgara)")
+    parser.add_argument('--baza', dest='db_path', default='invoices.db', help="putanja do baze")
+    args = parser.parse_args(argv)
+    if args.mode == 'merged' and not PYPDF_AVAILABLE:
+        parser.error("za --nacin merged potreban je paket pypdf (pip install pypdf)")
+
+    if args.ids:
+        document_ids = args.ids
+    elif args.date_from and args.date_to:
+        from database import Database
+        db = Database.open_read_only(args.db_path)
+        document_ids = get_document_ids(db, args.kind, args.date_from, args.date_to, args.arhiva)
+        db.conn.close()
+    else:
+        parser.error("zadajte --ids ili period --od i --do")
+
+    output = args.output or default_output(args.kind, args.mode, args.date_from, args.date_to)
+
+    def report(done, total):
+        print(f"\r{done}/{total}", end='', flush=True)
+
+    result = export_documents(args.db_path, args.kind, document_ids, output, args.mode, args.workers, report)
+    print()
+    for document_id, error in result['failed']:
+        print(f"✗ Dokument {document_id}: {error}")
+    print(f"✓ {result['count']} dokumenata za {result['elapsed']:.1f} s "
+          f"({result['docs_per_sec']:.1f} dok/s) -> {result['output']}")
+    return 0 if not result['failed'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
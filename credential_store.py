@@ -0,0 +1,35 @@
+# credential_store.py – lozinke (npr. SMTP) u skladištu operativnog sistema (keyring: Windows Credential Manager)
+from lazy_imports import module_available
+
+SERVICE = "Evidencija Placanja Zaduzenja"
+
+# keyring se uvozi tek pri prvom čitanju/upisu lozinke
+KEYRING_AVAILABLE = module_available('keyring')
+
+
+def set_secret(name, value):
+    """Upisuje lozinku u skladište sistema (prazna vrednost je briše); False ako skladište nije dostupno"""
+    if not KEYRING_AVAILABLE:
+        return False
+    try:
+        import keyring
+        if value:
+            keyring.set_password(SERVICE, name, value)
+        elif keyring.get_password(SERVICE, name) is not None:
+            keyring.delete_password(SERVICE, name)
+        return True
+    except Exception as e:
+        print(f"Lozinka '{name}' nije upisana u skladište sistema: {e}")
+        return False
+
+
+def get_secret(name):
+    """Lozinka iz skladišta sistema ili None"""
+    if not KEYRING_AVAILABLE:
+        return None
+    try:
+        import keyring
+        return keyring.get_password(SERVICE, name)
+    except Exception as e:
+        print(f"Lozinka '{name}' nije pročitana iz skladišta sistema: {e}")
+        return None
@@ -2,16 +2,66 @@ import sqlite3
 from datetime import datetime, timedelta
 import os
 import shutil
+from pathlib import Path
+
+import credential_store
+from lookup_cache import lookup_cache
+from scheduler import DATETIME_FORMAT, job_scheduler
+
+
+def date_key(column):
+    """SQL izraz koji 'dd.mm.yyyy' kolonu pretvara u 'yyyymmdd' (može da se poredi i indeksira)"""
+    return f"(substr({column}, 7, 4) || substr({column}, 4, 2) || substr({column}, 1, 2))"
+
+
+def date_value_key(value):
+    """Isto što i date_key, za vrednost u Python-u ('dd.mm.yyyy' -> 'yyyymmdd')"""
+    return value[6:10] + value[3:5] + value[:2]
+
+
+DUE_DATE_KEY = date_key('due_date')
+
+# Stepen roka računa za obaveštenja (veći broj = hitnije)
+DUE_BUCKET_UPCOMING = 1
+DUE_BUCKET_URGENT = 2
+DUE_BUCKET_OVERDUE = 3
 
 
 class Database:
+    # Kolone stavki koje dolaze iz dijaloga: (kolona, podrazumevana vrednost)
+    PROFORMA_ITEM_COLUMNS = (
+        ('article_id', None), ('article_name', ''), ('article_code', ''), ('quantity', 0),
+        ('unit', 'kom'), ('price', 0), ('discount', 0), ('total', 0),
+    )
+    ORDER_ITEM_COLUMNS = (
+        ('article_id', None), ('article_code', ''), ('article_name', ''), ('quantity', 0),
+        ('unit', 'kom'), ('notes', ''),
+    )
+    # Vrsta dokumenta za slanje: (tabela dokumenata, kolona broja, tabela partnera sa email-om, kolona veze)
+    DISPATCH_TARGETS = {
+        'proforma': ('proforma_invoices', 'proforma_number', 'customers', 'customer_id'),
+        'order': ('orders', 'order_number', 'vendors', 'vendor_id'),
+    }
+    # Održavanje: ANALYZE tabele kad se broj redova promeni za više od ANALYZE_CHANGE_RATIO,
+    # incremental_vacuum po VACUUM_PAGES stranica u jednom koraku
+    ANALYZE_CHANGE_RATIO = 0.1
+    ANALYZE_LIMIT = 1000
+    VACUUM_PAGES = 256
+    # Lozinke iz podešavanja: čuvaju se u skladištu sistema (credential_store), u bazi je samo oznaka;
+    # ako skladište nije dostupno, ostaju u bazi, ali se brišu iz backup kopija
+    SECRET_SETTINGS = ('smtp_password',)
+    SECRET_IN_STORE = '@keyring'
+
     def __init__(self, db_name='invoices.db'):
         self.db_name = db_name
         self.conn = None
+        self._settings_cache = {}  # keš get_settings ('settings'), poništava se pri upisu; deli se sa worker_connection
         self.connect()
+        self._ensure_incremental_vacuum()
         self.create_tables()
         self._ensure_all_columns()
         self._ensure_vendor_codes()
+        self._migrate_secrets()
         
         self.migrate_add_is_paid_to_items()
         
@@ -46,6 +96,47 @@ class Database:
             print(f"Database connection error: {e}")
             raise
     
+    def _ensure_incremental_vacuum(self):
+        """Migracija: auto_vacuum=INCREMENTAL, da održavanje može da vrati slobodne stranice fajlu.
+
+        Nova baza ga dobija odmah. Postojećoj se podešavanje samo upisuje, a važi
+        posle jednokratnog VACUUM-a (convert_to_incremental_vacuum, u pozadinskoj
+        niti kad program miruje), pa pokretanje ne čeka na prepakivanje velike baze.
+        """
+        cursor = self.conn.cursor()
+        if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
+    def worker_connection(self):
+        """Ista baza preko posebne konekcije, za pozadinske niti (planer, slanje, čitanje tabova).
+
+        Svaka nit koja upisuje ima svoju konekciju, pa commit iz pozadine ne može
+        da završi transakciju koju je Tk nit započela (npr. pay_invoices_remaining).
+        Migracije se ne ponavljaju, a keš podešavanja je zajednički. Konekciju
+        zatvara pozivalac (worker.conn.close()).
+        """
+        worker = object.__new__(Database)
+        worker.db_name = self.db_name
+        worker.conn = None
+        worker._settings_cache = self._settings_cache
+        worker.connect()
+        return worker
+
+    @classmethod
+    def open_read_only(cls, db_name='invoices.db'):
+        """Samo čitanje postojeće baze (procesi grupnog izvoza, CLI), bez migracija i ispisa.
+
+        Konekcija se otvara kao file:...?mode=ro, pa ne može ništa da upiše u bazu
+        koju pokrenut program drži otvorenu. Zatvara je pozivalac (db.conn.close()).
+        """
+        reader = object.__new__(cls)
+        reader.db_name = db_name
+        reader._settings_cache = {}
+        uri = Path(db_name).resolve().as_uri() + '?mode=ro'
+        reader.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        reader.conn.row_factory = sqlite3.Row
+        return reader
+    
     def create_tables(self):
         cursor = self.conn.cursor()
         
@@ -117,6 +208,7 @@ class Database:
                 registration_number TEXT,
                 address TEXT,
                 city TEXT,
+                email TEXT,
                 notes TEXT,
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP
             )
@@ -256,10 +348,70 @@ class Database:
             )
         ''')
 
+        # ==================== PLANER POSLOVA ====================
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                name TEXT PRIMARY KEY,
+                next_run TEXT,
+                last_run TEXT,
+                status TEXT,
+                last_error TEXT
+            )
+        ''')
+
+        # ==================== EMAIL OUTBOX ====================
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                html_body TEXT NOT NULL,
+                dedup_key TEXT UNIQUE,
+                digest_key TEXT,
+                status TEXT DEFAULT 'čeka',
+                attempts INTEGER DEFAULT 0,
+                next_attempt TEXT,
+                last_error TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                sent_at TEXT
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_pending ON email_outbox(next_attempt) WHERE status = 'čeka'")
+
+        # Već prijavljeni računi u dnevnom email-u: poslednji prijavljeni stepen roka
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notified_invoices (
+                invoice_id INTEGER PRIMARY KEY,
+                bucket INTEGER NOT NULL,
+                notified_at TEXT
+            )
+        ''')
+
+        # ==================== SLANJE DOKUMENATA ====================
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS document_dispatch (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                document_id INTEGER NOT NULL,
+                recipient TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                sent_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_dispatch_document ON document_dispatch(kind, document_id)')
+
         # Indeksi za performanse
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_vendor ON orders(vendor_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_date)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_payments_invoice ON payments(invoice_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_proforma_payments_proforma ON proforma_payments(proforma_id)')
+        # Parcijalni indeks: samo neplaćeni, nearhivirani računi po datumu valute
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_invoices_due_open ON invoices({DUE_DATE_KEY})
+            WHERE is_paid = 0 AND is_archived = 0
+        ''')
 
         self.conn.commit()
         print("All tables ensured.")
@@ -303,6 +455,12 @@ class Database:
         if 'checks' not in revenue_cols:
             cursor.execute("ALTER TABLE revenue_entries ADD COLUMN checks REAL DEFAULT 0")
         
+        # Proveri customers tabelu
+        cursor.execute("PRAGMA table_info(customers)")
+        customer_cols = [row['name'] for row in cursor.fetchall()]
+        if 'email' not in customer_cols:
+            cursor.execute("ALTER TABLE customers ADD COLUMN email TEXT")
+        
         self.conn.commit()
     
     def _ensure_vendor_codes(self):
@@ -493,7 +651,16 @@ class Database:
     def delete_payment(self, payment_id):
         """Briše uplatu"""
         cursor = self.conn.cursor()
+        cursor.execute('SELECT invoice_id FROM payments WHERE id = ?', (payment_id,))
+        row = cursor.fetchone()
         cursor.execute('DELETE FROM payments WHERE id = ?', (payment_id,))
+        if row:
+            # Račun koji više nije pokriven uplatama vraća se među otvorene (is_paid = 0)
+            cursor.execute('''
+                UPDATE invoices SET is_paid = 0, payment_date = NULL
+                WHERE id = ? AND is_paid = 1
+                AND amount > (SELECT COALESCE(SUM(payment_amount), 0) FROM payments WHERE invoice_id = ?)
+            ''', (row['invoice_id'], row['invoice_id']))
         self.conn.commit()
     
     def get_last_payment_date(self, invoice_id):
@@ -502,7 +669,246 @@ class Database:
         cursor.execute('SELECT payment_date FROM payments WHERE invoice_id = ? ORDER BY payment_date DESC LIMIT 1', (invoice_id,))
         row = cursor.fetchone()
         return row['payment_date'] if row else None
+
+    @staticmethod
+    def _invoice_summary_sql(invoice_where, payment_where=''):
+        """SELECT računa sa total_paid, remaining, payment_status i last_payment_date (jedan prolaz kroz uplate)"""
+        last_key = f"MAX({date_key('payment_date')})"
+        return f'''
+            SELECT i.*,
+                   COALESCE(p.total_paid, 0) AS total_paid,
+                   i.amount - COALESCE(p.total_paid, 0) AS remaining,
+                   CASE
+                       WHEN COALESCE(p.total_paid, 0) = 0 THEN 'Neplaćeno'
+                       WHEN p.total_paid >= i.amount THEN 'Plaćeno'
+                       ELSE 'Delimično'
+                   END AS payment_status,
+                   p.last_payment_date
+            FROM invoices i
+            LEFT JOIN (
+                SELECT invoice_id,
+                       SUM(payment_amount) AS total_paid,
+                       substr({last_key}, 7, 2) || '.' || substr({last_key}, 5, 2) || '.' || substr({last_key}, 1, 4)
+                           AS last_payment_date
+                FROM payments
+                {payment_where}
+                GROUP BY invoice_id
+            ) p ON p.invoice_id = i.id
+            WHERE {invoice_where}
+        '''
+    
+    def get_invoices_with_payment_summary(self, invoice_ids):
+        """Računi sa uplatama za izveštaj, jednim upitom po grupi od 500 ID-jeva.
+
+        Svaki red ima total_paid, remaining, payment_status i last_payment_date;
+        redosled prati invoice_ids (npr. redosled u tabeli).
+        """
+        cursor = self.conn.cursor()
+        by_id = {}
+        invoice_ids = [int(invoice_id) for invoice_id in invoice_ids]
+        for start in range(0, len(invoice_ids), 500):
+            chunk = invoice_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(self._invoice_summary_sql(f'i.id IN ({placeholders})',
+                                                     f'WHERE invoice_id IN ({placeholders})'), chunk + chunk)
+            for row in cursor.fetchall():
+                by_id[row['id']] = dict(row)
+        return [by_id[invoice_id] for invoice_id in invoice_ids if invoice_id in by_id]
+    
+    def get_all_invoices_with_payment_summary(self, include_archived=False):
+        """Kao get_all_invoices, ali svaki red ima i total_paid, remaining, payment_status i last_payment_date"""
+        cursor = self.conn.cursor()
+        where = '1 = 1' if include_archived else 'i.is_archived = 0'
+        cursor.execute(self._invoice_summary_sql(where) + ' ORDER BY i.due_date DESC')
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_due_invoices(self, window_days, include_partial=True):
+        """Vraća otvorene račune kojima valuta ističe u narednih window_days dana.
+
+        Koristi parcijalni indeks idx_invoices_due_open. Svaki red sadrži i
+        total_paid, remaining, payment_status i days_until_due.
+        """
+        today = datetime.now().date()
+        date_from = today.strftime('%Y%m%d')
+        date_to = (today + timedelta(days=int(window_days))).strftime('%Y%m%d')
+
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT i.*,
+                   (SELECT COALESCE(SUM(p.payment_amount), 0) FROM payments p WHERE p.invoice_id = i.id) AS total_paid
+            FROM invoices i
+            WHERE i.is_paid = 0 AND i.is_archived = 0
+            AND {DUE_DATE_KEY} BETWEEN ? AND ?
+            ORDER BY {DUE_DATE_KEY}
+        ''', (date_from, date_to))
+
+        due_invoices = []
+        for row in cursor.fetchall():
+            invoice = dict(row)
+            invoice['remaining'] = invoice['amount'] - invoice['total_paid']
+            if invoice['remaining'] <= 0:
+                continue
+            if invoice['total_paid'] > 0:
+                if not include_partial:
+                    continue
+                invoice['payment_status'] = 'Delimično'
+            else:
+                invoice['payment_status'] = 'Neplaćeno'
+            due_date = datetime.strptime(invoice['due_date'], '%d.%m.%Y').date()
+            invoice['days_until_due'] = (due_date - today).days
+            due_invoices.append(invoice)
+        return due_invoices
+
+    def get_due_invoice_changes(self, window_days, urgent_days=3):
+        """Otvoreni računi čiji se stepen roka promenio od poslednjeg obaveštenja (vidi mark_invoices_notified).
+
+        Stepen je DUE_BUCKET_UPCOMING (valuta u narednih window_days dana),
+        DUE_BUCKET_URGENT (za najviše urgent_days dana) ili DUE_BUCKET_OVERDUE
+        (rok prošao u poslednjih window_days dana). Upit ide preko parcijalnog
+        indeksa idx_invoices_due_open, pa posao zavisi od broja računa u prozoru,
+        a ne od cele tabele. Svaki red sadrži i bucket, previous_bucket (None za
+        nov račun), total_paid, remaining, payment_status i days_until_due.
+        """
+        today = datetime.now().date()
+        today_key = today.strftime('%Y%m%d')
+        urgent_key = (today + timedelta(days=int(urgent_days))).strftime('%Y%m%d')
+        date_from = (today - timedelta(days=int(window_days))).strftime('%Y%m%d')
+        date_to = (today + timedelta(days=int(window_days))).strftime('%Y%m%d')
+
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT i.*, n.bucket AS previous_bucket,
+                   (SELECT COALESCE(SUM(p.payment_amount), 0) FROM payments p WHERE p.invoice_id = i.id) AS total_paid
+            FROM (
+                SELECT *, CASE WHEN {DUE_DATE_KEY} < ? THEN {DUE_BUCKET_OVERDUE}
+                               WHEN {DUE_DATE_KEY} <= ? THEN {DUE_BUCKET_URGENT}
+                               ELSE {DUE_BUCKET_UPCOMING} END AS bucket
+                FROM invoices
+                WHERE is_paid = 0 AND is_archived = 0
+                AND {DUE_DATE_KEY} BETWEEN ? AND ?
+            ) i
+            LEFT JOIN notified_invoices n ON n.invoice_id = i.id
+            WHERE n.bucket IS NULL OR n.bucket != i.bucket
+            ORDER BY {date_key('i.due_date')}
+        ''', (today_key, urgent_key, date_from, date_to))
+
+        changes = []
+        for row in cursor.fetchall():
+            invoice = dict(row)
+            invoice['remaining'] = invoice['amount'] - invoice['total_paid']
+            if invoice['remaining'] <= 0:
+                continue
+            invoice['payment_status'] = 'Delimično' if invoice['total_paid'] > 0 else 'Neplaćeno'
+            due_date = datetime.strptime(invoice['due_date'], '%d.%m.%Y').date()
+            invoice['days_until_due'] = (due_date - today).days
+            changes.append(invoice)
+        return changes
+    
+    def mark_invoices_notified(self, invoices):
+        """Pamti prijavljeni stepen roka računa (redovi iz get_due_invoice_changes).
+
+        Usput briše zapise za račune koji su u međuvremenu plaćeni, arhivirani ili obrisani.
+        """
+        now = datetime.now().strftime(DATETIME_FORMAT)
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany('''
+                INSERT INTO notified_invoices (invoice_id, bucket, notified_at) VALUES (?, ?, ?)
+                ON CONFLICT(invoice_id) DO UPDATE SET bucket = excluded.bucket, notified_at = excluded.notified_at
+            ''', [(invoice['id'], invoice['bucket'], now) for invoice in invoices])
+            cursor.execute('''
+                DELETE FROM notified_invoices WHERE invoice_id NOT IN (
+                    SELECT id FROM invoices WHERE is_paid = 0 AND is_archived = 0
+                )
+            ''')
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
     
+    def _get_remaining_amounts(self, cursor, invoice_ids):
+        """Vraća {invoice_id: (iznos, preostalo)} za zadate račune jednim upitom"""
+        placeholders = ','.join('?' * len(invoice_ids))
+        cursor.execute(f'''
+            SELECT i.id, i.amount, i.amount - COALESCE(SUM(p.payment_amount), 0) AS remaining
+            FROM invoices i
+            LEFT JOIN payments p ON p.invoice_id = i.id
+            WHERE i.id IN ({placeholders})
+            GROUP BY i.id
+        ''', list(invoice_ids))
+        return {row['id']: (row['amount'], row['remaining']) for row in cursor.fetchall()}
+
+    def pay_invoices_remaining(self, invoice_ids, payment_date=None, notes="Potpuno plaćanje"):
+        """Plaća preostali iznos za više računa u jednoj transakciji.
+
+        Vraća rečnik sa brojem plaćenih i preskočenih računa i ukupno uplaćenim iznosom.
+        """
+        if payment_date is None:
+            payment_date = datetime.now().strftime('%d.%m.%Y')
+
+        summary = {'paid': 0, 'skipped': 0, 'total_amount': 0.0}
+        invoice_ids = list(dict.fromkeys(int(i) for i in invoice_ids))
+        if not invoice_ids:
+            return summary
+
+        cursor = self.conn.cursor()
+        created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            amounts = self._get_remaining_amounts(cursor, invoice_ids)
+            payments = []
+            for invoice_id in invoice_ids:
+                amount, remaining = amounts.get(invoice_id, (0, 0))
+                if remaining <= 0:
+                    summary['skipped'] += 1
+                    continue
+                payments.append((invoice_id, remaining, payment_date, notes, created_at))
+                summary['paid'] += 1
+                summary['total_amount'] += remaining
+
+            cursor.executemany('''
+                INSERT INTO payments (invoice_id, payment_amount, payment_date, notes, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', payments)
+            cursor.executemany(
+                'UPDATE invoices SET is_paid = 1, payment_date = ? WHERE id = ?',
+                [(payment_date, p[0]) for p in payments]
+            )
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        return summary
+
+    def archive_paid_invoices(self, invoice_ids):
+        """Arhivira samo potpuno plaćene račune iz liste u jednoj transakciji.
+
+        Vraća rečnik sa brojem arhiviranih i preskočenih (neplaćenih) računa.
+        """
+        summary = {'archived': 0, 'skipped': 0}
+        invoice_ids = list(dict.fromkeys(int(i) for i in invoice_ids))
+        if not invoice_ids:
+            return summary
+
+        cursor = self.conn.cursor()
+        try:
+            amounts = self._get_remaining_amounts(cursor, invoice_ids)
+            to_archive = []
+            for invoice_id in invoice_ids:
+                if invoice_id not in amounts:
+                    continue
+                amount, remaining = amounts[invoice_id]
+                # Isto pravilo kao get_payment_status: bar jedna uplata i ništa preostalo
+                if amount - remaining > 0 and remaining <= 0:
+                    to_archive.append((invoice_id,))
+            cursor.executemany('UPDATE invoices SET is_archived = 1 WHERE id = ?', to_archive)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        summary['archived'] = len(to_archive)
+        summary['skipped'] = len(invoice_ids) - len(to_archive)
+        return summary
+
     # ==================== VENDOR METHODS (POSTOJEĆE) ====================
     def get_all_vendors(self, with_details=True, include_orphan_invoice_names=True):
         cursor = self.conn.cursor()
@@ -583,6 +989,7 @@ class Database:
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (name, vendor_code, address, city, pib, registration_number, bank_account, contact_person, phone, email, notes))
         self.conn.commit()
+        lookup_cache.invalidate('vendors')
         return cursor.lastrowid
     
     def update_vendor(self, vendor_id, **kwargs):
@@ -599,11 +1006,13 @@ class Database:
             params.append(vendor_id)
             cursor.execute(f"UPDATE vendors SET {', '.join(updates)} WHERE id = ?", tuple(params))
             self.conn.commit()
+            lookup_cache.invalidate('vendors')
     
     def delete_vendor_by_id(self, vendor_id):
         cursor = self.conn.cursor()
         cursor.execute('DELETE FROM vendors WHERE id = ?', (vendor_id,))
         self.conn.commit()
+        lookup_cache.invalidate('vendors')
     
     # ==================== CUSTOMER METHODS ====================
     def _generate_next_customer_code(self):
@@ -629,14 +1038,16 @@ class Database:
         registration_number = kwargs.get('registration_number', '')
         address = kwargs.get('address', '')
         city = kwargs.get('city', '')
+        email = kwargs.get('email', '')
         notes = kwargs.get('notes', '')
         
         cursor = self.conn.cursor()
         cursor.execute('''
-            INSERT INTO customers (customer_code, name, phone, pib, id_card_number, registration_number, address, city, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (customer_code, name, phone, pib, id_card_number, registration_number, address, city, notes))
+            INSERT INTO customers (customer_code, name, phone, pib, id_card_number, registration_number, address, city, email, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (customer_code, name, phone, pib, id_card_number, registration_number, address, city, email, notes))
         self.conn.commit()
+        lookup_cache.invalidate('customers')
         return cursor.lastrowid
     
     def get_all_customers(self):
@@ -655,7 +1066,7 @@ class Database:
         updates = []
         params = []
         
-        for key in ['name', 'customer_code', 'phone', 'pib', 'id_card_number', 'registration_number', 'address', 'city', 'notes']:
+        for key in ['name', 'customer_code', 'phone', 'pib', 'id_card_number', 'registration_number', 'address', 'city', 'email', 'notes']:
             if key in kwargs and kwargs[key] is not None:
                 updates.append(f'{key} = ?')
                 params.append(kwargs[key])
@@ -664,11 +1075,13 @@ class Database:
             params.append(customer_id)
             cursor.execute(f"UPDATE customers SET {', '.join(updates)} WHERE id = ?", tuple(params))
             self.conn.commit()
+            lookup_cache.invalidate('customers')
     
     def delete_customer(self, customer_id):
         cursor = self.conn.cursor()
         cursor.execute('DELETE FROM customers WHERE id = ?', (customer_id,))
         self.conn.commit()
+        lookup_cache.invalidate('customers')
     
     # ==================== ARTICLE METHODS ====================
     def add_article(self, **kwargs):
@@ -685,6 +1098,7 @@ class Database:
             kwargs.get('notes', '')
         ))
         self.conn.commit()
+        lookup_cache.invalidate('articles')
         return cursor.lastrowid
     
     def upsert_article(self, **kwargs):
@@ -719,6 +1133,7 @@ class Database:
                 article_code
             ))
             self.conn.commit()
+            lookup_cache.invalidate('articles')
             return existing['id']
         else:
             # INSERT
@@ -734,6 +1149,7 @@ class Database:
                 kwargs.get('notes', '')
             ))
             self.conn.commit()
+            lookup_cache.invalidate('articles')
             return cursor.lastrowid
 
     
@@ -762,11 +1178,13 @@ class Database:
             params.append(article_id)
             cursor.execute(f"UPDATE articles SET {', '.join(updates)} WHERE id = ?", tuple(params))
             self.conn.commit()
+            lookup_cache.invalidate('articles')
     
     def delete_article(self, article_id):
         cursor = self.conn.cursor()
         cursor.execute('DELETE FROM articles WHERE id = ?', (article_id,))
         self.conn.commit()
+        lookup_cache.invalidate('articles')
     
     # ==================== PROFORMA INVOICE METHODS ====================
     def _generate_next_proforma_number(self):
@@ -826,6 +1244,106 @@ class Database:
             cursor.execute('SELECT * FROM proforma_invoices WHERE is_archived = 0 ORDER BY invoice_date DESC')
         return [dict(row) for row in cursor.fetchall()]
     
+    def get_proformas_with_payment_summary(self, archived=False, status=None):
+        """Lista predračuna sa uplatama, jednim agregatnim upitom.
+
+        Svaki red sadrži i total_paid, remaining, status ('Neplaćeno', 'Delimično',
+        'Plaćeno') i last_payment_date - isto što vraćaju pojedinačne
+        get_*_proforma metode, bez upita po redu.
+        """
+        last_key = f"MAX({date_key('payment_date')})"
+        query = f'''
+            SELECT * FROM (
+                SELECT pi.*,
+                       COALESCE(pp.total_paid, 0) AS total_paid,
+                       pi.total_amount - COALESCE(pp.total_paid, 0) AS remaining,
+                       CASE
+                           WHEN COALESCE(pp.total_paid, 0) = 0 THEN 'Neplaćeno'
+                           WHEN pp.total_paid >= pi.total_amount THEN 'Plaćeno'
+                           ELSE 'Delimično'
+                       END AS status,
+                       pp.last_payment_date
+                FROM proforma_invoices pi
+                LEFT JOIN (
+                    SELECT proforma_id,
+                           SUM(payment_amount) AS total_paid,
+                           substr({last_key}, 7, 2) || '.' || substr({last_key}, 5, 2) || '.' || substr({last_key}, 1, 4)
+                               AS last_payment_date
+                    FROM proforma_payments
+                    GROUP BY proforma_id
+                ) pp ON pp.proforma_id = pi.id
+                WHERE pi.is_archived = ?
+            )
+        '''
+        params = [1 if archived else 0]
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY invoice_date DESC'
+
+        cursor = self.conn.cursor()
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def load_proforma_document(self, proforma_id):
+        """Sve podatke za PDF predračuna učitava u dva upita.
+
+        Prvi upit daje predračun sa kupcem i uplatama (total_paid, remaining,
+        status, last_payment_date), drugi stavke. Vraća dict sa ključevima
+        proforma, customer (ili None), items i settings, ili None.
+        """
+        last_key = f"(SELECT MAX({date_key('payment_date')}) FROM proforma_payments WHERE proforma_id = pi.id)"
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT d.*,
+                   d.total_amount - d.total_paid AS remaining,
+                   CASE
+                       WHEN d.total_paid = 0 THEN 'Neplaćeno'
+                       WHEN d.total_paid >= d.total_amount THEN 'Plaćeno'
+                       ELSE 'Delimično'
+                   END AS status
+            FROM (
+                SELECT pi.*,
+                       (SELECT COALESCE(SUM(payment_amount), 0) FROM proforma_payments
+                        WHERE proforma_id = pi.id) AS total_paid,
+                       substr({last_key}, 7, 2) || '.' || substr({last_key}, 5, 2) || '.' || substr({last_key}, 1, 4)
+                           AS last_payment_date,
+                       c.id AS customer__id, c.name AS customer__name, c.phone AS customer__phone,
+                       c.address AS customer__address, c.id_card_number AS customer__id_card_number
+                FROM proforma_invoices pi
+                LEFT JOIN customers c ON c.id = pi.customer_id
+                WHERE pi.id = ?
+            ) d
+        ''', (proforma_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        proforma, customer = {}, {}
+        for key in row.keys():
+            if key.startswith('customer__'):
+                customer[key[len('customer__'):]] = row[key]
+            else:
+                proforma[key] = row[key]
+
+        cursor.execute('SELECT * FROM proforma_items WHERE proforma_id = ? ORDER BY id', (proforma_id,))
+        return {
+            'proforma': proforma,
+            'customer': customer if customer['id'] is not None else None,
+            'items': [dict(item) for item in cursor.fetchall()],
+            'settings': self.get_settings(),
+        }
+    
+    def get_proforma_ids_by_date(self, date_from, date_to, include_archived=False):
+        """ID-jevi predračuna izdatih u periodu (datumi 'dd.mm.yyyy'), hronološki"""
+        cursor = self.conn.cursor()
+        key = date_key('invoice_date')
+        query = f'SELECT id FROM proforma_invoices WHERE {key} BETWEEN ? AND ?'
+        if not include_archived:
+            query += ' AND is_archived = 0'
+        cursor.execute(query + f' ORDER BY {key}, id', (date_value_key(date_from), date_value_key(date_to)))
+        return [row['id'] for row in cursor.fetchall()]
+    
     def get_proforma_by_id(self, proforma_id):
         cursor = self.conn.cursor()
         cursor.execute('SELECT * FROM proforma_invoices WHERE id = ?', (proforma_id,))
@@ -917,6 +1435,13 @@ class Database:
         row = cursor.fetchone()
         return dict(row) if row else None
     
+    def load_utility_receipt_document(self, bill_id):
+        """Račun i podešavanja za PDF potvrdu o plaćanju, ili None"""
+        bill = self.get_utility_bill_by_id(bill_id)
+        if not bill:
+            return None
+        return {'bill': bill, 'settings': self.get_settings()}
+    
     def update_utility_bill_payment(self, bill_id, paid_amount, payment_date=None):
         cursor = self.conn.cursor()
         cursor.execute('SELECT amount FROM utility_bills WHERE id = ?', (bill_id,))
@@ -971,6 +1496,14 @@ class Database:
         cursor.execute('SELECT * FROM revenue_entries ORDER BY date_from DESC')
         return [dict(row) for row in cursor.fetchall()]
     
+    def get_revenue_entries_by_date(self, date_from, date_to):
+        """Unosi prometa u periodu (datumi 'dd.mm.yyyy'), od najnovijeg"""
+        cursor = self.conn.cursor()
+        key = date_key('date_from')
+        cursor.execute(f'SELECT * FROM revenue_entries WHERE {key} BETWEEN ? AND ? ORDER BY {key} DESC',
+                       (date_value_key(date_from), date_value_key(date_to)))
+        return [dict(row) for row in cursor.fetchall()]
+    
     def delete_revenue_entry(self, entry_id):
         cursor = self.conn.cursor()
         cursor.execute('DELETE FROM revenue_entries WHERE id = ?', (entry_id,))
@@ -1029,32 +1562,278 @@ class Database:
     
     # ==================== SETTINGS & STATS ====================
     def get_settings(self):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT key, value FROM settings')
-        settings = {}
-        for row in cursor.fetchall():
-            key = row['key']
-            value = row['value']
-            if value == 'True':
-                value = True
-            elif value == 'False':
-                value = False
-            elif value is not None and value.isdigit():
-                value = int(value)
-            settings[key] = value
-        return settings
+        """Podešavanja kao dict; čitaju se iz baze samo posle izmene (vraća se kopija keša)"""
+        settings = self._settings_cache.get('settings')
+        if settings is None:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT key, value FROM settings')
+            settings = {}
+            for row in cursor.fetchall():
+                key = row['key']
+                value = row['value']
+                if value == 'True':
+                    value = True
+                elif value == 'False':
+                    value = False
+                elif key in self.SECRET_SETTINGS:
+                    value = (credential_store.get_secret(key) or '') if value == self.SECRET_IN_STORE else value
+                elif value is not None and value.isdigit():
+                    value = int(value)
+                settings[key] = value
+            self._settings_cache['settings'] = settings
+        return dict(settings)
     
     def save_settings(self, settings):
         cursor = self.conn.cursor()
         for key, value in settings.items():
-            cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value) if value is not None else ''))
+            value = str(value) if value is not None else ''
+            cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, self._stored_value(key, value)))
         self.conn.commit()
+        self._settings_cache.pop('settings', None)
+        job_scheduler.wake()
     
     def update_setting(self, key, value):
         cursor = self.conn.cursor()
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value)))
+        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, self._stored_value(key, str(value))))
+        self.conn.commit()
+        self._settings_cache.pop('settings', None)
+        job_scheduler.wake()
+    
+    def _stored_value(self, key, value):
+        """Vrednost podešavanja za tabelu settings: lozinka ide u skladište sistema ako je dostupno"""
+        if key in self.SECRET_SETTINGS and credential_store.set_secret(key, value):
+            return self.SECRET_IN_STORE
+        return value
+    
+    def _migrate_secrets(self):
+        """Migracija: lozinke koje su ranije upisane u bazu prelaze u skladište sistema (ako je dostupno)"""
+        if not credential_store.KEYRING_AVAILABLE:
+            return
+        cursor = self.conn.cursor()
+        for key in self.SECRET_SETTINGS:
+            cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
+            row = cursor.fetchone()
+            if row and row['value'] and row['value'] != self.SECRET_IN_STORE and credential_store.set_secret(key, row['value']):
+                cursor.execute('UPDATE settings SET value = ? WHERE key = ?', (self.SECRET_IN_STORE, key))
+        self.conn.commit()
+    
+    # ==================== JOBS & BACKUP ====================
+    def get_jobs(self):
+        """Sačuvano stanje poslova planera: {ime: dict}"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM jobs')
+        return {row['name']: dict(row) for row in cursor.fetchall()}
+    
+    def save_job(self, name, next_run, last_run, status, last_error=None):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO jobs (name, next_run, last_run, status, last_error) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET next_run = excluded.next_run, last_run = excluded.last_run,
+                status = excluded.status, last_error = excluded.last_error
+        ''', (
+            name,
+            next_run.strftime(DATETIME_FORMAT) if next_run else None,
+            last_run.strftime(DATETIME_FORMAT) if last_run else None,
+            status,
+            last_error
+        ))
+        self.conn.commit()
+    
+    # ==================== EMAIL OUTBOX ====================
+    def enqueue_email(self, recipient, subject, html_body, dedup_key=None, digest_key=None):
+        """Dodaje poruku u outbox; vraća False ako poruka sa istim dedup_key već postoji"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO email_outbox (recipient, subject, html_body, dedup_key, digest_key, next_attempt)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (recipient, subject, html_body, dedup_key, digest_key, datetime.now().strftime(DATETIME_FORMAT)))
+        self.conn.commit()
+        return cursor.rowcount > 0
+    
+    def get_due_emails(self, now):
+        """Poruke koje čekaju slanje i kojima je došlo vreme sledećeg pokušaja"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT * FROM email_outbox WHERE status = 'čeka' AND next_attempt <= ? ORDER BY id
+        ''', (now.strftime(DATETIME_FORMAT),))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_next_email_attempt(self):
+        """Vreme najranijeg sledećeg pokušaja slanja (datetime) ili None ako outbox nema poruka na čekanju"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT MIN(next_attempt) AS next_attempt FROM email_outbox WHERE status = 'čeka'")
+        value = cursor.fetchone()['next_attempt']
+        return datetime.strptime(value, DATETIME_FORMAT) if value else None
+    
+    def mark_emails_sent(self, email_ids):
+        placeholders = ','.join('?' * len(email_ids))
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            UPDATE email_outbox SET status = 'poslato', attempts = attempts + 1, last_error = NULL, sent_at = ?
+            WHERE id IN ({placeholders})
+        ''', [datetime.now().strftime(DATETIME_FORMAT)] + list(email_ids))
+        self.conn.commit()
+    
+    def mark_emails_failed(self, email_ids, error, next_attempt, max_attempts):
+        """Beleži neuspeo pokušaj; posle max_attempts pokušaja poruka dobija status 'neuspelo'"""
+        placeholders = ','.join('?' * len(email_ids))
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            UPDATE email_outbox
+            SET attempts = attempts + 1, last_error = ?, next_attempt = ?,
+                status = CASE WHEN attempts + 1 >= ? THEN 'neuspelo' ELSE status END
+            WHERE id IN ({placeholders})
+        ''', [error, next_attempt.strftime(DATETIME_FORMAT), max_attempts] + list(email_ids))
         self.conn.commit()
     
+    # ==================== SLANJE DOKUMENATA ====================
+    def get_dispatch_targets(self, kind, document_ids):
+        """Broj dokumenta i email kupca (predračun) ili dobavljača (narudžbenica): {id: dict(number, email)}"""
+        documents, number, partners, partner_id = self.DISPATCH_TARGETS[kind]
+        placeholders = ','.join('?' * len(document_ids))
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT d.id, d.{number} AS number, NULLIF(TRIM(p.email), '') AS email
+            FROM {documents} d LEFT JOIN {partners} p ON p.id = d.{partner_id}
+            WHERE d.id IN ({placeholders})
+        ''', list(document_ids))
+        return {row['id']: {'number': row['number'], 'email': row['email']} for row in cursor.fetchall()}
+    
+    def find_document_id(self, kind, number):
+        """ID predračuna ili narudžbenice po broju dokumenta; None ako ne postoji"""
+        documents, number_column = self.DISPATCH_TARGETS[kind][:2]
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT id FROM {documents} WHERE {number_column} = ?', (str(number).strip(),))
+        row = cursor.fetchone()
+        return row['id'] if row else None
+    
+    def add_document_dispatch(self, kind, document_id, recipient, status, error=None):
+        """Beleži ishod slanja jednog dokumenta"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO document_dispatch (kind, document_id, recipient, status, error, sent_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (kind, document_id, recipient, status, error, datetime.now().strftime(DATETIME_FORMAT)))
+        self.conn.commit()
+    
+    def get_last_dispatches(self, kind):
+        """Poslednje slanje svakog dokumenta date vrste: {document_id: dict}"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT * FROM document_dispatch WHERE id IN (
+                SELECT MAX(id) FROM document_dispatch WHERE kind = ? GROUP BY document_id
+            )
+        ''', (kind,))
+        return {row['document_id']: dict(row) for row in cursor.fetchall()}
+    
+    def backup_database(self, directory='backups', keep=14):
+        """Kopija baze (bez lozinki) preko SQLite backup API-ja (bezbedno dok program radi); čuva poslednjih keep kopija"""
+        os.makedirs(directory, exist_ok=True)
+        name = os.path.splitext(os.path.basename(self.db_name))[0]
+        path = os.path.join(directory, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+        
+        # Posebna konekcija, da backup ne deli transakciju sa GUI-jem
+        source = sqlite3.connect(self.db_name)
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+            # Lozinke ne ulaze u kopiju; VACUUM uklanja i stranice na kojima su ostale
+            placeholders = ','.join('?' * len(self.SECRET_SETTINGS))
+            target.execute(f"UPDATE settings SET value = '' WHERE key IN ({placeholders})", self.SECRET_SETTINGS)
+            target.commit()
+            target.execute('VACUUM')
+        finally:
+            target.close()
+            source.close()
+        
+        backups = sorted(f for f in os.listdir(directory) if f.startswith(f"{name}_") and f.endswith('.db'))
+        for old in backups[:-keep]:
+            try:
+                os.remove(os.path.join(directory, old))
+            except OSError:
+                pass
+        return path
+    
+    def optimize(self):
+        """PRAGMA optimize - ažurira statistiku za planer upita gde je potrebno"""
+        cursor = self.conn.cursor()
+        cursor.execute('PRAGMA optimize')
+    
+    def auto_vacuum_pending(self):
+        """True dok baza čeka jednokratni VACUUM za auto_vacuum=INCREMENTAL (vidi convert_to_incremental_vacuum)"""
+        return self.conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2
+    
+    def convert_to_incremental_vacuum(self):
+        """Jednokratni VACUUM koji postojeću bazu prevodi na auto_vacuum=INCREMENTAL; vraća oslobođene bajtove.
+
+        Traje srazmerno veličini baze i ne može da se deli, pa se poziva preko
+        worker_connection iz pozadinske niti (IdleMaintenance), nikad iz Tk niti.
+        """
+        cursor = self.conn.cursor()
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        free_pages = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+        return free_pages * page_size
+    
+    def _analyzed_row_counts(self):
+        """Broj redova po tabeli iz poslednjeg ANALYZE (sqlite_stat1); prazno ako ANALYZE nije rađen"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('SELECT tbl, stat FROM sqlite_stat1')
+        except sqlite3.OperationalError:
+            return {}
+        counts = {}
+        for row in cursor.fetchall():
+            rows = int((row['stat'] or '0').split()[0])
+            counts[row['tbl']] = max(counts.get(row['tbl'], 0), rows)
+        return counts
+    
+    def maintenance_steps(self):
+        """Održavanje baze u kratkim koracima (generator; yield posle svakog koraka).
+
+        ANALYZE tabela čiji se broj redova promenio od prošle analize, PRAGMA
+        incremental_vacuum dok ima slobodnih stranica, pa PRAGMA optimize. Između
+        koraka nema otvorene transakcije, pa pozivalac može da stane i nastavi
+        kasnije. Na kraju vraća rezime (StopIteration.value):
+        {'analyzed': [tabele], 'freed_bytes': n}.
+        """
+        cursor = self.conn.cursor()
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        freed = 0
+        cursor.execute(f'PRAGMA analysis_limit = {self.ANALYZE_LIMIT}')
+        analyzed_counts = self._analyzed_row_counts()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        tables = [row['name'] for row in cursor.fetchall()]
+        yield
+        
+        analyzed = []
+        for table in tables:
+            rows = cursor.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            previous = analyzed_counts.get(table)
+            if previous is None:
+                changed = rows > 0
+            else:
+                changed = abs(rows - previous) > max(previous, 1) * self.ANALYZE_CHANGE_RATIO
+            if changed:
+                cursor.execute(f'ANALYZE "{table}"')
+                analyzed.append(table)
+            yield
+        
+        free_pages = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        while free_pages:
+            # executescript izvršava pragmu do kraja (execute oslobodi samo jednu stranicu)
+            self.conn.executescript(f'PRAGMA incremental_vacuum({self.VACUUM_PAGES})')
+            remaining = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+            if remaining >= free_pages:
+                break  # auto_vacuum nije INCREMENTAL
+            freed += (free_pages - remaining) * page_size
+            free_pages = remaining
+            yield
+        
+        cursor.execute('PRAGMA optimize')
+        return {'analyzed': analyzed, 'freed_bytes': freed}
+    
     # ==================== PROFORMA PAYMENT METHODS (NOVO) ====================
     
     def add_proforma_payment(self, proforma_id, payment_amount, payment_date, notes=None):
@@ -1195,6 +1974,42 @@ class Database:
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
         
+    def _sync_child_items(self, cursor, table, parent_column, parent_id, items, columns):
+        """Usklađuje stavke u bazi sa listom iz dijaloga (bez commit-a).
+
+        Stavke sa 'id' koji postoji u bazi menjaju se samo ako su im se vrednosti
+        promenile, stavke bez 'id' se dodaju, a one kojih više nema se brišu.
+        Ostale kolone (npr. is_paid) ostaju netaknute.
+        """
+        names = [name for name, _ in columns]
+        cursor.execute(
+            f"SELECT id, {', '.join(names)} FROM {table} WHERE {parent_column} = ?", (parent_id,)
+        )
+        existing = {row['id']: tuple(row[name] for name in names) for row in cursor.fetchall()}
+
+        inserts, updates, kept = [], [], set()
+        for item in items:
+            values = tuple(item.get(name, default) for name, default in columns)
+            item_id = item.get('id')
+            if item_id in existing and item_id not in kept:
+                kept.add(item_id)
+                if existing[item_id] != values:
+                    updates.append(values + (item_id,))
+            else:
+                inserts.append((parent_id,) + values)
+        deletes = [(item_id,) for item_id in existing if item_id not in kept]
+
+        if deletes:
+            cursor.executemany(f"DELETE FROM {table} WHERE id = ?", deletes)
+        if updates:
+            assignments = ', '.join(f"{name} = ?" for name in names)
+            cursor.executemany(f"UPDATE {table} SET {assignments} WHERE id = ?", updates)
+        if inserts:
+            placeholders = ', '.join('?' * (len(names) + 1))
+            cursor.executemany(
+                f"INSERT INTO {table} ({parent_column}, {', '.join(names)}) VALUES ({placeholders})", inserts
+            )
+
     def update_proforma_invoice(self, proforma_id, proforma_data, items):
         """Ažurira predračun i njegove stavke"""
         cursor = self.conn.cursor()
@@ -1213,28 +2028,13 @@ class Database:
             proforma_id
         ))
         
-        # Obriši stare stavke
-        cursor.execute('DELETE FROM proforma_items WHERE proforma_id = ?', (proforma_id,))
-        
-        # Dodaj nove stavke
-        for item in items:
-            cursor.execute('''
-                INSERT INTO proforma_items (proforma_id, article_id, article_name, article_code, quantity, unit, price, discount, total, is_paid)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                proforma_id,
-                item.get('article_id'),
-                item['article_name'],
-                item.get('article_code', ''),
-                item['quantity'],
-                item.get('unit', 'kom'),
-                item['price'],
-                item.get('discount', 0),
-                item['total'],
-                0  # Nove stavke su neplaćene
-            ))
-        
-        self.conn.commit()
+        # Stavke: izmena/dodavanje/brisanje samo onoga što se promenilo
+        try:
+            self._sync_child_items(cursor, 'proforma_items', 'proforma_id', proforma_id, items, self.PROFORMA_ITEM_COLUMNS)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
     
     def unarchive_proforma(self, proforma_id):
         """Vraća predračun iz arhive"""
@@ -1291,14 +2091,43 @@ class Database:
         return order_id
 
     def get_all_orders(self, include_archived=False):
-        """Lista narudžbina (sa opcijom arhive)"""
-        cursor = self.conn.cursor()
-        if include_archived:
-            cursor.execute('SELECT * FROM orders ORDER BY order_date DESC')
-        else:
-            cursor.execute('SELECT * FROM orders WHERE is_archived = 0 ORDER BY order_date DESC')
+        """Lista narudžbina (sa opcijom arhive); item_count je broj stavki"""
+        cursor = self.conn.cursor()
+        where = '' if include_archived else 'WHERE o.is_archived = 0'
+        cursor.execute(f'''
+            SELECT o.*, COALESCE(c.item_count, 0) AS item_count
+            FROM orders o
+            LEFT JOIN (SELECT order_id, COUNT(*) AS item_count FROM order_items GROUP BY order_id) c
+                ON c.order_id = o.id
+            {where}
+            ORDER BY o.order_date DESC
+        ''')
         return [dict(row) for row in cursor.fetchall()]
 
+    def load_order_document(self, order_id):
+        """Narudžbina sa stavkama i podešavanjima za PDF (dva upita), ili None"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT * FROM orders WHERE id = ?', (order_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute('SELECT * FROM order_items WHERE order_id = ? ORDER BY id', (order_id,))
+        return {
+            'order': dict(row),
+            'items': [dict(item) for item in cursor.fetchall()],
+            'settings': self.get_settings(),
+        }
+
+    def get_order_ids_by_date(self, date_from, date_to, include_archived=False):
+        """ID-jevi narudžbina u periodu (datumi 'dd.mm.yyyy'), hronološki"""
+        cursor = self.conn.cursor()
+        key = date_key('order_date')
+        query = f'SELECT id FROM orders WHERE {key} BETWEEN ? AND ?'
+        if not include_archived:
+            query += ' AND is_archived = 0'
+        cursor.execute(query + f' ORDER BY {key}, id', (date_value_key(date_from), date_value_key(date_to)))
+        return [row['id'] for row in cursor.fetchall()]
+
     def get_order_by_id(self, order_id):
         """Jedna narudžbina po ID-u"""
         cursor = self.conn.cursor()
@@ -1329,25 +2158,13 @@ class Database:
             order_id
         ))
 
-        # Obriši stare stavke
-        cursor.execute('DELETE FROM order_items WHERE order_id = ?', (order_id,))
-
-        # Dodaj nove stavke
-        for item in items:
-            cursor.execute('''
-                INSERT INTO order_items (order_id, article_id, article_code, article_name, quantity, unit, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                order_id,
-                item.get('article_id'),
-                item.get('article_code', ''),
-                item['article_name'],
-                item['quantity'],
-                item.get('unit', 'kom'),
-                item.get('notes', '')
-            ))
-
-        self.conn.commit()
+        # Stavke: izmena/dodavanje/brisanje samo onoga što se promenilo
+        try:
+            self._sync_child_items(cursor, 'order_items', 'order_id', order_id, items, self.ORDER_ITEM_COLUMNS)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
 
     def archive_order(self, order_id):
         """Arhiviranje narudžbine"""
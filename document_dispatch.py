@@ -0,0 +1,173 @@
+# document_dispatch.py – slanje predračuna (kupcima) i narudžbenica (dobavljačima) email-om, sa PDF-om u prilogu
+import argparse
+import html
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+STATUS_SENT = 'poslato'
+STATUS_FAILED = 'greška'
+STATUS_NO_ADDRESS = 'bez adrese'
+
+# Vrsta dokumenta -> (naslov, naziv u tekstu poruke)
+DISPATCH_KINDS = {
+    'proforma': ('Predračun', 'predračun'),
+    'order': ('Narudžbenica', 'narudžbenicu'),
+}
+
+
+def compose_message(kind, number, company_name=''):
+    """Naslov i HTML tekst poruke uz dokument"""
+    title, noun = DISPATCH_KINDS[kind]
+    subject = f"{title} br. {number}" + (f" – {company_name}" if company_name else '')
+    signature = f"<br>{html.escape(company_name)}" if company_name else ''
+    html_body = (
+        "<html><body>"
+        "<p>Poštovani,</p>"
+        f"<p>u prilogu vam šaljemo {noun} br. {html.escape(str(number))}.</p>"
+        f"<p>Srdačan pozdrav,{signature}</p>"
+        "</body></html>"
+    )
+    return subject, html_body
+
+
+def dispatch_documents(db, kind, document_ids, transport, workers=None, progress_callback=None):
+    """Šalje PDF svakog dokumenta na email kupca (predračun) ili dobavljača (narudžbenica).
+
+    PDF-ovi se generišu u memoriji (PDFGenerator.get_document_pdf) jedan po jedan
+    u pozivajućoj niti, a šalju se paralelno preko transport-a, najviše workers
+    odjednom (podrazumevano transport.max_connections). Na slanje čeka najviše
+    2 * workers PDF-ova, pa memorija ne raste sa brojem dokumenata. Baza se
+    koristi samo iz pozivajuće niti; ishod svakog dokumenta se odmah upisuje
+    u tabelu document_dispatch.
+
+    transport je objekat sa send(subject, html_body, recipient, attachments),
+    npr. notifications.get_transport(settings) ili SMTPTransport lokalnog servera.
+    progress_callback(urađeno, ukupno) se zove posle svakog dokumenta; izuzetak
+    iz njega (npr. otkazivanje) prekida slanje dokumenata koji još nisu krenuli.
+
+    Vraća dict sa sent [id], failed [(id, greška)], skipped [id bez email adrese],
+    count i elapsed.
+    """
+    if kind not in DISPATCH_KINDS:
+        raise ValueError(f"Nepoznata vrsta dokumenta: {kind}")
+    from pdf_generator import PDFGenerator
+
+    document_ids = list(dict.fromkeys(document_ids))
+    total = len(document_ids)
+    targets = db.get_dispatch_targets(kind, document_ids) if document_ids else {}
+    company_name = db.get_settings().get('company_name') or ''
+    generator = PDFGenerator(db)
+
+    started = time.perf_counter()
+    result = {'sent': [], 'failed': [], 'skipped': []}
+    state = {'done': 0, 'cancelled': False}
+    pending = {}
+
+    def finish(document_id, recipient, status, error=None):
+        db.add_document_dispatch(kind, document_id, recipient, status, error)
+        if status == STATUS_SENT:
+            result['sent'].append(document_id)
+        elif status == STATUS_NO_ADDRESS:
+            result['skipped'].append(document_id)
+        else:
+            result['failed'].append((document_id, error))
+        state['done'] += 1
+        if progress_callback and not state['cancelled']:
+            progress_callback(state['done'], total)
+
+    def collect(futures):
+        for future in futures:
+            document_id, recipient = pending.pop(future)
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is None:
+                finish(document_id, recipient, STATUS_SENT)
+            else:
+                finish(document_id, recipient, STATUS_FAILED, str(error))
+
+    workers = max(1, min(workers or getattr(transport, 'max_connections', 1), total or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='DocumentDispatch') as executor:
+        try:
+            for document_id in document_ids:
+                target = targets.get(document_id)
+                if target is None:
+                    finish(document_id, None, STATUS_FAILED, "Dokument nije pronađen")
+                    continue
+                if not target['email']:
+                    finish(document_id, None, STATUS_NO_ADDRESS)
+                    continue
+                try:
+                    pdf = generator.get_document_pdf(kind, document_id)
+                except Exception as e:
+                    finish(document_id, target['email'], STATUS_FAILED, str(e))
+                    continue
+                if pdf is None:
+                    finish(document_id, target['email'], STATUS_FAILED, "PDF nije kreiran")
+                    continue
+
+                if len(pending) >= 2 * workers:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                subject, html_body = compose_message(kind, target['number'], company_name)
+                future = executor.submit(transport.send, subject, html_body, target['email'], [pdf])
+                pending[future] = (document_id, target['email'])
+            collect(wait(pending).done)
+        except BaseException:
+            # Otkazivanje: poruke koje nisu krenule se ne šalju, ishod započetih se ipak beleži
+            state['cancelled'] = True
+            for future in pending:
+                future.cancel()
+            collect(wait(pending).done)
+            raise
+
+    return {
+        'sent': result['sent'],
+        'failed': result['failed'],
+        'skipped': result['skipped'],
+        'count': total,
+        'elapsed': time.perf_counter() - started,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Slanje predračuna kupcima ili narudžbenica dobavljačima email-om.")
+    parser.add_argument('kind', choices=sorted(DISPATCH_KINDS), help="vrsta dokumenata")
+    parser.add_argument('--ids', type=int, nargs='+', required=True, help="ID-jevi dokumenata")
+    parser.add_argument('--smtp', metavar='HOST:PORT',
+                        help="SMTP server bez prijave i TLS-a (npr. lokalni test server localhost:1025) "
+                             "umesto servisa iz podešavanja")
+    parser.add_argument('--istovremeno', dest='workers', type=int, help="broj istovremenih slanja")
+    parser.add_argument('--baza', dest='db_path', default='invoices.db', help="putanja do baze")
+    args = parser.parse_args(argv)
+
+    from database import Database
+    from notifications import SMTPTransport, get_transport
+    db = Database(args.db_path)
+    settings = db.get_settings()
+    if args.smtp:
+        host, _, port = args.smtp.rpartition(':')
+        transport = SMTPTransport(host or 'localhost', int(port), security='none',
+                                  from_address=settings.get('gmail_user') or 'evidencija@localhost')
+    else:
+        transport = get_transport(settings)
+
+    def report(done, total):
+        print(f"\r{done}/{total}", end='', flush=True)
+
+    try:
+        result = dispatch_documents(db, args.kind, args.ids, transport, args.workers, report)
+    finally:
+        if hasattr(transport, 'close'):
+            transport.close()
+        db.conn.close()
+    print()
+    for document_id in result['skipped']:
+        print(f"- Dokument {document_id}: nema email adrese")
+    for document_id, error in result['failed']:
+        print(f"✗ Dokument {document_id}: {error}")
+    print(f"✓ Poslato {len(result['sent'])}/{result['count']} za {result['elapsed']:.1f} s")
+    return 0 if not result['failed'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+# email_outbox.py – red za slanje email-a (SQLite) sa ponovnim pokušajima i zbirnim porukama
+from datetime import datetime, timedelta
+
+from scheduler import job_scheduler
+
+
+class MemoryTransport:
+    """Lokalna zamena za slanje email-a (npr. za proveru outbox-a bez mreže).
+
+    Pamti poslate poruke u self.sent; prvih fail_times slanja baca ConnectionError.
+    """
+
+    def __init__(self, fail_times=0):
+        self.sent = []
+        self.fail_times = fail_times
+
+    def send(self, subject, html_body, recipient, attachments=None):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError("Simulirana greška mreže")
+        self.sent.append({'subject': subject, 'html_body': html_body, 'recipient': recipient,
+                          'attachments': list(attachments or ())})
+
+
+class EmailOutbox:
+    """Poruke se upisuju u tabelu email_outbox, a šalje ih posao planera (flush).
+
+    - dedup_key: ista poruka (npr. dnevni izveštaj za primaoca) se ne upisuje dvaput
+    - digest_key: poruke istog primaoca sa istim digest_key koje čekaju zajedno
+      šalju se kao jedna zbirna poruka
+    - neuspelo slanje se ponavlja sa eksponencijalnim razmakom (1, 2, 4... min,
+      najviše MAX_DELAY), a posle MAX_ATTEMPTS pokušaja poruka dobija status 'neuspelo'
+
+    transport je bilo koji objekat sa send(subject, html_body, recipient, attachments=None),
+    npr. notifications.SettingsTransport ili MemoryTransport.
+    """
+
+    BASE_DELAY = timedelta(minutes=1)
+    MAX_DELAY = timedelta(hours=1)
+    MAX_ATTEMPTS = 8
+
+    def __init__(self, db, transport):
+        self.db = db
+        self.transport = transport
+
+    def enqueue(self, recipient, subject, html_body, dedup_key=None, digest_key=None):
+        """Dodaje poruku u red i budi planer; vraća False ako je poruka duplikat"""
+        added = self.db.enqueue_email(recipient, subject, html_body, dedup_key, digest_key)
+        if added:
+            job_scheduler.wake()
+        return added
+
+    def schedule(self, settings, last_run, now):
+        """Raspored za scheduler.JobScheduler: vreme prvog sledećeg pokušaja ili None"""
+        return self.db.get_next_email_attempt()
+
+    def backoff(self, attempts):
+        """Razmak do sledećeg pokušaja posle attempts neuspelih pokušaja"""
+        return min(self.BASE_DELAY * (2 ** max(attempts - 1, 0)), self.MAX_DELAY)
+
+    def flush(self, now=None):
+        """Šalje sve poruke kojima je došlo vreme; vraća broj poslatih i neuspelih slanja"""
+        now = now or datetime.now()
+        groups = {}
+        for message in self.db.get_due_emails(now):
+            key = (message['recipient'], message['digest_key'] or f"#{message['id']}")
+            groups.setdefault(key, []).append(message)
+
+        result = {'sent': 0, 'failed': 0}
+        for messages in groups.values():
+            ids = [message['id'] for message in messages]
+            subject, html_body = self._compose(messages)
+            try:
+                self.transport.send(subject, html_body, messages[0]['recipient'])
+            except Exception as e:
+                attempts = max(message['attempts'] for message in messages) + 1
+                self.db.mark_emails_failed(ids, str(e), now + self.backoff(attempts), self.MAX_ATTEMPTS)
+                print(f"✗ Slanje email-a nije uspelo (pokušaj {attempts}): {e}")
+                result['failed'] += 1
+            else:
+                self.db.mark_emails_sent(ids)
+                result['sent'] += 1
+        return result
+
+    @staticmethod
+    def _compose(messages):
+        """Jedna poruka ostaje ista; više poruka se spaja u zbirnu"""
+        if len(messages) == 1:
+            return messages[0]['subject'], messages[0]['html_body']
+        subjects = list(dict.fromkeys(message['subject'] for message in messages))
+        subject = subjects[0] if len(subjects) == 1 else f"Obaveštenja ({len(messages)})"
+        html_body = '<hr>'.join(message['html_body'] for message in messages)
+        return subject, html_body
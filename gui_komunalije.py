@@ -2,18 +2,28 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from tkcalendar import DateEntry
+from gui_widgets import export_table, render_pdf
 
 
 class KomunalijeTab:
     """Tab za plaćanje komunalija"""
-    def __init__(self, parent, db):
+    def __init__(self, parent, db, prefetched=None):
         self.parent = parent
         self.db = db
         
         self.all_bills = []
         
         self.setup_ui()
-        self.load_bills()
+        self.load_bills(prefetched)
+    
+    @staticmethod
+    def fetch(db):
+        """Podaci za load_bills (može i iz pozadinske niti, vidi LazyNotebook)"""
+        bills = db.get_all_utility_bills(include_archived=False)
+        
+        # Sortiranje po bill_date (najnoviji prvi)
+        bills.sort(key=lambda x: datetime.strptime(x['bill_date'], '%d.%m.%Y'), reverse=True)
+        return bills
     
     def setup_ui(self):
         # Toolbar
@@ -29,6 +39,7 @@ class KomunalijeTab:
         ttk.Button(toolbar, text="Arhiva", command=self.open_archive).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="PDF Potvrda", command=self.generate_receipt_pdf).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="CSV/Excel", command=self.export_list).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="Osveži", command=self.load_bills).pack(side=tk.LEFT, padx=2)
         
@@ -222,15 +233,12 @@ class KomunalijeTab:
         
         return balances
     
-    def load_bills(self):
+    def load_bills(self, bills=None):
         """Učitaj sve račune i sortuj ih po datumu (najnoviji prvi)"""
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        self.all_bills = self.db.get_all_utility_bills(include_archived=False)
-        
-        # Sortiranje po bill_date (najnoviji prvi)
-        self.all_bills.sort(key=lambda x: datetime.strptime(x['bill_date'], '%d.%m.%Y'), reverse=True)
+        self.all_bills = bills if bills is not None else self.fetch(self.db)
         
         # Refresh type combo
         self.type_combo['values'] = ['Svi'] + [t['name'] for t in self.db.get_all_utility_types()]
@@ -389,6 +397,13 @@ class KomunalijeTab:
     def manage_utility_types(self):
         UtilityTypesWindow(self.parent, self.db, self.load_bills)
     
+    def export_list(self):
+        """Izvoz računa u CSV/XLSX sa trenutnim filterima (status, tip, mesec, godina)"""
+        values = (self.filter_combo.get(), self.type_combo.get(), self.month_combo.get(), self.year_combo.get())
+        status, utility_type, month, year = [v if v not in ('Svi', 'Sve') else None for v in values]
+        export_table(self.parent, self.db, 'utility_bills',
+                     {'status': status, 'type': utility_type, 'month': month, 'year': year})
+    
     def generate_receipt_pdf(self):
         """Generiši PDF potvrdu o plaćanju"""
         selection = self.tree.selection()
@@ -407,12 +422,10 @@ class KomunalijeTab:
                 "Da li ipak želite da kreirate potvrdu?"):
                 return
         
-        try:
-            from pdf_generator import PDFGenerator
-            pdf_gen = PDFGenerator(self.db)
-            
-            filename = pdf_gen.generate_utility_payment_receipt(bill_id)
-            
+        from pdf_generator import PDFGenerator
+        pdf_gen = PDFGenerator(self.db)
+        
+        def done(filename):
             # Ponudi otvaranje PDF-a
             response = messagebox.askyesno(
                 "Uspeh", 
@@ -422,9 +435,9 @@ class KomunalijeTab:
             if response:
                 import os
                 os.startfile(filename)
-                
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri kreiranju PDF-a: {str(e)}")
+        
+        render_pdf(self.parent, lambda progress: pdf_gen.generate_utility_payment_receipt(bill_id, progress_callback=progress),
+                   done, title="PDF Potvrda")
 
 
 class UtilityTypesWindow:
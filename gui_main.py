@@ -4,24 +4,33 @@ from datetime import datetime
 from tkcalendar import DateEntry
 from gui_settings import SettingsWindow
 from gui_vendors import VendorsWindow
-from pdf_generator import PDFGenerator
+from gui_widgets import AutocompleteCombobox, export_table, render_pdf
+from lookup_cache import lookup_cache
+from lazy_imports import lazy_pdf_generator
 import os
 
 
 class ZaduzenjaTab:
     """Tab za plaćanje zaduženja (dobavljači)"""
-    def __init__(self, parent, db, notification_manager):
+    def __init__(self, parent, db, notification_manager, prefetched=None):
         self.parent = parent
         self.db = db
         self.notification_manager = notification_manager
-        self.pdf_generator = PDFGenerator(db)
+        self.pdf_generator = lazy_pdf_generator(db)
         
         self.all_invoices = []
+        # Računi prikazani u tabeli, istim redosledom (za izveštaj bez čitanja tabele)
+        self.displayed_invoices = []
         
         self.setup_ui()
-        self.load_invoices()
+        self.load_invoices(prefetched)
         self.check_notifications_on_startup()
     
+    @staticmethod
+    def fetch(db):
+        """Podaci za load_invoices (može i iz pozadinske niti, vidi LazyNotebook)"""
+        return db.get_all_invoices_with_payment_summary(include_archived=False)
+    
     def setup_ui(self):
         # Toolbar
         toolbar = ttk.Frame(self.parent)
@@ -32,10 +41,14 @@ class ZaduzenjaTab:
         ttk.Button(toolbar, text="Izmeni", command=self.edit_invoice).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Arhiviraj", command=self.archive_invoice).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
+        ttk.Button(toolbar, text="Plati označene", command=self.pay_selected_invoices).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Arhiviraj plaćene", command=self.archive_selected_invoices).pack(side=tk.LEFT, padx=2)
+        ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="Dobavljači", command=self.open_vendors).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Arhiva", command=self.open_archive).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="PDF Izveštaj", command=self.generate_pdf_report).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="CSV/Excel", command=self.export_list).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Osveži", command=self.load_invoices).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="Podešavanja", command=self.open_settings).pack(side=tk.LEFT, padx=2)
@@ -81,7 +94,8 @@ class ZaduzenjaTab:
         # Tabela sa novim kolonama
         columns = ('Datum fakture', 'Datum valute', 'Dobavljač', 'Br. otpremnice', 
                 'Iznos (RSD)', 'Plaćeno (RSD)', 'Preostalo (RSD)', 'Status', 'Posl. uplata', 'Napomena')
-        self.tree = ttk.Treeview(table_container, columns=columns, show='headings', selectmode='browse')
+        # 'extended' omogućava izbor više računa (Ctrl/Shift) za grupne akcije
+        self.tree = ttk.Treeview(table_container, columns=columns, show='headings', selectmode='extended')
         
         for col in columns:
             self.tree.heading(col, text=col)
@@ -116,11 +130,11 @@ class ZaduzenjaTab:
         self.status_bar = ttk.Label(self.parent, text="Spremno", relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
     
-    def load_invoices(self):
+    def load_invoices(self, invoices=None):
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        self.all_invoices = self.db.get_all_invoices(include_archived=False)
+        self.all_invoices = invoices if invoices is not None else self.fetch(self.db)
         self.apply_filters()
         self.update_status_bar()
     
@@ -134,24 +148,16 @@ class ZaduzenjaTab:
         filter_value = self.filter_combo.get()
         
         if filter_value == 'Neplaćeni':
-            filtered = [inv for inv in filtered if self.db.get_payment_status(inv['id']) == 'Neplaćeno']
+            filtered = [inv for inv in filtered if inv['payment_status'] == 'Neplaćeno']
         elif filter_value == 'Delimično plaćeni':
-            filtered = [inv for inv in filtered if self.db.get_payment_status(inv['id']) == 'Delimično']
+            filtered = [inv for inv in filtered if inv['payment_status'] == 'Delimično']
         elif filter_value == 'Plaćeni':
-            filtered = [inv for inv in filtered if self.db.get_payment_status(inv['id']) == 'Plaćeno']
+            filtered = [inv for inv in filtered if inv['payment_status'] == 'Plaćeno']
         elif filter_value == 'Ističu uskoro':
             settings = self.db.get_settings()
             notification_days = settings.get('notification_days', 7)
-            today = datetime.now().date()
-            temp = []
-            for inv in filtered:
-                status = self.db.get_payment_status(inv['id'])
-                if status in ['Neplaćeno', 'Delimično']:
-                    due_date = datetime.strptime(inv['due_date'], '%d.%m.%Y').date()
-                    days_until_due = (due_date - today).days
-                    if 0 <= days_until_due <= notification_days:
-                        temp.append(inv)
-            filtered = temp
+            due_ids = {inv['id'] for inv in self.db.get_due_invoices(notification_days)}
+            filtered = [inv for inv in filtered if inv['id'] in due_ids]
         
         # Search
         search_text = self.search_entry.get().strip().lower()
@@ -179,16 +185,16 @@ class ZaduzenjaTab:
             filtered.sort(key=lambda x: x[sort_key] if x[sort_key] else '')
         
         # Prikaži
+        self.displayed_invoices = filtered
         settings = self.db.get_settings()
         notification_days = settings.get('notification_days', 7)
         today = datetime.now().date()
         
         for invoice in filtered:
-            invoice_id = invoice['id']
-            total_paid = self.db.get_total_paid(invoice_id)
-            remaining = invoice['amount'] - total_paid
-            status = self.db.get_payment_status(invoice_id)
-            last_payment_date = self.db.get_last_payment_date(invoice_id) or "-"
+            total_paid = invoice['total_paid']
+            remaining = invoice['remaining']
+            status = invoice['payment_status']
+            last_payment_date = invoice['last_payment_date'] or "-"
             
             item_id = self.tree.insert('', tk.END, values=(
                 invoice['invoice_date'],
@@ -283,6 +289,60 @@ class ZaduzenjaTab:
             messagebox.showinfo("Uspeh", "Račun je uspešno arhiviran.")
             self.load_invoices()
     
+    def get_selected_invoice_ids(self):
+        return [self.tree.item(item)['tags'][-1] for item in self.tree.selection()]
+    
+    def pay_selected_invoices(self):
+        invoice_ids = self.get_selected_invoice_ids()
+        if not invoice_ids:
+            messagebox.showwarning("Upozorenje", "Molim izaberite račune za plaćanje.")
+            return
+        
+        if not messagebox.askyesno(
+            "Potvrda",
+            f"Da li želite da platite preostali iznos za {len(invoice_ids)} označenih računa?"
+        ):
+            return
+        
+        try:
+            summary = self.db.pay_invoices_remaining(invoice_ids)
+        except Exception as e:
+            messagebox.showerror("Greška", f"Greška pri plaćanju računa: {str(e)}")
+            return
+        
+        self.load_invoices()
+        messagebox.showinfo(
+            "Uspeh",
+            f"Plaćeno računa: {summary['paid']}\n"
+            f"Preskočeno (već plaćeni): {summary['skipped']}\n"
+            f"Ukupno uplaćeno: {summary['total_amount']:,.2f} RSD"
+        )
+    
+    def archive_selected_invoices(self):
+        invoice_ids = self.get_selected_invoice_ids()
+        if not invoice_ids:
+            messagebox.showwarning("Upozorenje", "Molim izaberite račune za arhiviranje.")
+            return
+        
+        if not messagebox.askyesno(
+            "Potvrda",
+            f"Da li želite da arhivirate plaćene račune među {len(invoice_ids)} označenih?"
+        ):
+            return
+        
+        try:
+            summary = self.db.archive_paid_invoices(invoice_ids)
+        except Exception as e:
+            messagebox.showerror("Greška", f"Greška pri arhiviranju računa: {str(e)}")
+            return
+        
+        self.load_invoices()
+        messagebox.showinfo(
+            "Uspeh",
+            f"Arhivirano računa: {summary['archived']}\n"
+            f"Preskočeno (nisu potpuno plaćeni): {summary['skipped']}"
+        )
+    
     def open_archive(self):
         ArchiveWindow(self.parent, self.db, self.load_invoices)
     
@@ -293,29 +353,38 @@ class ZaduzenjaTab:
         VendorsWindow(self.parent, self.db, 'vendors')
     
     def generate_pdf_report(self):
-        displayed_invoices = []
-        for item in self.tree.get_children():
-            tags = self.tree.item(item)['tags']
-            invoice_id = tags[-1]
-            invoice = self.db.get_invoice_by_id(invoice_id)
-            if invoice:
-                invoice['total_paid'] = self.db.get_total_paid(invoice_id)
-                invoice['remaining'] = invoice['amount'] - invoice['total_paid']
-                invoice['payment_status'] = self.db.get_payment_status(invoice_id)
-                displayed_invoices.append(invoice)
-        
-        if not displayed_invoices:
+        invoice_ids = [invoice['id'] for invoice in self.displayed_invoices]
+        
+        if not invoice_ids:
             messagebox.showwarning("Upozorenje", "Nema računa za prikaz u PDF-u.")
             return
         
-        try:
-            filename = self.pdf_generator.generate_invoice_report(displayed_invoices)
+        def build(progress):
+            # Radi u pozadinskoj niti (render_service)
+            displayed_invoices = self.db.get_invoices_with_payment_summary(invoice_ids)
+            return self.pdf_generator.generate_invoice_report(displayed_invoices, progress_callback=progress)
+        
+        def done(filename):
             messagebox.showinfo("Uspeh", f"PDF izveštaj je kreiran: {filename}")
             
             if messagebox.askyesno("Otvori PDF", "Da li želite da otvorite PDF?"):
                 os.startfile(filename)
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri kreiranju PDF-a: {str(e)}")
+        
+        render_pdf(self.parent, build, done, title="PDF Izveštaj")
+    
+    def export_list(self):
+        """Izvoz računa u CSV/XLSX sa trenutnim filterom, pretragom i sortiranjem"""
+        filters = {
+            'search': self.search_entry.get().strip(),
+            'search_field': 'vendor_name' if self.search_field_combo.get() == 'Dobavljač' else 'delivery_note_number',
+            'order': {'Datum fakture': 'invoice_date', 'Dobavljač': 'vendor_name', 'Iznos': 'amount'}.get(self.sort_combo.get(), 'due_date'),
+        }
+        filter_value = self.filter_combo.get()
+        if filter_value == 'Ističu uskoro':
+            filters['due_within'] = self.db.get_settings().get('notification_days', 7)
+        elif filter_value != 'Svi':
+            filters['status'] = {'Neplaćeni': 'Neplaćeno', 'Delimično plaćeni': 'Delimično', 'Plaćeni': 'Plaćeno'}[filter_value]
+        export_table(self.parent, self.db, 'invoices', filters)
     
     def check_notifications_on_startup(self):
         due_invoices = self.notification_manager.check_due_invoices()
@@ -748,10 +817,7 @@ class InvoiceDialog:
         row += 1
         
         ttk.Label(form_frame, text="Dobavljač:").grid(row=row, column=0, sticky=tk.W, pady=5)
-        self.vendor_combo = ttk.Combobox(form_frame, width=37, state='readonly')
-        vendors = self.db.get_all_vendors()
-        self.vendor_map = {v.get('name', ''): v.get('id') for v in vendors}
-        self.vendor_combo['values'] = list(self.vendor_map.keys())
+        self.vendor_combo = AutocompleteCombobox(form_frame, lookup_cache.vendors(self.db), width=37)
         self.vendor_combo.grid(row=row, column=1, pady=5, sticky=tk.EW)
         row += 1
         
@@ -790,7 +856,7 @@ class InvoiceDialog:
         self.invoice_date_entry.set_date(datetime.strptime(invoice['invoice_date'], '%d.%m.%Y'))
         self.due_date_entry.set_date(datetime.strptime(invoice['due_date'], '%d.%m.%Y'))
         
-        self.vendor_combo.set(invoice.get('vendor_name', ''))
+        self.vendor_combo.set_initial(invoice.get('vendor_name', ''))
         
         self.delivery_note_entry.delete(0, tk.END)
         self.delivery_note_entry.insert(0, invoice.get('delivery_note_number', ''))
@@ -812,8 +878,8 @@ class InvoiceDialog:
                 messagebox.showerror("Greška", f"Greška pri brisanju: {str(e)}")
     
     def save(self):
-        if not self.vendor_combo.get():
-            messagebox.showerror("Greška", "Molim izaberite dobavljača.")
+        if not self.vendor_combo.is_valid():
+            messagebox.showerror("Greška", "Molim izaberite dobavljača sa liste.")
             return
         
         if not self.delivery_note_entry.get().strip():
@@ -833,7 +899,8 @@ class InvoiceDialog:
         invoice_date = self.invoice_date_entry.get_date().strftime('%d.%m.%Y')
         due_date = self.due_date_entry.get_date().strftime('%d.%m.%Y')
         vendor_name = self.vendor_combo.get()
-        vendor_id = self.vendor_map.get(vendor_name)
+        vendor = self.vendor_combo.get_record()
+        vendor_id = vendor['id'] if vendor else None
         delivery_note = self.delivery_note_entry.get().strip()
         notes = self.notes_text.get('1.0', tk.END).strip()
         
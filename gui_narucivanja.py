@@ -3,21 +3,28 @@ from tkinter import ttk, messagebox
 from datetime import datetime
 from tkcalendar import DateEntry
 from gui_vendors import VendorsWindow
-from pdf_generator import PDFGenerator
+from gui_widgets import AutocompleteCombobox, BatchExportDialog, export_table, render_pdf, send_documents
+from lookup_cache import lookup_cache
+from lazy_imports import lazy_pdf_generator
 import os
 
 
 class NarucivanjeTab:
     """Tab za naručivanje robe (dobavljači)"""
-    def __init__(self, parent, db):
+    def __init__(self, parent, db, prefetched=None):
         self.parent = parent
         self.db = db
-        self.pdf_generator = PDFGenerator(db)
+        self.pdf_generator = lazy_pdf_generator(db)
 
         self.all_orders = []
 
         self.setup_ui()
-        self.load_orders()
+        self.load_orders(prefetched)
+
+    @staticmethod
+    def fetch(db):
+        """Podaci za load_orders (može i iz pozadinske niti, vidi LazyNotebook)"""
+        return db.get_all_orders(include_archived=False)
 
     def setup_ui(self):
         # Toolbar
@@ -35,6 +42,9 @@ class NarucivanjeTab:
         ttk.Button(toolbar, text="Arhiva", command=self.open_archive).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="PDF Narudžbina", command=self.generate_pdf).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Grupni PDF", command=self.batch_export_pdf).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Pošalji email", command=self.send_email).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="CSV/Excel", command=self.export_list).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Osveži", command=self.load_orders).pack(side=tk.LEFT, padx=2)
 
         # Filter
@@ -79,8 +89,8 @@ class NarucivanjeTab:
         self.status_bar = ttk.Label(self.parent, text="Spremno", relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
-    def load_orders(self):
-        self.all_orders = self.db.get_all_orders(include_archived=False)
+    def load_orders(self, orders=None):
+        self.all_orders = orders if orders is not None else self.fetch(self.db)
         self.apply_filters()
         self.status_bar.config(text=f"Učitano {len(self.all_orders)} narudžbina")
 
@@ -99,15 +109,11 @@ class NarucivanjeTab:
                 if search_text not in searchable:
                     continue
 
-            # Prebroj stavke
-            items = self.db.get_order_items(order['id'])
-            num_items = len(items)
-
             self.tree.insert('', tk.END, values=(
                 order['order_number'],
                 order['order_date'],
                 order['vendor_name'],
-                num_items,
+                order['item_count'],
                 order.get('notes', '')
             ), tags=(order['id'],))
 
@@ -121,6 +127,10 @@ class NarucivanjeTab:
             return
 
         order_id = self.tree.item(selection[0])['tags'][0]
+        self.open_order(order_id)
+
+    def open_order(self, order_id):
+        """Otvara izmenu narudžbine (i za komandu 'open order' iz drugog pokretanja)"""
         OrderDialog(self.parent, self.db, self.load_orders, order_id=order_id)
 
     def delete_order(self):
@@ -171,14 +181,29 @@ class NarucivanjeTab:
             return
 
         order_id = self.tree.item(selection[0])['tags'][0]
-        filename = self.pdf_generator.generate_order_pdf(order_id)
 
-        if filename:
-            messagebox.showinfo("Uspeh", f"PDF narudžbine je kreiran:\n{filename}")
-            if os.path.exists(filename):
-                os.startfile(filename)
-        else:
-            messagebox.showerror("Greška", "Greška pri kreiranju PDF-a.")
+        def done(filename):
+            if filename:
+                messagebox.showinfo("Uspeh", f"PDF narudžbine je kreiran:\n{filename}")
+                if os.path.exists(filename):
+                    os.startfile(filename)
+            else:
+                messagebox.showerror("Greška", "Greška pri kreiranju PDF-a.")
+
+        render_pdf(self.parent, lambda progress: self.pdf_generator.generate_order_pdf(order_id, progress_callback=progress),
+                   done, title="PDF Narudžbina")
+
+    def batch_export_pdf(self):
+        selected_ids = [self.tree.item(item)['tags'][0] for item in self.tree.selection()]
+        BatchExportDialog(self.parent, self.db, 'order', selected_ids)
+
+    def send_email(self):
+        selected_ids = [self.tree.item(item)['tags'][0] for item in self.tree.selection()]
+        send_documents(self.parent, self.db, 'order', selected_ids)
+
+    def export_list(self):
+        """Izvoz narudžbina u CSV/XLSX sa trenutnom pretragom"""
+        export_table(self.parent, self.db, 'orders', {'search': self.search_entry.get().strip()})
 
 
 class OrderDialog:
@@ -214,10 +239,7 @@ class OrderDialog:
 
         # Dobavljač
         ttk.Label(header_frame, text="Dobavljač:").grid(row=row, column=0, sticky=tk.W, pady=5)
-        self.vendor_combo = ttk.Combobox(header_frame, width=27, state='readonly')
-        vendors = self.db.get_all_vendors()
-        self.vendor_map = {v['name']: v['id'] for v in vendors}
-        self.vendor_combo['values'] = list(self.vendor_map.keys())
+        self.vendor_combo = AutocompleteCombobox(header_frame, lookup_cache.vendors(self.db), width=27)
         self.vendor_combo.grid(row=row, column=1, pady=5, sticky=tk.W)
         row += 1
 
@@ -278,7 +300,7 @@ class OrderDialog:
         self.order_date_entry.set_date(date_obj)
 
         # Postavi dobavljača
-        self.vendor_combo.set(order['vendor_name'])
+        self.vendor_combo.set_initial(order['vendor_name'])
 
         # Postavi napomenu
         if order.get('notes'):
@@ -288,6 +310,7 @@ class OrderDialog:
         items = self.db.get_order_items(self.order_id)
         for item in items:
             self.items.append({
+                'id': item['id'],
                 'article_id': item['article_id'],
                 'article_code': item['article_code'],
                 'article_name': item['article_name'],
@@ -327,8 +350,8 @@ class OrderDialog:
             ))
 
     def save(self):
-        if not self.vendor_combo.get():
-            messagebox.showerror("Greška", "Molim izaberite dobavljača.")
+        if not self.vendor_combo.is_valid():
+            messagebox.showerror("Greška", "Molim izaberite dobavljača sa liste.")
             return
 
         if not self.items:
@@ -336,7 +359,8 @@ class OrderDialog:
             return
 
         vendor_name = self.vendor_combo.get()
-        vendor_id = self.vendor_map.get(vendor_name)
+        vendor = self.vendor_combo.get_record()
+        vendor_id = vendor['id'] if vendor else None
         order_date = self.order_date_entry.get_date().strftime('%d.%m.%Y')
         notes = self.notes_entry.get().strip()
 
@@ -415,11 +439,9 @@ class OrderItemDialog:
 
         # Izbor iz liste
         ttk.Label(form_frame, text="Artikal:").grid(row=row, column=0, sticky=tk.W, pady=5)
-        self.article_combo = ttk.Combobox(form_frame, width=47, state='readonly')
-        articles = self.db.get_all_articles()
-        self.article_map = {f"{a['article_code']} - {a['name']}": a for a in articles}
-        self.article_combo['values'] = list(self.article_map.keys())
-        self.article_combo.bind('<<ComboboxSelected>>', self.on_article_selected)
+        self.article_combo = AutocompleteCombobox(
+            form_frame, lookup_cache.articles(self.db), width=47, on_select=self.on_article_selected
+        )
         self.article_combo.grid(row=row, column=1, pady=5, sticky=tk.EW)
         row += 1
 
@@ -513,20 +535,18 @@ class OrderItemDialog:
         self.unit_entry.insert(0, article['unit'])
 
         # Selektuj u combo box
-        key = f"{article['article_code']} - {article['name']}"
-        if key in self.article_map:
-            self.article_combo.set(key)
+        self.article_combo.set(f"{article['article_code']} - {article['name']}")
 
     def on_article_selected(self, event):
         """Kada korisnik izabere artikal iz combo boxa"""
-        selected = self.article_combo.get()
-        if selected in self.article_map:
-            article = self.article_map[selected]
+        article = self.article_combo.get_record()
+        if article:
             self.populate_article_data(article)
 
     def add(self):
         """Dodaje artikal u narudžbinu"""
-        if not self.article_combo.get():
+        article = self.article_combo.get_record()
+        if not article:
             messagebox.showerror("Greška", "Molim izaberite artikal.")
             return
 
@@ -536,9 +556,6 @@ class OrderItemDialog:
             messagebox.showerror("Greška", "Molim unesite validnu količinu.")
             return
 
-        selected = self.article_combo.get()
-        article = self.article_map[selected]
-
         item = {
             'article_id': article['id'],
             'article_code': article['article_code'],
@@ -695,15 +712,11 @@ class OrderArchiveWindow:
         archived_orders = [order for order in all_orders if order.get('is_archived')]
 
         for order in archived_orders:
-            # Prebroj stavke
-            items = self.db.get_order_items(order['id'])
-            num_items = len(items)
-
             self.tree.insert('', tk.END, values=(
                 order['order_number'],
                 order['order_date'],
                 order['vendor_name'],
-                num_items,
+                order['item_count'],
                 order.get('notes', '')
             ), tags=(order['id'],))
 
@@ -3,21 +3,28 @@ from tkinter import ttk, messagebox
 from datetime import datetime
 from tkcalendar import DateEntry
 from gui_vendors import VendorsWindow
-from pdf_generator import PDFGenerator
+from gui_widgets import AutocompleteCombobox, BatchExportDialog, export_table, render_pdf, send_documents
+from lookup_cache import lookup_cache
+from lazy_imports import lazy_pdf_generator
 import os
 
 
 class PredracuniTab:
     """Tab za predračune (kupci i artikli)"""
-    def __init__(self, parent, db):
+    def __init__(self, parent, db, prefetched=None):
         self.parent = parent
         self.db = db
-        self.pdf_generator = PDFGenerator(db)
+        self.pdf_generator = lazy_pdf_generator(db)
         
         self.all_proformas = []
         
         self.setup_ui()
-        self.load_proformas()
+        self.load_proformas(prefetched)
+    
+    @staticmethod
+    def fetch(db):
+        """Podaci za load_proformas (može i iz pozadinske niti, vidi LazyNotebook)"""
+        return db.get_proformas_with_payment_summary(archived=False)
     
     def setup_ui(self):
         # Toolbar
@@ -35,6 +42,9 @@ class PredracuniTab:
         ttk.Button(toolbar, text="Arhiva", command=self.open_archive).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="PDF Predračun", command=self.generate_pdf).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Grupni PDF", command=self.batch_export_pdf).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Pošalji email", command=self.send_email).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="CSV/Excel", command=self.export_list).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Osveži", command=self.load_proformas).pack(side=tk.LEFT, padx=2)
         
         # Filter
@@ -63,7 +73,8 @@ class PredracuniTab:
         
         # Tabela sa novim kolonama
         columns = ('Broj predračuna', 'Datum', 'Kupac', 'Ukupan iznos', 'Plaćeno', 'Preostalo', 'Status', 'Posl. uplata', 'Napomena')
-        self.tree = ttk.Treeview(table_container, columns=columns, show='headings', selectmode='browse')
+        # extended: više označenih predračuna za grupni PDF
+        self.tree = ttk.Treeview(table_container, columns=columns, show='headings', selectmode='extended')
         
         for col in columns:
             self.tree.heading(col, text=col)
@@ -97,11 +108,11 @@ class PredracuniTab:
         self.status_bar = ttk.Label(self.parent, text="Spremno", relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
     
-    def load_proformas(self):
+    def load_proformas(self, proformas=None):
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        self.all_proformas = self.db.get_all_proforma_invoices(include_archived=False)
+        self.all_proformas = proformas if proformas is not None else self.fetch(self.db)
         self.apply_filters()
     
     def apply_filters(self):
@@ -113,7 +124,7 @@ class PredracuniTab:
         # Filter po statusu
         filter_value = self.filter_combo.get()
         if filter_value != 'Svi':
-            filtered = [p for p in filtered if self.db.get_payment_status_proforma(p['id']) == filter_value]
+            filtered = [p for p in filtered if p['status'] == filter_value]
         
         # Search
         search_text = self.search_entry.get().strip().lower()
@@ -122,11 +133,10 @@ class PredracuniTab:
         
         # Prikaži
         for proforma in filtered:
-            proforma_id = proforma['id']
-            total_paid = self.db.get_total_paid_proforma(proforma_id)
-            remaining = proforma['total_amount'] - total_paid
-            status = self.db.get_payment_status_proforma(proforma_id)
-            last_payment_date = self.db.get_last_payment_date_proforma(proforma_id) or "-"
+            total_paid = proforma['total_paid']
+            remaining = proforma['remaining']
+            status = proforma['status']
+            last_payment_date = proforma['last_payment_date'] or "-"
             
             notes = proforma['notes'] or ''
             notes_display = notes[:50] + '...' if len(notes) > 50 else notes
@@ -184,7 +194,10 @@ class PredracuniTab:
             return
         
         tags = self.tree.item(selection[0])['tags']
-        proforma_id = tags[-1]
+        self.open_proforma(tags[-1])
+    
+    def open_proforma(self, proforma_id):
+        """Otvara izmenu predračuna (i za komandu 'open proforma' iz drugog pokretanja)"""
         ProformaEditDialog(self.parent, self.db, proforma_id, self.load_proformas)
 
     def delete_proforma(self):
@@ -247,14 +260,30 @@ class PredracuniTab:
         tags = self.tree.item(selection[0])['tags']
         proforma_id = tags[-1]
         
-        try:
-            filename = self.pdf_generator.generate_proforma_pdf(proforma_id)
+        def done(filename):
             messagebox.showinfo("Uspeh", f"PDF predračun je kreiran: {filename}")
             
             if messagebox.askyesno("Otvori PDF", "Da li želite da otvorite PDF?"):
                 os.startfile(filename)
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri kreiranju PDF-a: {str(e)}")
+        
+        render_pdf(self.parent, lambda progress: self.pdf_generator.generate_proforma_pdf(proforma_id, progress_callback=progress),
+                   done, title="PDF Predračun")
+    
+    def batch_export_pdf(self):
+        selected_ids = [self.tree.item(item)['tags'][-1] for item in self.tree.selection()]
+        BatchExportDialog(self.parent, self.db, 'proforma', selected_ids)
+    
+    def send_email(self):
+        selected_ids = [self.tree.item(item)['tags'][-1] for item in self.tree.selection()]
+        send_documents(self.parent, self.db, 'proforma', selected_ids)
+    
+    def export_list(self):
+        """Izvoz predračuna u CSV/XLSX sa trenutnim filterom i pretragom"""
+        filter_value = self.filter_combo.get()
+        export_table(self.parent, self.db, 'proformas', {
+            'status': filter_value if filter_value != 'Svi' else None,
+            'search': self.search_entry.get().strip(),
+        })
 
 
 class ProformaPaymentDialog:
@@ -897,11 +926,9 @@ class ItemDialog:
         
         # Izbor iz liste
         ttk.Label(form_frame, text="Artikal:").grid(row=row, column=0, sticky=tk.W, pady=5)
-        self.article_combo = ttk.Combobox(form_frame, width=47, state='readonly')
-        articles = self.db.get_all_articles()
-        self.article_map = {f"{a['article_code']} - {a['name']}": a for a in articles}
-        self.article_combo['values'] = list(self.article_map.keys())
-        self.article_combo.bind('<<ComboboxSelected>>', self.on_article_selected)
+        self.article_combo = AutocompleteCombobox(
+            form_frame, lookup_cache.articles(self.db), width=47, on_select=self.on_article_selected
+        )
         self.article_combo.grid(row=row, column=1, pady=5, sticky=tk.EW)
         row += 1
         
@@ -1012,17 +1039,14 @@ class ItemDialog:
         self.discount_entry.insert(0, str(article['discount']))
         
         # Selektuj u combo box
-        key = f"{article['article_code']} - {article['name']}"
-        if key in self.article_map:
-            self.article_combo.set(key)
+        self.article_combo.set(f"{article['article_code']} - {article['name']}")
         
         self.calculate_total()
     
     def on_article_selected(self, event):
         """Kada korisnik izabere artikal iz combo boxa"""
-        selected = self.article_combo.get()
-        if selected in self.article_map:
-            article = self.article_map[selected]
+        article = self.article_combo.get_record()
+        if article:
             self.populate_article_data(article)
     
     def calculate_total(self, event=None):
@@ -1042,8 +1066,8 @@ class ItemDialog:
     
     def add(self):
         """Dodaje stavku u predračun"""
-        selected = self.article_combo.get()
-        if not selected:
+        article = self.article_combo.get_record()
+        if not article:
             messagebox.showerror("Greška", "Molim izaberite artikal.")
             return
         
@@ -1055,8 +1079,6 @@ class ItemDialog:
             messagebox.showerror("Greška", "Molim unesite validne brojeve.")
             return
         
-        article = self.article_map[selected]
-        
         subtotal = quantity * price
         discount_amount = subtotal * (discount / 100)
         total = subtotal - discount_amount
@@ -1124,14 +1146,12 @@ class ProformaArchiveWindow:
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        proformas = self.db.get_all_proforma_invoices(include_archived=True)
-        archived = [p for p in proformas if p.get('is_archived')]
+        archived = self.db.get_proformas_with_payment_summary(archived=True)
         
         for proforma in archived:
-            proforma_id = proforma['id']
-            total_paid = self.db.get_total_paid_proforma(proforma_id)
-            status = self.db.get_payment_status_proforma(proforma_id)
-            last_payment_date = self.db.get_last_payment_date_proforma(proforma_id) or "-"
+            total_paid = proforma['total_paid']
+            status = proforma['status']
+            last_payment_date = proforma['last_payment_date'] or "-"
             
             notes = proforma['notes'] or ''
             notes_display = notes[:50] + '...' if len(notes) > 50 else notes
@@ -1224,7 +1244,6 @@ class ProformaDialog:
         self.callback = callback
         
         self.items = []
-        self.customer_map = {}
         
         # Ako je edit mode, učitaj postojeće podatke
         if proforma_id is not None:
@@ -1249,10 +1268,7 @@ class ProformaDialog:
         self.invoice_date_entry.grid(row=row, column=1, pady=5, sticky=tk.W)
         
         ttk.Label(header_frame, text="Kupac:").grid(row=row, column=2, sticky=tk.W, pady=5, padx=(20, 0))
-        self.customer_combo = ttk.Combobox(header_frame, width=30, state='readonly')
-        customers = self.db.get_all_customers()
-        self.customer_map = {c['name']: c['id'] for c in customers}
-        self.customer_combo['values'] = list(self.customer_map.keys())
+        self.customer_combo = AutocompleteCombobox(header_frame, lookup_cache.customers(self.db), width=30)
         self.customer_combo.grid(row=row, column=3, pady=5, sticky=tk.W)
         
         row += 1
@@ -1327,7 +1343,7 @@ class ProformaDialog:
             
             # Postavi kupca
             customer_name = self.proforma['customer_name']
-            self.customer_combo.set(customer_name)
+            self.customer_combo.set_initial(customer_name)
             
             # Postavi napomenu
             self.notes_entry.delete('1.0', tk.END)
@@ -1379,8 +1395,8 @@ class ProformaDialog:
     
     def save(self):
         """Sačuvaj predračun"""
-        if not self.customer_combo.get():
-            messagebox.showerror("Greška", "Molim izaberite kupca.")
+        if not self.customer_combo.is_valid():
+            messagebox.showerror("Greška", "Molim izaberite kupca sa liste.")
             return
         
         if not self.items:
@@ -1388,7 +1404,8 @@ class ProformaDialog:
             return
         
         customer_name = self.customer_combo.get()
-        customer_id = self.customer_map.get(customer_name)
+        customer = self.customer_combo.get_record()
+        customer_id = customer['id'] if customer else None
         invoice_date = self.invoice_date_entry.get_date().strftime('%d.%m.%Y')
         notes = self.notes_entry.get('1.0', tk.END).strip()
         
@@ -3,18 +3,30 @@ from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
 from tkcalendar import DateEntry
 import calendar
+from gui_widgets import export_table, render_pdf
 
 
 class PrometTab:
     """Tab za kontrolu prometa"""
-    def __init__(self, parent, db):
+    def __init__(self, parent, db, prefetched=None):
         self.parent = parent
         self.db = db
 
         self.all_entries = []
+        # Unosi prikazani u tabeli, istim redosledom (za izvoz bez ponovnog traženja po ID-ju)
+        self.displayed_entries = []
 
         self.setup_ui()
-        self.load_entries()
+        self.load_entries(prefetched)
+
+    @staticmethod
+    def fetch(db):
+        """Podaci za load_entries (može i iz pozadinske niti, vidi LazyNotebook)"""
+        entries = db.get_all_revenue_entries()
+
+        # Sortiranje po date_from (najnoviji prvi)
+        entries.sort(key=lambda x: datetime.strptime(x['date_from'], '%d.%m.%Y'), reverse=True)
+        return entries
 
     def setup_ui(self):
         # Toolbar
@@ -27,6 +39,7 @@ class PrometTab:
         ttk.Button(toolbar, text="Obriši", command=self.delete_entry).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="PDF Izvoz", command=self.generate_pdf).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="CSV/Excel", command=self.export_list).pack(side=tk.LEFT, padx=2)
         ttk.Separator(toolbar, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
         ttk.Button(toolbar, text="Osveži", command=self.load_entries).pack(side=tk.LEFT, padx=2)
 
@@ -161,15 +174,12 @@ class PrometTab:
         ttk.Label(row3, text=f"⚪ Neplaćeno: {unpaid_amount:,.2f} RSD ({len(unpaid_entries)} unosa)", 
                  font=('Arial', 9), foreground='red').pack(side=tk.LEFT, padx=5)
 
-    def load_entries(self):
+    def load_entries(self, entries=None):
         """Učitaj sve unose i sortuj od najnovijeg"""
         for item in self.tree.get_children():
             self.tree.delete(item)
 
-        self.all_entries = self.db.get_all_revenue_entries()
-
-        # Sortiranje po date_from (najnoviji prvi)
-        self.all_entries.sort(key=lambda x: datetime.strptime(x['date_from'], '%d.%m.%Y'), reverse=True)
+        self.all_entries = entries if entries is not None else self.fetch(self.db)
 
         self.apply_filters()
 
@@ -178,6 +188,8 @@ class PrometTab:
         for item in self.tree.get_children():
             self.tree.delete(item)
 
+        self.displayed_entries = entries
+
         for entry in entries:
             payment_status = entry.get('payment_status', 'Neplaćeno')
 
@@ -265,32 +277,32 @@ class PrometTab:
         """Otvori prozor za plaćanje pazara"""
         PazarPaymentDialog(self.parent, self.db, self.load_entries)
 
+    def export_list(self):
+        """Izvoz prometa u CSV/XLSX za period iz filtera"""
+        export_table(self.parent, self.db, 'revenue', {
+            'date_from': self.filter_date_from.get_date(),
+            'date_to': self.filter_date_to.get_date(),
+        })
+
     def generate_pdf(self):
         """Generiši PDF izvoz"""
-        # Uzmi prikazane unose (filtrirane)
-        filtered_entries = []
-        for item in self.tree.get_children():
-            entry_id = self.tree.item(item)['tags'][-1]
-            entry = next((e for e in self.all_entries if e['id'] == entry_id), None)
-            if entry:
-                filtered_entries.append(entry)
+        # Prikazani (filtrirani) unosi, istim redosledom kao u tabeli
+        filtered_entries = list(self.displayed_entries)
 
         if not filtered_entries:
             messagebox.showwarning("Upozorenje", "Nema podataka za izvoz.")
             return
 
-        try:
-            from pdf_generator import PDFGenerator
-            pdf_gen = PDFGenerator(self.db)
-            
-            # Prosleđuj filter period
-            filter_info = {
-                'date_from': self.filter_date_from.get_date().strftime('%d.%m.%Y'),
-                'date_to': self.filter_date_to.get_date().strftime('%d.%m.%Y')
-            }
-            
-            filename = pdf_gen.generate_revenue_report(filtered_entries, filter_info)
-            
+        from pdf_generator import PDFGenerator
+        pdf_gen = PDFGenerator(self.db)
+        
+        # Prosleđuj filter period
+        filter_info = {
+            'date_from': self.filter_date_from.get_date().strftime('%d.%m.%Y'),
+            'date_to': self.filter_date_to.get_date().strftime('%d.%m.%Y')
+        }
+        
+        def done(filename):
             # Ponudi otvaranje PDF-a
             response = messagebox.askyesno(
                 "Uspeh", 
@@ -300,9 +312,10 @@ class PrometTab:
             if response:
                 import os
                 os.startfile(filename)
-                
-        except Exception as e:
-            messagebox.showerror("Greška", f"Greška pri kreiranju PDF-a: {str(e)}")
+        
+        render_pdf(self.parent,
+                   lambda progress: pdf_gen.generate_revenue_report(filtered_entries, filter_info, progress_callback=progress),
+                   done, title="PDF Izvoz")
 
 
 class RevenueDialog:
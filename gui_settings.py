@@ -1,18 +1,27 @@
-# gui_settings.py – Podešavanja sa Gmail OAuth2 podrškom
+# gui_settings.py – Podešavanja sa Gmail OAuth2 i SMTP podrškom
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 
+from credential_store import KEYRING_AVAILABLE
+
 class SettingsWindow:
     PROVIDER_DISPLAY_TO_KEY = {
         "Gmail (OAuth2)": "gmail_oauth",
+        "SMTP server": "smtp",
     }
     PROVIDER_KEY_TO_DISPLAY = {v: k for k, v in PROVIDER_DISPLAY_TO_KEY.items()}
+    SMTP_SECURITY_DISPLAY_TO_KEY = {
+        "STARTTLS": "starttls",
+        "SSL/TLS": "ssl",
+        "Bez zaštite": "none",
+    }
+    SMTP_SECURITY_KEY_TO_DISPLAY = {v: k for k, v in SMTP_SECURITY_DISPLAY_TO_KEY.items()}
 
     def __init__(self, parent, db):
         self.window = tk.Toplevel(parent)
         self.window.title("Podešavanja")
-        self.window.geometry("600x750")
+        self.window.geometry("600x900")
         self.window.transient(parent)
         self.window.grab_set()
 
@@ -166,6 +175,45 @@ class SettingsWindow:
         )
         row += 1
 
+        smtp_frame = ttk.LabelFrame(email_frame, text="SMTP server (provider „SMTP server“)", padding=10)
+        smtp_frame.grid(row=row, column=0, columnspan=2, sticky=tk.EW, pady=(10, 0))
+        row += 1
+
+        ttk.Label(smtp_frame, text="Server:").grid(row=0, column=0, sticky=tk.W, pady=3)
+        self.smtp_host_entry = ttk.Entry(smtp_frame, width=25)
+        self.smtp_host_entry.grid(row=0, column=1, pady=3, sticky=tk.EW)
+        ttk.Label(smtp_frame, text="Port:").grid(row=0, column=2, sticky=tk.W, padx=(10, 0), pady=3)
+        self.smtp_port_entry = ttk.Entry(smtp_frame, width=7)
+        self.smtp_port_entry.grid(row=0, column=3, pady=3, sticky=tk.W)
+
+        ttk.Label(smtp_frame, text="Korisnik:").grid(row=1, column=0, sticky=tk.W, pady=3)
+        self.smtp_user_entry = ttk.Entry(smtp_frame, width=25)
+        self.smtp_user_entry.grid(row=1, column=1, columnspan=3, pady=3, sticky=tk.EW)
+
+        ttk.Label(smtp_frame, text="Lozinka:").grid(row=2, column=0, sticky=tk.W, pady=3)
+        self.smtp_password_entry = ttk.Entry(smtp_frame, width=25, show="*")
+        self.smtp_password_entry.grid(row=2, column=1, columnspan=3, pady=3, sticky=tk.EW)
+
+        ttk.Label(smtp_frame, text="Zaštita:").grid(row=3, column=0, sticky=tk.W, pady=3)
+        self.smtp_security_combo = ttk.Combobox(smtp_frame, width=22, state="readonly")
+        self.smtp_security_combo["values"] = list(self.SMTP_SECURITY_DISPLAY_TO_KEY.keys())
+        self.smtp_security_combo.current(0)
+        self.smtp_security_combo.grid(row=3, column=1, pady=3, sticky=tk.W)
+        ttk.Label(smtp_frame, text="Konekcija:").grid(row=3, column=2, sticky=tk.W, padx=(10, 0), pady=3)
+        self.smtp_connections_spinbox = ttk.Spinbox(smtp_frame, from_=1, to=10, width=5)
+        self.smtp_connections_spinbox.grid(row=3, column=3, pady=3, sticky=tk.W)
+
+        if KEYRING_AVAILABLE:
+            password_note = "Lozinka se čuva u Windows Credential Manager-u, ne u bazi."
+        else:
+            password_note = ("Lozinka se čuva u bazi (invoices.db), ali ne i u backup kopijama.\n"
+                             "Za čuvanje u Windows Credential Manager-u: pip install keyring")
+        ttk.Label(smtp_frame, text=password_note, justify=tk.LEFT, foreground="gray").grid(
+            row=4, column=0, columnspan=4, sticky=tk.W, pady=(5, 0)
+        )
+
+        smtp_frame.columnconfigure(1, weight=1)
+
         ttk.Separator(email_frame, orient=tk.HORIZONTAL).grid(row=row, column=0, columnspan=2, sticky=tk.EW, pady=15)
         row += 1
 
@@ -183,7 +231,8 @@ class SettingsWindow:
             "1. Klikni na „...“ i izaberi credentials.json (preuzet iz Google Cloud konzole).\n"
             "2. Klikni na „Autorizuj Google nalog“, potvrdi login u browseru -> token fajl se kreira.\n"
             "3. Popuni email polja i klikni „Sačuvaj“ nakon što završiš.\n"
-            "4. Program automatski šalje email jednom dnevno u zadato vreme ako postoje računi."
+            "4. Program automatski šalje email jednom dnevno u zadato vreme ako postoje računi.\n"
+            "Za SMTP izaberi provider „SMTP server“ i popuni podatke servera (From je adresa pošiljaoca)."
         )
         ttk.Label(email_frame, text=info_text, justify=tk.LEFT, foreground="gray").grid(
             row=row, column=0, columnspan=2, sticky=tk.W, pady=(10, 5)
@@ -347,6 +396,15 @@ class SettingsWindow:
         provider_display = self.PROVIDER_KEY_TO_DISPLAY.get(provider_key, "Gmail (OAuth2)")
         self.email_provider_combo.set(provider_display)
 
+        self.smtp_host_entry.insert(0, settings.get("smtp_host", ""))
+        self.smtp_port_entry.insert(0, str(settings.get("smtp_port", 587)))
+        self.smtp_user_entry.insert(0, str(settings.get("smtp_user", "")))
+        self.smtp_password_entry.insert(0, str(settings.get("smtp_password", "")))
+        self.smtp_security_combo.set(
+            self.SMTP_SECURITY_KEY_TO_DISPLAY.get(settings.get("smtp_security", "starttls"), "STARTTLS")
+        )
+        self.smtp_connections_spinbox.set(settings.get("smtp_max_connections", 3))
+
         creds_path = settings.get("gmail_credentials_path", "")
         if creds_path:
             self.credentials_path_var.set(creds_path)
@@ -373,32 +431,38 @@ class SettingsWindow:
         provider_display = self.email_provider_combo.get()
         provider_key = self.PROVIDER_DISPLAY_TO_KEY.get(provider_display, "gmail_oauth")
 
-        if provider_key != "gmail_oauth":
-            messagebox.showwarning("Upozorenje", "Test trenutno podržava samo Gmail (OAuth2).")
-            return
-
-        credentials_path = self.credentials_path_var.get().strip()
-        if not credentials_path or not os.path.exists(credentials_path):
-            messagebox.showwarning("Upozorenje", "Molim izaberi validan credentials.json fajl.")
-            return
-
-        try:
-            GmailOAuthHelper.ensure_dependencies()
-        except ImportError as exc:
-            messagebox.showerror("Greška", str(exc))
-            return
-
         gmail_user = self.gmail_user_entry.get().strip()
         notification_email = self.notification_email_entry.get().strip()
         if not gmail_user or not notification_email:
             messagebox.showwarning("Upozorenje", "Molim popuni oba email polja (From i To).")
             return
 
-        token_path = self.gmail_token_path or GmailOAuthHelper.default_token_path(credentials_path)
-        if not GmailOAuthHelper.token_exists(token_path):
-            messagebox.showwarning("Upozorenje", "Najpre autorizuj Google nalog da bi se generisao token.")
+        credentials_path = self.credentials_path_var.get().strip()
+        token_path = self.gmail_token_path
+        smtp_settings = self.smtp_settings()
+        if smtp_settings is None:
             return
 
+        if provider_key == "smtp":
+            if not smtp_settings["smtp_host"]:
+                messagebox.showwarning("Upozorenje", "Molim unesi adresu SMTP servera.")
+                return
+        else:
+            if not credentials_path or not os.path.exists(credentials_path):
+                messagebox.showwarning("Upozorenje", "Molim izaberi validan credentials.json fajl.")
+                return
+
+            try:
+                GmailOAuthHelper.ensure_dependencies()
+            except ImportError as exc:
+                messagebox.showerror("Greška", str(exc))
+                return
+
+            token_path = token_path or GmailOAuthHelper.default_token_path(credentials_path)
+            if not GmailOAuthHelper.token_exists(token_path):
+                messagebox.showwarning("Upozorenje", "Najpre autorizuj Google nalog da bi se generisao token.")
+                return
+
         test_invoice = [{
             "invoice": {
                 "vendor_name": "Test Dobavljač",
@@ -419,10 +483,11 @@ class SettingsWindow:
             "gmail_token_path": token_path,
             "enable_email_notifications": True
         })
+        temp_settings.update(smtp_settings)
 
         try:
             self.db.save_settings(temp_settings)
-            notification_manager = NotificationManager(self.db, start_scheduler=False)
+            notification_manager = NotificationManager(self.db)
             result = notification_manager.send_email_notification(test_invoice)
         finally:
             # Keep the new token path in original settings, then restore others
@@ -437,6 +502,26 @@ class SettingsWindow:
     # ------------------------------------------------------------------
     # Snimanje podešavanja
     # ------------------------------------------------------------------
+    def smtp_settings(self):
+        """SMTP polja kao dict za settings; None (uz poruku) ako port ili broj konekcija nisu ispravni."""
+        try:
+            port = int(self.smtp_port_entry.get() or 587)
+            max_connections = int(self.smtp_connections_spinbox.get() or 3)
+            if not (0 < port < 65536) or not (1 <= max_connections <= 10):
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Greška", "SMTP port mora biti broj (npr. 587), a broj konekcija između 1 i 10.")
+            return None
+
+        return {
+            "smtp_host": self.smtp_host_entry.get().strip(),
+            "smtp_port": port,
+            "smtp_user": self.smtp_user_entry.get().strip(),
+            "smtp_password": self.smtp_password_entry.get(),
+            "smtp_security": self.SMTP_SECURITY_DISPLAY_TO_KEY.get(self.smtp_security_combo.get(), "starttls"),
+            "smtp_max_connections": max_connections,
+        }
+
     def save(self):
         try:
             notification_days = int(self.notification_days_spinbox.get())
@@ -459,6 +544,9 @@ class SettingsWindow:
         provider_display = self.email_provider_combo.get()
         provider_key = self.PROVIDER_DISPLAY_TO_KEY.get(provider_display, "gmail_oauth")
         credentials_path = self.credentials_path_var.get().strip()
+        smtp_settings = self.smtp_settings()
+        if smtp_settings is None:
+            return
 
         settings_payload = {
             "company_name": self.company_name_entry.get().strip(),
@@ -477,6 +565,7 @@ class SettingsWindow:
             "gmail_token_path": self.gmail_token_path or self.token_path_var.get().strip(),
             "gmail_password": "",  # legacy key kept empty
         }
+        settings_payload.update(smtp_settings)
 
         self.db.save_settings(settings_payload)
         messagebox.showinfo("Uspeh", "Podešavanja su uspešno sačuvana.")
@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from excel_import import ExcelImporter
+from gui_widgets import export_table
 
 
 class VendorsWindow:
@@ -39,6 +39,7 @@ class VendorsWindow:
         ttk.Button(toolbar, text="Izmeni", command=self.edit_item).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Obriši", command=self.delete_item).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Osveži", command=self.load_data).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="CSV/Excel", command=self.export_list).pack(side=tk.LEFT, padx=2)
         
         # Tabela prema modu
         if self.mode == 'vendors':
@@ -135,6 +136,9 @@ class VendorsWindow:
                     article.get('notes', '')
                 ), tags=(article['id'],))
     
+    def export_list(self):
+        export_table(self.window, self.db, self.mode)
+    
     def add_item(self):
         if self.mode == 'vendors':
             VendorDialog(self.window, self.db, None, self.load_data)
@@ -186,6 +190,11 @@ class VendorsWindow:
     
     def import_excel(self):
         if self.mode == 'articles':
+            try:
+                from excel_import import ExcelImporter  # pandas se učitava tek pri uvozu
+            except ImportError as e:
+                messagebox.showerror("Greška", f"Uvoz iz Excel-a nije dostupan: {str(e)}\n\nInstalirajte: pip install pandas openpyxl")
+                return
             ExcelImporter(self.window, self.db, self.load_data)
 
 
@@ -318,7 +327,7 @@ class CustomerDialog:
     def __init__(self, parent, db, customer_id, callback):
         self.window = tk.Toplevel(parent)
         self.window.title("Novi kupac" if customer_id is None else "Izmeni kupca")
-        self.window.geometry("500x450")
+        self.window.geometry("500x490")
         self.window.transient(parent)
         self.window.grab_set()
         
@@ -372,6 +381,11 @@ class CustomerDialog:
         self.city_entry.grid(row=row, column=1, pady=5, sticky=tk.EW)
         row += 1
         
+        ttk.Label(form_frame, text="Email:").grid(row=row, column=0, sticky=tk.W, pady=5)
+        self.email_entry = ttk.Entry(form_frame, width=40)
+        self.email_entry.grid(row=row, column=1, pady=5, sticky=tk.EW)
+        row += 1
+        
         ttk.Label(form_frame, text="Napomena:").grid(row=row, column=0, sticky=tk.W, pady=5)
         self.notes_text = tk.Text(form_frame, width=40, height=3)
         self.notes_text.grid(row=row, column=1, pady=5, sticky=tk.EW)
@@ -411,6 +425,9 @@ class CustomerDialog:
         self.city_entry.delete(0, tk.END)
         self.city_entry.insert(0, customer.get('city', ''))
         
+        self.email_entry.delete(0, tk.END)
+        self.email_entry.insert(0, customer.get('email') or '')
+        
         self.notes_text.delete('1.0', tk.END)
         self.notes_text.insert('1.0', customer.get('notes', ''))
     
@@ -426,6 +443,7 @@ class CustomerDialog:
         reg_number = self.reg_entry.get().strip()
         address = self.address_entry.get().strip()
         city = self.city_entry.get().strip()
+        email = self.email_entry.get().strip()
         notes = self.notes_text.get('1.0', tk.END).strip()
         
         try:
@@ -439,6 +457,7 @@ class CustomerDialog:
                     registration_number=reg_number,
                     address=address,
                     city=city,
+                    email=email,
                     notes=notes
                 )
                 messagebox.showinfo("Uspeh", "Kupac je uspešno izmenjen.")
@@ -451,6 +470,7 @@ class CustomerDialog:
                     registration_number=reg_number,
                     address=address,
                     city=city,
+                    email=email,
                     notes=notes
                 )
                 messagebox.showinfo("Uspeh", "Kupac je uspešno dodat.")
@@ -0,0 +1,461 @@
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from datetime import datetime
+from tkcalendar import DateEntry
+
+import batch_export
+import document_dispatch
+import table_export
+from render_service import RenderService, render_service
+from startup_profile import profiler
+
+
+class AutocompleteCombobox(ttk.Combobox):
+    """Combobox sa pretragom dok se kuca, nad PrefixIndex-om iz lookup_cache.
+
+    U listi se prikazuje najviše `limit` pogodaka, pa se dijalog otvara odmah
+    bez obzira na broj zapisa. Izabrani zapis vraća get_record().
+    """
+    def __init__(self, parent, index, limit=50, on_select=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.index = index
+        self.limit = limit
+        self.on_select = on_select
+        self._initial = None
+        self._after_id = None
+
+        self['values'] = self.index.search('', self.limit)
+        self.bind('<KeyRelease>', self._on_key_release)
+        self.bind('<<ComboboxSelected>>', self._on_selected)
+        self.bind('<Return>', self._on_return)
+
+    def _on_key_release(self, event):
+        if event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+            return
+        if self._after_id:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(150, self._refresh_values)
+
+    def _refresh_values(self):
+        self._after_id = None
+        self['values'] = self.index.search(self.get(), self.limit)
+
+    def _on_selected(self, event=None):
+        if self.on_select and self.get_record() is not None:
+            self.on_select(event)
+
+    def _on_return(self, event):
+        # Enter bira prvi pogodak ako uneti tekst nije tačna labela
+        if self.get_record() is None:
+            matches = self.index.search(self.get(), 1)
+            if matches:
+                self.set(matches[0])
+        self._on_selected(event)
+
+    def set_initial(self, text):
+        """Postavlja sačuvanu vrednost (npr. pri izmeni), koja važi i ako je zapis u međuvremenu obrisan."""
+        self._initial = text
+        self.set(text)
+
+    def get_record(self):
+        """Zapis (dict) koji odgovara unetom tekstu ili None."""
+        return self.index.get(self.get())
+
+    def is_valid(self):
+        text = self.get()
+        return bool(text) and (self.get_record() is not None or text == self._initial)
+
+
+class RenderProgressWindow:
+    """Prozor sa trakom napretka i dugmetom za otkazivanje pozadinskog generisanja."""
+    def __init__(self, parent, title, on_cancel, message="Generisanje PDF-a..."):
+        self.on_cancel = on_cancel
+        self.message = message
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(title)
+        self.window.resizable(False, False)
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        frame = ttk.Frame(self.window, padding=15)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        self.status_label = ttk.Label(frame, text=message)
+        self.status_label.pack(anchor=tk.W)
+
+        self.progress = ttk.Progressbar(frame, length=300, mode='indeterminate')
+        self.progress.pack(fill=tk.X, pady=10)
+        self.progress.start(15)
+
+        ttk.Button(frame, text="Otkaži", command=self.cancel).pack()
+
+    def update(self, done, total=None):
+        if total:
+            if self.progress['mode'] != 'determinate':
+                self.progress.stop()
+                self.progress.configure(mode='determinate', maximum=total)
+            self.progress['value'] = done
+            self.status_label.config(text=f"{self.message} {done} / {total}")
+        else:
+            self.status_label.config(text=f"{self.message} {done}")
+
+    def cancel(self):
+        self.on_cancel()
+        self.close()
+
+    def close(self):
+        if self.window.winfo_exists():
+            self.window.destroy()
+
+
+class LazyNotebook(ttk.Notebook):
+    """Notebook čiji se tabovi prave tek kad se prvi put izaberu (<<NotebookTabChanged>>).
+
+    Podaci taba (fetch(db)) se čitaju u posebnoj pozadinskoj niti notebook-a
+    (ne u render_service, gde bi čekali na PDF-ove, izvoze i slanje email-a),
+    a Tk nit samo pravi widget-e i puni tabelu; dok podaci stižu, u tabu piše
+    "Učitavanje...". Kad je prozor slobodan (after_idle), unapred se čitaju
+    podaci sledećeg taba, pa je prelazak na njega odmah spreman; unapred
+    pročitani podaci stariji od PREFETCH_TTL se čitaju ponovo.
+    """
+    PREFETCH_TTL = 60  # sekundi
+
+    def __init__(self, parent, db, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.db = db
+        self._fetch_db = None  # posebna konekcija za čitanje u pozadinskoj niti
+        self._loader = RenderService(name="LazyNotebook")
+        self._tabs = []
+        self._prefetch_pending = False
+        self.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+
+    def add_lazy(self, text, build, fetch):
+        """build(frame, podaci) pravi tab i vraća ga; fetch(db) vraća podatke (poziva se van Tk niti)."""
+        frame = ttk.Frame(self)
+        self.add(frame, text=text)
+        self._tabs.append({'frame': frame, 'text': text, 'build': build, 'fetch': fetch,
+                           'tab': None, 'data': None, 'fetched_at': None, 'job': None, 'label': None,
+                           'on_built': []})
+        return frame
+
+    def tab_object(self, index):
+        """Napravljeni tab ili None ako još nije otvaran"""
+        return self._tabs[index]['tab']
+
+    def show_tab(self, tab_id, callback=None):
+        """Bira tab (indeks ili frame iz add_lazy); callback(tab) se zove kad je tab napravljen"""
+        index = self.index(tab_id)
+        spec = self._tabs[index]
+        if spec['tab'] is not None:
+            self.select(index)
+            if callback:
+                callback(spec['tab'])
+            return
+        if callback:
+            spec['on_built'].append(callback)
+        if self.index('current') == index:
+            self._on_tab_changed()
+        else:
+            self.select(index)
+
+    def open_current(self):
+        """Otvara izabrani tab (npr. prvi, posle dodavanja svih tabova); ponovni poziv ne radi ništa"""
+        self._on_tab_changed()
+
+    def _on_tab_changed(self, event=None):
+        if not self._tabs:
+            return
+        index = self.index('current')
+        spec = self._tabs[index]
+        if spec['tab'] is not None:
+            return
+        if spec['data'] is not None:
+            self._build(index)
+            return
+        self._show_loading(index)
+        self._fetch(index)
+
+    def _show_loading(self, index):
+        spec = self._tabs[index]
+        if spec['label'] is None:
+            spec['label'] = ttk.Label(spec['frame'], text="Učitavanje...", foreground="gray")
+            spec['label'].pack(expand=True)
+
+    def _fetch(self, index):
+        spec = self._tabs[index]
+        if spec['job'] is not None:
+            return  # već se čita (npr. prefetch), gradi se kad stigne
+
+        def done(data):
+            spec['job'] = None
+            spec['data'] = data
+            spec['fetched_at'] = time.monotonic()
+            if spec['tab'] is None and self.index('current') == index:
+                self._build(index)
+
+        def error(e):
+            # Tab će sam učitati podatke pri pravljenju
+            spec['job'] = None
+            print(f"Greška pri učitavanju taba '{self.tab(index, 'text')}': {e}")
+            if spec['tab'] is None and self.index('current') == index:
+                self._build(index)
+
+        if self._fetch_db is None:
+            self._fetch_db = self.db.worker_connection()
+        fetch_db = self._fetch_db
+
+        def fetch(progress):
+            with profiler.phase(f"tab '{spec['text']}': čitanje podataka"):
+                return spec['fetch'](fetch_db)
+
+        spec['job'] = self._loader.submit(self, fetch, done, error)
+
+    def _build(self, index):
+        spec = self._tabs[index]
+        if spec['data'] is not None and time.monotonic() - spec['fetched_at'] > self.PREFETCH_TTL:
+            spec['data'] = None  # unapred pročitani podaci su zastareli
+            self._show_loading(index)
+            self._fetch(index)
+            return
+        data, spec['data'] = spec['data'], None
+        if spec['label'] is not None:
+            spec['label'].destroy()
+            spec['label'] = None
+        with profiler.phase(f"tab '{spec['text']}': pravljenje i prikaz"):
+            spec['tab'] = spec['build'](spec['frame'], data)
+        callbacks, spec['on_built'] = spec['on_built'], []
+        for callback in callbacks:
+            callback(spec['tab'])
+        if not self._prefetch_pending:
+            self._prefetch_pending = True
+            self.after_idle(self._prefetch)
+
+    def _prefetch(self):
+        """Čita podatke prvog sledećeg (desno od trenutnog) taba koji još nije napravljen"""
+        self._prefetch_pending = False
+        current = self.index('current')
+        for offset in range(1, len(self._tabs)):
+            index = (current + offset) % len(self._tabs)
+            spec = self._tabs[index]
+            if spec['tab'] is None:
+                if spec['data'] is None:
+                    self._fetch(index)
+                return
+
+
+def run_in_background(parent, func, on_done, title, message, error_message, delay_ms=300):
+    """Pokreće func(progress) u pozadini; on_done(rezultat) se zove u Tk niti.
+
+    Prozor sa napretkom se prikazuje tek ako posao traje duže od delay_ms,
+    da kratki poslovi ne bi treptali.
+    """
+    state = {'window': None, 'finished': False}
+
+    def show_window():
+        if not state['finished']:
+            state['window'] = RenderProgressWindow(parent, title, job.cancel, message)
+            state['window'].update(*job.progress)
+
+    def finish():
+        state['finished'] = True
+        if state['window']:
+            state['window'].close()
+
+    def done(result):
+        finish()
+        on_done(result)
+
+    def error(e):
+        finish()
+        messagebox.showerror("Greška", f"{error_message}: {str(e)}")
+
+    def progress(done_count, total):
+        if state['window']:
+            state['window'].update(done_count, total)
+
+    job = render_service.submit(parent, func, done, error, progress)
+    parent.after(delay_ms, show_window)
+    return job
+
+
+def render_pdf(parent, func, on_done, title="PDF", delay_ms=300):
+    """Generiše PDF u pozadini; func(progress) vraća ime fajla, on_done(filename) se zove u Tk niti."""
+    return run_in_background(parent, func, on_done, title, "Generisanje PDF-a...",
+                             "Greška pri kreiranju PDF-a", delay_ms)
+
+
+def export_table(parent, db, kind, filters=None):
+    """Pita za fajl (CSV ili XLSX) i izvozi listu u pozadini, sa filterima iz taba (vidi table_export)."""
+    filetypes = [("CSV", "*.csv"), ("Excel", "*.xlsx")]
+    output = filedialog.asksaveasfilename(title="Izvoz tabele", parent=parent, defaultextension=".csv",
+                                          initialfile=table_export.default_output(kind, 'csv'),
+                                          filetypes=filetypes)
+    if not output:
+        return None
+
+    db_path = db.db_name
+
+    def build(progress):
+        return table_export.export_table(db_path, kind, output, filters, progress_callback=progress)
+
+    def done(result):
+        messagebox.showinfo("Uspeh", f"Izvezeno redova: {result['rows']}\n"
+                                     f"Vreme: {result['elapsed']:.1f} s\n\n{result['output']}")
+
+    return run_in_background(parent, build, done, "Izvoz tabele", "Izvoz redova...", "Greška pri izvozu")
+
+
+def send_documents(parent, db, kind, document_ids):
+    """Šalje označene predračune/narudžbenice email-om u pozadini (vidi document_dispatch)."""
+    document_ids = list(document_ids)
+    title, _ = document_dispatch.DISPATCH_KINDS[kind]
+    if not document_ids:
+        messagebox.showwarning("Upozorenje", "Izaberite dokumente za slanje.")
+        return None
+
+    targets = db.get_dispatch_targets(kind, document_ids)
+    without_email = [str(target['number']) for target in targets.values() if not target['email']]
+    partner = "kupca" if kind == 'proforma' else "dobavljača"
+    question = f"Poslati email-om dokumenata: {len(document_ids)}?"
+    if without_email:
+        listed = ', '.join(without_email[:10]) + (" ..." if len(without_email) > 10 else "")
+        question += f"\n\nBez email adrese {partner} (neće biti poslati): {listed}"
+    if not messagebox.askyesno("Potvrda", question, parent=parent):
+        return None
+
+    try:
+        from notifications import get_transport
+        transport = get_transport(db.get_settings())
+    except Exception as e:
+        messagebox.showerror("Greška", f"Email nije podešen: {str(e)}")
+        return None
+
+    def send(progress):
+        # Ishod slanja se upisuje iz pozadinske niti, pa preko posebne konekcije
+        worker = db.worker_connection()
+        try:
+            return document_dispatch.dispatch_documents(worker, kind, document_ids, transport,
+                                                        progress_callback=progress)
+        finally:
+            worker.conn.close()
+
+    def done(result):
+        message = (f"Poslato: {len(result['sent'])}/{result['count']}\n"
+                   f"Bez email adrese: {len(result['skipped'])}\n"
+                   f"Vreme: {result['elapsed']:.1f} s")
+        if result['failed']:
+            numbers = {document_id: target['number'] for document_id, target in targets.items()}
+            errors = '\n'.join(f"{numbers.get(document_id, document_id)}: {error}"
+                               for document_id, error in result['failed'][:10])
+            messagebox.showwarning("Upozorenje", f"{message}\n\nNije poslato:\n{errors}")
+        else:
+            messagebox.showinfo("Uspeh", message)
+
+    return run_in_background(parent, send, done, f"Slanje - {title}", "Slanje email-a...", "Greška pri slanju")
+
+
+class BatchExportDialog:
+    """Dijalog za grupni PDF izvoz predračuna ili narudžbina (vidi batch_export)."""
+    KIND_TITLES = {'proforma': 'predračuna', 'order': 'narudžbina'}
+
+    def __init__(self, parent, db, kind, selected_ids):
+        self.parent = parent
+        self.db = db
+        self.kind = kind
+        self.selected_ids = list(selected_ids)
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Grupni PDF izvoz {self.KIND_TITLES[kind]}")
+        self.window.resizable(False, False)
+        self.window.transient(parent)
+        self.window.grab_set()
+
+        frame = ttk.Frame(self.window, padding=15)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        # Izbor dokumenata
+        ttk.Label(frame, text="Dokumenti:", font=('Arial', 10, 'bold')).grid(row=0, column=0, columnspan=4, sticky=tk.W)
+        self.source_var = tk.StringVar(value='selected' if self.selected_ids else 'period')
+        selected_radio = ttk.Radiobutton(frame, text=f"Označeni u tabeli ({len(self.selected_ids)})",
+                                         variable=self.source_var, value='selected')
+        selected_radio.grid(row=1, column=0, columnspan=4, sticky=tk.W, pady=2)
+        if not self.selected_ids:
+            selected_radio.state(['disabled'])
+
+        ttk.Radiobutton(frame, text="Period:", variable=self.source_var, value='period').grid(row=2, column=0, sticky=tk.W, pady=2)
+        today = datetime.now()
+        self.date_from = DateEntry(frame, width=12, date_pattern='dd.mm.yyyy')
+        self.date_from.set_date(today.replace(day=1))
+        self.date_from.grid(row=2, column=1, padx=5)
+        ttk.Label(frame, text="do").grid(row=2, column=2)
+        self.date_to = DateEntry(frame, width=12, date_pattern='dd.mm.yyyy')
+        self.date_to.grid(row=2, column=3, padx=5)
+
+        self.archived_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="Uključi arhivirane", variable=self.archived_var).grid(row=3, column=1, columnspan=3, sticky=tk.W)
+
+        # Način izvoza
+        ttk.Label(frame, text="Izlaz:", font=('Arial', 10, 'bold')).grid(row=4, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
+        self.mode_var = tk.StringVar(value='zip')
+        ttk.Radiobutton(frame, text="ZIP arhiva", variable=self.mode_var, value='zip').grid(row=5, column=0, columnspan=4, sticky=tk.W)
+        ttk.Radiobutton(frame, text="Folder sa PDF fajlovima", variable=self.mode_var, value='folder').grid(row=6, column=0, columnspan=4, sticky=tk.W)
+        merged_radio = ttk.Radiobutton(frame, text="Jedan spojen PDF", variable=self.mode_var, value='merged')
+        merged_radio.grid(row=7, column=0, columnspan=4, sticky=tk.W)
+        if not batch_export.PYPDF_AVAILABLE:
+            merged_radio.state(['disabled'])
+            ttk.Label(frame, text="(potreban paket pypdf)", foreground='grey').grid(row=7, column=1, columnspan=3, sticky=tk.E)
+
+        button_frame = ttk.Frame(frame)
+        button_frame.grid(row=8, column=0, columnspan=4, sticky=tk.E, pady=(15, 0))
+        ttk.Button(button_frame, text="Izvezi", command=self.export).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Otkaži", command=self.window.destroy).pack(side=tk.RIGHT)
+
+    def get_document_ids(self):
+        if self.source_var.get() == 'selected':
+            return self.selected_ids, None, None
+        date_from = self.date_from.get_date().strftime('%d.%m.%Y')
+        date_to = self.date_to.get_date().strftime('%d.%m.%Y')
+        ids = batch_export.get_document_ids(self.db, self.kind, date_from, date_to, self.archived_var.get())
+        return ids, date_from, date_to
+
+    def ask_output(self, mode, default_name):
+        if mode == 'folder':
+            return filedialog.askdirectory(title="Izaberi folder za PDF fajlove", parent=self.window)
+        if mode == 'zip':
+            filetypes = [("ZIP arhiva", "*.zip")]
+        else:
+            filetypes = [("PDF", "*.pdf")]
+        return filedialog.asksaveasfilename(title="Sačuvaj kao", parent=self.window, initialfile=default_name,
+                                            defaultextension=filetypes[0][1][1:], filetypes=filetypes)
+
+    def export(self):
+        document_ids, date_from, date_to = self.get_document_ids()
+        if not document_ids:
+            messagebox.showwarning("Upozorenje", "Nema dokumenata za izvoz.", parent=self.window)
+            return
+
+        mode = self.mode_var.get()
+        output = self.ask_output(mode, batch_export.default_output(self.kind, mode, date_from, date_to))
+        if not output:
+            return
+
+        self.window.destroy()
+        db_path = self.db.db_name
+        kind = self.kind
+
+        def build(progress):
+            return batch_export.export_documents(db_path, kind, document_ids, output, mode, progress_callback=progress)
+
+        def done(result):
+            message = (f"Izvezeno dokumenata: {result['count']}\n"
+                       f"Vreme: {result['elapsed']:.1f} s ({result['docs_per_sec']:.1f} dok/s)\n\n"
+                       f"{result['output']}")
+            if result['failed']:
+                message += f"\n\nNije uspelo: {len(result['failed'])}"
+                messagebox.showwarning("Upozorenje", message)
+            else:
+                messagebox.showinfo("Uspeh", message)
+
+        render_pdf(self.parent, build, done, title="Grupni PDF izvoz")
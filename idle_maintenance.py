@@ -0,0 +1,107 @@
+# idle_maintenance.py – održavanje baze (ANALYZE, incremental_vacuum, optimize) dok korisnik ne radi u programu
+import threading
+import time
+
+from startup_profile import profiler
+
+
+class IdleMaintenance:
+    """Izvršava Database.maintenance_steps u Tk niti, kad je program neaktivan.
+
+    request() (npr. iz posla planera 'odrzavanje') samo označava da je održavanje
+    potrebno. Tk nit na svakih CHECK_MS proverava da li od poslednjeg unosa
+    (tastatura, miš) prošlo IDLE_SECONDS; tada pokreće korake preko after_idle,
+    najviše SLICE_MS u jednom delu, pa vraća kontrolu Tk-u. Unos korisnika
+    pauzira održavanje, koje se nastavlja od istog koraka pri sledećem mirovanju.
+    Jednokratni VACUUM pri prelasku postojeće baze na auto_vacuum=INCREMENTAL ne
+    može da se deli, pa se pri prvom mirovanju pokreće u posebnoj niti, preko
+    svoje konekcije (worker_connection); koraci održavanja čekaju da se završi.
+    Vreme svakog dela se beleži u izveštaju --profile.
+    """
+
+    CHECK_MS = 5000
+    IDLE_SECONDS = 60
+    SLICE_MS = 40
+    SLICE_GAP_MS = 20
+
+    def __init__(self, db):
+        self.db = db
+        self.root = None
+        self._requested = threading.Event()
+        self._steps = None
+        self._running = False
+        self._convert_pending = False
+        self._converting = False
+        self._last_input = time.monotonic()
+
+    def start(self, root):
+        """Prati unos u prozoru root i pokreće proveru mirovanja"""
+        self.root = root
+        for sequence in ('<Any-KeyPress>', '<Any-ButtonPress>', '<Motion>', '<MouseWheel>'):
+            root.bind_all(sequence, self._on_input, add='+')
+        root.after(self.CHECK_MS, self._check)
+        if self.db.auto_vacuum_pending():
+            self._convert_pending = True  # prelazak na auto_vacuum=INCREMENTAL pri prvom mirovanju
+            self.request()
+
+    def request(self):
+        """Označava da je održavanje potrebno (sme da se pozove iz bilo koje niti)"""
+        self._requested.set()
+
+    def _on_input(self, event=None):
+        self._last_input = time.monotonic()
+
+    def _idle(self):
+        return time.monotonic() - self._last_input >= self.IDLE_SECONDS
+
+    def _check(self):
+        if self._convert_pending and not self._converting and self._idle():
+            self._converting = True
+            threading.Thread(target=self._convert, name="IdleMaintenance-VACUUM", daemon=True).start()
+        if not self._converting and not self._running and (self._steps is not None or self._requested.is_set()) and self._idle():
+            if self._steps is None:
+                self._requested.clear()
+                self._steps = self.db.maintenance_steps()
+            self._running = True
+            self.root.after_idle(self._slice)
+        self.root.after(self.CHECK_MS, self._check)
+
+    def _convert(self):
+        worker = self.db.worker_connection()
+        try:
+            with profiler.phase("prelazak na auto_vacuum=INCREMENTAL (VACUUM)"):
+                freed = worker.convert_to_incremental_vacuum()
+            print(f"✓ Baza je prešla na auto_vacuum=INCREMENTAL (jednokratni VACUUM, oslobođeno {freed / 1024:.0f} KB)")
+        except Exception as e:
+            print(f"✗ Prelazak baze na auto_vacuum=INCREMENTAL nije uspeo: {e}")  # ponovo pri sledećem pokretanju
+        finally:
+            worker.conn.close()
+            self._convert_pending = False
+            self._converting = False
+
+    def _slice(self):
+        if not self._idle():
+            self._running = False  # korisnik je nastavio rad; nastavlja se pri sledećem mirovanju
+            return
+
+        deadline = time.perf_counter() + self.SLICE_MS / 1000
+        try:
+            with profiler.phase("održavanje baze (deo)"):
+                while time.perf_counter() < deadline:
+                    next(self._steps)
+        except StopIteration as done:
+            self._finish(done.value)
+            return
+        except Exception as e:
+            print(f"✗ Održavanje baze nije uspelo: {e}")
+            self._steps = None
+            self._running = False
+            return
+        self.root.after(self.SLICE_GAP_MS, lambda: self.root.after_idle(self._slice))
+
+    def _finish(self, summary):
+        self._steps = None
+        self._running = False
+        analyzed = ', '.join(summary['analyzed']) or 'nijedna'
+        print(f"✓ Održavanje baze: analizirane tabele: {analyzed}; "
+              f"oslobođeno {summary['freed_bytes'] / 1024:.0f} KB")
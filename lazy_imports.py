@@ -0,0 +1,40 @@
+# lazy_imports.py – odloženo učitavanje teških paketa (reportlab, pypdf, Google...) do prve upotrebe
+import importlib.util
+import threading
+
+
+def module_available(name):
+    """Da li je paket instaliran, bez učitavanja (find_spec ne izvršava modul)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyObject:
+    """Zamena za objekat koji se pravi tek pri prvom pristupu nekom atributu.
+
+    factory() se poziva jednom (i kad dve niti istovremeno pristupe), pa se
+    paket koji factory uvozi ne učitava pri pokretanju ako se objekat ne koristi.
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._target is None:
+                self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+def lazy_pdf_generator(db):
+    """PDFGenerator za db koji učitava reportlab (pdf_generator) tek kad zatreba"""
+    def create():
+        from pdf_generator import PDFGenerator
+        return PDFGenerator(db)
+    return LazyObject(create)
@@ -0,0 +1,112 @@
+# lookup_cache.py – keš dobavljača, kupaca i artikala za izbor u dijalozima
+import threading
+from bisect import bisect_left
+
+
+class PrefixIndex:
+    """Sortiran indeks za pretragu po početku reči (šifra, naziv ili bilo koja reč naziva)."""
+
+    def __init__(self, records, label_func):
+        self.records = records
+        self.labels = [label_func(record) for record in records]
+        self.by_label = dict(zip(self.labels, records))
+
+        keys = []
+        for position, label in enumerate(self.labels):
+            normalized = label.casefold()
+            keys.append((normalized, position))
+            for word in normalized.split()[1:]:
+                keys.append((word, position))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._positions = [position for _, position in keys]
+
+    def search(self, text, limit=50):
+        """Vraća do `limit` labela čija neka reč počinje zadatim tekstom."""
+        prefix = (text or '').strip().casefold()
+        if not prefix:
+            return self.labels[:limit]
+
+        results = []
+        seen = set()
+        index = bisect_left(self._keys, prefix)
+        while index < len(self._keys) and self._keys[index].startswith(prefix):
+            position = self._positions[index]
+            if position not in seen:
+                seen.add(position)
+                results.append(position)
+                if len(results) >= limit:
+                    break
+            index += 1
+        results.sort()
+        return [self.labels[position] for position in results]
+
+    def get(self, label):
+        return self.by_label.get(label)
+
+    def __len__(self):
+        return len(self.records)
+
+
+def _vendor_label(vendor):
+    return vendor.get('name', '')
+
+
+def _customer_label(customer):
+    return customer.get('name', '')
+
+
+def _article_label(article):
+    return f"{article['article_code']} - {article['name']}"
+
+
+class LookupCache:
+    """Keš šifarnika na nivou procesa; Database ga poništava pri svakoj izmeni."""
+
+    LOADERS = {
+        'vendors': (lambda db: db.get_all_vendors(), _vendor_label),
+        'customers': (lambda db: db.get_all_customers(), _customer_label),
+        'articles': (lambda db: db.get_all_articles(), _article_label),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._generation = 0
+
+    def get(self, db, kind):
+        key = (db.db_name, kind)
+        with self._lock:
+            index = self._indexes.get(key)
+            generation = self._generation
+        if index is not None:
+            return index
+
+        loader, label_func = self.LOADERS[kind]
+        index = PrefixIndex(loader(db), label_func)
+        with self._lock:
+            # Ne keširaj ako je u međuvremenu bilo izmena
+            if generation == self._generation:
+                self._indexes[key] = index
+        return index
+
+    def invalidate(self, kind=None):
+        with self._lock:
+            self._generation += 1
+            if kind is None:
+                self._indexes.clear()
+            else:
+                for key in [key for key in self._indexes if key[1] == kind]:
+                    del self._indexes[key]
+
+    def vendors(self, db):
+        return self.get(db, 'vendors')
+
+    def customers(self, db):
+        return self.get(db, 'customers')
+
+    def articles(self, db):
+        return self.get(db, 'articles')
+
+
+lookup_cache = LookupCache()
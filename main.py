@@ -1,92 +1,54 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import messagebox
 import traceback
 import sys
-from datetime import datetime
-import threading
-import time
+from datetime import datetime, timedelta
+import multiprocessing
+import os
+
+from startup_profile import profiler
+
+if __name__ == "__main__":
+    # --profile: merenje faza i uvoza modula, izveštaj u folderu profil/ pri izlasku
+    profiler.start_from_argv(sys.argv[1:])
 
 try:
     from database import Database
+    from idle_maintenance import IdleMaintenance
     from notifications import NotificationManager
+    from pdf_cache import pdf_cache
+    from scheduler import job_scheduler, daily_at, every, monthly
+    from single_instance import SingleInstance, parse_command, send_command
+    from gui_widgets import LazyNotebook
     from gui_main import ZaduzenjaTab
     from gui_predracuni import PredracuniTab
     from gui_komunalije import KomunalijeTab
     from gui_promet import PrometTab
     from gui_narucivanja import NarucivanjeTab
     from system_tray import SystemTrayApp
-    
-    class EmailScheduler:
-        """Background task za automatsko slanje email-a"""
-        def __init__(self, db, notification_manager):
-            self.db = db
-            self.notification_manager = notification_manager
-            self.running = True
-            self.thread = threading.Thread(target=self.check_time, daemon=True)
-            self.thread.start()
-        
-        def check_time(self):
-            CHECK_INTERVAL = 900  # 15 minuta
-            
-            while self.running:
-                try:
-                    settings = self.db.get_settings()
-                    
-                    if not settings.get('enable_email_notifications', False):
-                        time.sleep(CHECK_INTERVAL)
-                        continue
-                    
-                    if not all([settings.get('gmail_user'), settings.get('gmail_password'), settings.get('notification_email')]):
-                        time.sleep(CHECK_INTERVAL)
-                        continue
-                    
-                    last_email_date = settings.get('last_email_notification_date', '')
-                    today = datetime.now().strftime('%d.%m.%Y')
-                    
-                    if last_email_date == today:
-                        now = datetime.now()
-                        tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-                        seconds_until_tomorrow = (tomorrow - now).total_seconds()
-                        wait_time = min(seconds_until_tomorrow, CHECK_INTERVAL)
-                        time.sleep(wait_time)
-                        continue
-                    
-                    email_time = settings.get('email_notification_time', '09:00')
-                    target_hour, target_minute = map(int, email_time.split(':'))
-                    
-                    now = datetime.now()
-                    current_time_minutes = now.hour * 60 + now.minute
-                    target_time_minutes = target_hour * 60 + target_minute
-                    
-                    if current_time_minutes >= target_time_minutes:
-                        due_invoices = self.notification_manager.check_due_invoices()
-                        
-                        if due_invoices:
-                            result = self.notification_manager.send_email_notification(due_invoices)
-                            if result:
-                                self.db.update_setting('last_email_notification_date', today)
-                        else:
-                            self.db.update_setting('last_email_notification_date', today)
-                    
-                    time.sleep(CHECK_INTERVAL)
-                    
-                except Exception as e:
-                    print(f"Greška u email scheduler-u: {e}")
-                    time.sleep(CHECK_INTERVAL)
-        
-        def stop(self):
-            self.running = False
+    profiler.mark("moduli uvezeni")
     
     class MainApp:
-        def __init__(self):
+        # Komanda 'open <vrsta> <broj>': tab, metoda taba koja otvara dokument, poruka ako ga nema
+        OPEN_COMMANDS = {
+            'proforma': ('predracuni_tab', 'open_proforma', "Predračun br. {} nije pronađen."),
+            'order': ('narucivanje_tab', 'open_order', "Narudžbina br. {} nije pronađena."),
+        }
+        
+        def __init__(self, instance=None, command=None):
+            self.instance = instance
+            self.command = command or ['show']
             self.db = None
+            self.jobs_db = None
             self.notification_manager = None
-            self.email_scheduler = None
+            self.maintenance = None
             self.root = None
             self.tray_app = None
             self.is_minimized_to_tray = False
+            self.notebook = None
+            self.tab_frames = {}
             
-            # Tab reference
+            # Tab reference (None dok se tab prvi put ne otvori)
             self.zaduzenja_tab = None
             self.predracuni_tab = None
             self.komunalije_tab = None
@@ -105,15 +67,75 @@ try:
                 self.root.withdraw()
                 self.is_minimized_to_tray = True
         
+        def add_tab(self, notebook, attribute, text, tab_class, *args):
+            """Dodaje tab koji se pravi tek pri prvom izboru; napravljen tab se čuva u self.<attribute>"""
+            def build(frame, prefetched):
+                tab = tab_class(frame, self.db, *args, prefetched=prefetched)
+                setattr(self, attribute, tab)
+                return tab
+            self.tab_frames[attribute] = notebook.add_lazy(text, build, tab_class.fetch)
+        
+        def handle_command(self, command):
+            """Komanda novog pokretanja programa (single_instance): ['show'] ili ['open', vrsta, broj]"""
+            self.show_window()
+            if command[0] != 'open' or len(command) != 3:
+                return
+            kind, number = command[1], command[2]
+            if kind not in self.OPEN_COMMANDS:
+                messagebox.showwarning("Upozorenje", f"Nepoznata vrsta dokumenta: {kind}")
+                return
+            attribute, method, not_found = self.OPEN_COMMANDS[kind]
+            document_id = self.db.find_document_id(kind, number)
+            if document_id is None:
+                messagebox.showwarning("Upozorenje", not_found.format(number))
+                return
+            self.notebook.show_tab(self.tab_frames[attribute], lambda tab: getattr(tab, method)(document_id))
+        
         def on_closing(self):
             if messagebox.askyesno("Potvrda", "Da li želite da minimizirate program u pozadinu?\n\n(Program će nastaviti da radi)\n\nKlikni 'Ne' za potpuno zatvaranje."):
                 self.hide_window()
             else:
                 self.quit_app()
         
+        def start_jobs(self):
+            """Registruje periodične poslove na zajedničkom planeru i pokreće ga.
+
+            Planer i poslovi rade u niti planera preko svoje konekcije (jobs_db),
+            da njihovi commit-i ne bi ulazili u transakcije Tk niti.
+            """
+            self.jobs_db = self.db.worker_connection()
+            notifications = NotificationManager(self.jobs_db)
+            job_scheduler.register('email_obavestenje', notifications.send_daily_digest,
+                                   daily_at('email_notification_time', '09:00', enabled_key='enable_email_notifications'),
+                                   legacy_last_run=NotificationManager.legacy_last_digest)
+            outbox = notifications.outbox
+            job_scheduler.register('email_outbox', outbox.flush, outbox.schedule)
+            job_scheduler.register('backup_baze', self.jobs_db.backup_database, every(timedelta(days=1)))
+            job_scheduler.register('odrzavanje', self.run_maintenance, every(timedelta(hours=6), first_delay=timedelta(minutes=10)))
+            job_scheduler.register('mesecni_izvestaj', self.run_monthly_report, monthly(day=1, at='07:00'))
+            job_scheduler.start(self.jobs_db)
+        
+        def run_maintenance(self):
+            """Posao planera: čisti keš PDF-ova; održavanje baze se radi kad program miruje (IdleMaintenance)"""
+            pdf_cache.evict()
+            self.maintenance.request()
+        
+        def run_monthly_report(self):
+            """PDF izveštaj o prometu za prethodni mesec u folderu izvestaji/"""
+            from pdf_generator import PDFGenerator  # reportlab se učitava tek kad zatreba
+            last_day = datetime.now().replace(day=1) - timedelta(days=1)
+            date_from = last_day.replace(day=1).strftime('%d.%m.%Y')
+            date_to = last_day.strftime('%d.%m.%Y')
+            entries = self.jobs_db.get_revenue_entries_by_date(date_from, date_to)
+            
+            os.makedirs('izvestaji', exist_ok=True)
+            output = os.path.join('izvestaji', f"promet_{last_day.strftime('%Y%m')}.pdf")
+            PDFGenerator(self.jobs_db).generate_revenue_report(entries, {'date_from': date_from, 'date_to': date_to}, output=output)
+        
         def quit_app(self):
-            if self.email_scheduler:
-                self.email_scheduler.stop()
+            job_scheduler.stop()
+            if self.instance:
+                self.instance.release()
             if self.tray_app:
                 self.tray_app.stop()
             if self.root:
@@ -125,56 +147,53 @@ try:
                 print("Pokrećem program...")
                 
                 # Inicijalizuj bazu
-                self.db = Database()
+                with profiler.phase("baza (Database.__init__, migracije)"):
+                    self.db = Database()
+                self.maintenance = IdleMaintenance(self.db)
                 
                 # Inicijalizuj notification manager
-                self.notification_manager = NotificationManager(self.db)
+                with profiler.phase("NotificationManager"):
+                    self.notification_manager = NotificationManager(self.db)
                 
-                # Pokreni email scheduler
-                self.email_scheduler = EmailScheduler(self.db, self.notification_manager)
+                # Pokreni planer (email, backup, održavanje)
+                with profiler.phase("planer poslova"):
+                    self.start_jobs()
                 
                 # Kreiraj glavni prozor
-                self.root = tk.Tk()
-                self.root.title("Evidencija Poslovanja")
-                self.root.geometry("1400x750")
+                with profiler.phase("glavni prozor (tk.Tk)"):
+                    self.root = tk.Tk()
+                    self.root.title("Evidencija Poslovanja")
+                    self.root.geometry("1400x750")
+                self.maintenance.start(self.root)
                 
-                # Kreiraj notebook (tabove)
-                notebook = ttk.Notebook(self.root)
-                notebook.pack(fill=tk.BOTH, expand=True)
-                
-                # Tab 1: Plaćanje zaduženja
-                zaduzenja_frame = ttk.Frame(notebook)
-                notebook.add(zaduzenja_frame, text="Plaćanje zaduženja")
-                self.zaduzenja_tab = ZaduzenjaTab(zaduzenja_frame, self.db, self.notification_manager)
-                
-                # Tab 2: Predračun zaduženje
-                predracuni_frame = ttk.Frame(notebook)
-                notebook.add(predracuni_frame, text="Predračun zaduženje")
-                self.predracuni_tab = PredracuniTab(predracuni_frame, self.db)
-                
-                # Tab 3: Plaćanje komunalija
-                komunalije_frame = ttk.Frame(notebook)
-                notebook.add(komunalije_frame, text="Plaćanje troškova")
-                self.komunalije_tab = KomunalijeTab(komunalije_frame, self.db)
-                
-                # Tab 4: Kontrola prometa
-                promet_frame = ttk.Frame(notebook)
-                notebook.add(promet_frame, text="Kontrola prometa")
-                self.promet_tab = PrometTab(promet_frame, self.db)
-
-                # Tab 5: Naručivanje robe
-                narucivanje_frame = ttk.Frame(notebook)
-                notebook.add(narucivanje_frame, text="Naručivanje robe")
-                self.narucivanje_tab = NarucivanjeTab(narucivanje_frame, self.db)
+                # Kreiraj notebook (tabove); tab se pravi pri prvom izboru, podaci se čitaju u pozadini
+                with profiler.phase("tabovi (notebook)"):
+                    notebook = self.notebook = LazyNotebook(self.root, self.db)
+                    notebook.pack(fill=tk.BOTH, expand=True)
+                    
+                    self.add_tab(notebook, 'zaduzenja_tab', "Plaćanje zaduženja", ZaduzenjaTab, self.notification_manager)
+                    self.add_tab(notebook, 'predracuni_tab', "Predračun zaduženje", PredracuniTab)
+                    self.add_tab(notebook, 'komunalije_tab', "Plaćanje troškova", KomunalijeTab)
+                    self.add_tab(notebook, 'promet_tab', "Kontrola prometa", PrometTab)
+                    self.add_tab(notebook, 'narucivanje_tab', "Naručivanje robe", NarucivanjeTab)
+                    notebook.open_current()
 
                 # Postavi handler za zatvaranje
                 self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
                 
                 # Pokreni system tray
-                self.tray_app = SystemTrayApp(self.root, self.show_window, self.quit_app)
-                self.tray_app.run()
+                with profiler.phase("system tray"):
+                    self.tray_app = SystemTrayApp(self.root, self.show_window, self.quit_app)
+                    self.tray_app.run()
+                
+                # Komande novih pokretanja (prikaz prozora, otvaranje dokumenta) stižu preko lokalnog socket-a
+                if self.instance:
+                    self.instance.serve(lambda command: self.root.after(0, self.handle_command, command))
+                if self.command != ['show']:
+                    self.root.after_idle(self.handle_command, self.command)
                 
                 print("Program je pokrenut uspešno!")
+                self.root.after_idle(profiler.mark, "prozor prikazan (mainloop)")
                 
                 # Pokreni aplikaciju
                 self.root.mainloop()
@@ -186,10 +205,22 @@ try:
                 sys.exit(1)
     
     def main():
-        app = MainApp()
+        command = parse_command(sys.argv[1:])
+        instance = SingleInstance()
+        if not instance.acquire():
+            # Program već radi (npr. autostart): samo mu prosledi komandu, bez druge baze, planera i tray ikone
+            if not send_command(command):
+                root = tk.Tk()
+                root.withdraw()
+                messagebox.showwarning("Upozorenje", "Program je već pokrenut, ali se ne odaziva.")
+                root.destroy()
+            return
+        app = MainApp(instance, command)
         app.run()
     
     if __name__ == "__main__":
+        # Potrebno za ProcessPoolExecutor (grupni PDF izvoz) u exe verziji
+        multiprocessing.freeze_support()
         main()
         
 except Exception as e:
@@ -1,22 +1,26 @@
-# notifications.py – Gmail OAuth2 slanje + dnevni scheduler
+# notifications.py – slanje email-a (Gmail OAuth2 ili SMTP) + dnevni email (posao za scheduler.py)
 import os
 import base64
+import hashlib
+import queue
+import smtplib
+import ssl
 import threading
-import time
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from win10toast import ToastNotifier
+from email.mime.application import MIMEApplication
+from email import encoders
 
-try:
-    from googleapiclient.discovery import build
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from google.oauth2.credentials import Credentials
-    from google.auth.transport.requests import Request
-    GOOGLE_LIBRARIES_AVAILABLE = True
-except ImportError:
-    build = InstalledAppFlow = Credentials = Request = None
-    GOOGLE_LIBRARIES_AVAILABLE = False
+from database import DUE_BUCKET_OVERDUE, DUE_BUCKET_URGENT
+from email_outbox import EmailOutbox
+from lazy_imports import module_available
+from scheduler import job_scheduler
+
+# Google libraries are imported on first Gmail use (GmailOAuthHelper.ensure_dependencies)
+GOOGLE_LIBRARIES_AVAILABLE = module_available("googleapiclient") and module_available("google_auth_oauthlib")
+build = InstalledAppFlow = Credentials = Request = None
+_google_lock = threading.Lock()
 
 
 class GmailOAuthHelper:
@@ -25,11 +29,19 @@ class GmailOAuthHelper:
 
     @staticmethod
     def ensure_dependencies():
+        global build, InstalledAppFlow, Credentials, Request
         if not GOOGLE_LIBRARIES_AVAILABLE:
             raise ImportError(
                 "Missing Google libraries. Install with:\n"
                 "pip install google-auth-oauthlib google-auth-httplib2 google-api-python-client"
             )
+        with _google_lock:
+            if build is None:
+                from googleapiclient.discovery import build as _build
+                from google_auth_oauthlib.flow import InstalledAppFlow
+                from google.oauth2.credentials import Credentials
+                from google.auth.transport.requests import Request
+                build = _build
 
     @staticmethod
     def default_token_path(credentials_path: str) -> str:
@@ -40,13 +52,17 @@ class GmailOAuthHelper:
     def token_exists(token_path: str) -> bool:
         return bool(token_path and os.path.exists(token_path))
 
+    @staticmethod
+    def save_credentials(creds, token_path: str):
+        with open(token_path, "w", encoding="utf-8") as token_file:
+            token_file.write(creds.to_json())
+
     @staticmethod
     def authorize(credentials_path: str, token_path: str):
         GmailOAuthHelper.ensure_dependencies()
         flow = InstalledAppFlow.from_client_secrets_file(credentials_path, GmailOAuthHelper.SCOPES)
         creds = flow.run_local_server(port=0, prompt="consent")
-        with open(token_path, "w", encoding="utf-8") as token_file:
-            token_file.write(creds.to_json())
+        GmailOAuthHelper.save_credentials(creds, token_path)
         return creds
 
     @staticmethod
@@ -61,16 +77,68 @@ class GmailOAuthHelper:
             if creds and creds.expired and creds.refresh_token:
                 creds.refresh(Request())
                 # Save the refreshed token back to file
-                with open(token_path, "w", encoding="utf-8") as token_file:
-                    token_file.write(creds.to_json())
+                GmailOAuthHelper.save_credentials(creds, token_path)
             else:
                 creds = GmailOAuthHelper.authorize(credentials_path, token_path)
 
         return creds
 
 
+def pdf_attachment(filename: str, data) -> MIMEApplication:
+    """MIME deo za PDF iz memorije (bytes ili memoryview iz PDFGenerator.get_document_pdf)."""
+    # base64 se računa direktno nad baferom, bez kopiranja u bytes
+    part = MIMEApplication(base64.encodebytes(data).decode("ascii"), "pdf", _encoder=encoders.encode_noop)
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=filename)
+    return part
+
+
+def build_message(subject: str, html_body: str, from_address: str, recipient: str, attachments=None):
+    """HTML poruka sa PDF prilozima; attachments: lista (ime fajla, bytes/memoryview)."""
+    message = MIMEMultipart("mixed" if attachments else "alternative")
+    message["Subject"] = subject
+    message["From"] = from_address
+    message["To"] = recipient
+    message.attach(MIMEText(html_body, "html", "utf-8"))
+    for filename, data in attachments or ():
+        message.attach(pdf_attachment(filename, data))
+    return message
+
+
+_senders = {}
+_senders_lock = threading.Lock()
+
+
+def get_gmail_sender(settings: dict) -> "GmailSender":
+    """Shared GmailSender for the configured account, created once and reused for every message.
+
+    The first sender for an account also registers its token refresh job on job_scheduler.
+    """
+    key = (settings.get("gmail_credentials_path") or "", settings.get("gmail_token_path") or "",
+           settings.get("gmail_user") or "")
+    with _senders_lock:
+        sender = _senders.get(key)
+        if sender is None:
+            sender = _senders[key] = GmailSender(settings)
+            created = True
+        else:
+            created = False
+    if created:
+        job_scheduler.register("gmail_token", sender.refresh_token, sender.refresh_schedule)
+    return sender
+
+
 class GmailSender:
-    """Handles email sending through Gmail API."""
+    """Handles email sending through Gmail API.
+
+    Credentials and the Gmail service (with its HTTP connection) are loaded once
+    and kept in memory; use get_gmail_sender() to share one instance. The access
+    token is refreshed REFRESH_MARGIN before it expires, and the service is
+    rebuilt if the token file is replaced (e.g. new authorization in settings).
+    """
+    REFRESH_MARGIN = timedelta(minutes=5)
+    MIN_REFRESH_INTERVAL = timedelta(minutes=1)
+
     def __init__(self, settings: dict):
         self.settings = settings
         self.credentials_path = settings.get("gmail_credentials_path") or ""
@@ -82,115 +150,347 @@ class GmailSender:
         )
         self.from_address = settings.get("gmail_user") or "me"
 
-    def send(self, subject: str, html_body: str, recipient: str):
-        creds = GmailOAuthHelper.load_credentials(self.credentials_path, self.token_path)
-        service = build("gmail", "v1", credentials=creds)
-
-        message = MIMEMultipart("alternative")
-        message["Subject"] = subject
-        message["From"] = self.from_address
-        message["To"] = recipient
-        message.attach(MIMEText(html_body, "html", "utf-8"))
+        # The service's HTTP client is not thread safe, so all API use goes through this lock
+        self._lock = threading.RLock()
+        self._creds = None
+        self._service = None
+        self._token_mtime = None
 
+    def _token_file_mtime(self):
+        try:
+            return os.path.getmtime(self.token_path)
+        except OSError:
+            return None
+
+    def _get_service(self):
+        """Cached Gmail service; returns (service, loaded) where loaded means credentials were (re)read."""
+        if self._service is not None and self._token_file_mtime() != self._token_mtime:
+            self._service = None  # token file was replaced outside this sender
+
+        if self._service is None:
+            GmailOAuthHelper.ensure_dependencies()
+            self._creds = GmailOAuthHelper.load_credentials(self.credentials_path, self.token_path)
+            self._service = build("gmail", "v1", credentials=self._creds, cache_discovery=False)
+            self._token_mtime = self._token_file_mtime()
+            return self._service, True
+
+        if not self._creds.valid:
+            self._refresh()
+        return self._service, False
+
+    def _refresh(self):
+        self._creds.refresh(Request())
+        GmailOAuthHelper.save_credentials(self._creds, self.token_path)
+        self._token_mtime = self._token_file_mtime()
+
+    def _expires_in(self):
+        expiry = self._creds.expiry if self._creds else None
+        if expiry is None:
+            return None
+        # google-auth keeps expiry as naive UTC
+        return expiry - datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def refresh_token(self):
+        """Job for job_scheduler: refresh the access token if it expires within REFRESH_MARGIN.
+
+        Raises when a token that is about to expire cannot be refreshed, so the
+        scheduler retries after its RETRY_DELAY instead of running the job again.
+        """
+        with self._lock:
+            expires_in = self._expires_in()
+            if expires_in is None or expires_in > self.REFRESH_MARGIN:
+                return
+            if not self._creds.refresh_token:
+                raise RuntimeError("Gmail token expires and has no refresh token; authorize again in settings.")
+            self._refresh()
+            expires_in = self._expires_in()
+            if expires_in is None or expires_in <= self.REFRESH_MARGIN:
+                raise RuntimeError("Gmail token refresh did not extend the token expiry.")
+
+    def refresh_schedule(self, settings, last_run, now):
+        """Schedule for job_scheduler: REFRESH_MARGIN before the cached token expires.
+
+        None until credentials are loaded or when they cannot be refreshed; never
+        earlier than MIN_REFRESH_INTERVAL after the last run.
+        """
+        with self._lock:
+            expires_in = self._expires_in()
+            can_refresh = bool(self._creds and self._creds.refresh_token)
+        if expires_in is None or not can_refresh:
+            return None
+        run = now + max(expires_in - self.REFRESH_MARGIN, timedelta(0))
+        if last_run:
+            run = max(run, last_run + self.MIN_REFRESH_INTERVAL)
+        return run
+
+    def send(self, subject: str, html_body: str, recipient: str, attachments=None):
+        """attachments: lista (ime fajla, bytes/memoryview) PDF priloga."""
+        message = build_message(subject, html_body, self.from_address, recipient, attachments)
         raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode("utf-8")
-        service.users().messages().send(userId="me", body={"raw": raw_message}).execute()
+        with self._lock:
+            service, loaded = self._get_service()
+            service.users().messages().send(userId="me", body={"raw": raw_message}).execute()
+        if loaded:
+            job_scheduler.wake()  # new token expiry for refresh_schedule
+
+
+class SMTPTransport:
+    """Sends email through an SMTP server over a small pool of authenticated sessions.
+
+    At most max_connections sessions are open, which also limits how many
+    messages are sent at once. Sessions are opened on first use, kept for the
+    next message and reopened if the server has dropped them. Any SMTP server
+    works, including a local test server (security="none", no user).
+    """
+    SECURITY_MODES = ("starttls", "ssl", "none")
+
+    def __init__(self, host: str, port: int = 587, user: str = "", password: str = "", security: str = "starttls",
+                 from_address: str = "", max_connections: int = 3, timeout: float = 30):
+        if security not in self.SECURITY_MODES:
+            raise ValueError(f"Unknown SMTP security mode: {security}")
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.security = security
+        self.from_address = from_address or user
+        self.max_connections = max(int(max_connections), 1)
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle = queue.LifoQueue()
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "SMTPTransport":
+        host = settings.get("smtp_host") or ""
+        if not host:
+            raise ValueError("SMTP server is not configured.")
+        return cls(
+            host,
+            settings.get("smtp_port") or 587,
+            str(settings.get("smtp_user") or ""),
+            str(settings.get("smtp_password") or ""),
+            settings.get("smtp_security") or "starttls",
+            settings.get("gmail_user") or "",
+            settings.get("smtp_max_connections") or 3,
+        )
 
+    def _connect(self):
+        if self.security == "ssl":
+            session = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                       context=ssl.create_default_context())
+        else:
+            session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                session.starttls(context=ssl.create_default_context())
+        try:
+            if self.user:
+                session.login(self.user, self.password)
+        except BaseException:
+            self._quit(session)
+            raise
+        return session
 
-class NotificationManager:
-    """Manages invoice notifications (Windows toast + Gmail email)."""
+    @staticmethod
+    def _quit(session):
+        try:
+            session.quit()
+        except (smtplib.SMTPException, OSError):
+            session.close()
 
-    def __init__(self, db, *, start_scheduler: bool = True):
-        self.db = db
-        self.toaster = ToastNotifier()
-        self._scheduler_thread = None
-        self._scheduler_lock = threading.Lock()
-        settings = self.db.get_settings()
-        self._last_email_sent_date = settings.get("last_email_notification_date", "")
-        if start_scheduler:
-            self._ensure_scheduler_thread()
-
-    def _ensure_scheduler_thread(self):
-        with self._scheduler_lock:
-            if self._scheduler_thread is None:
-                self._scheduler_thread = threading.Thread(
-                    target=self._scheduler_loop, name="DailyEmailScheduler", daemon=True
-                )
-                self._scheduler_thread.start()
-
-    def _scheduler_loop(self):
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def send(self, subject: str, html_body: str, recipient: str, attachments=None):
+        message = build_message(subject, html_body, self.from_address, recipient, attachments)
+        with self._slots:
+            session = self._acquire()
+            try:
+                try:
+                    session.send_message(message)
+                except smtplib.SMTPServerDisconnected:
+                    # Idle session was closed by the server: reconnect once
+                    self._quit(session)
+                    session = self._connect()
+                    session.send_message(message)
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                self._idle.put(session)  # message refused, the session is still usable
+                raise
+            except BaseException:
+                self._quit(session)
+                raise
+            self._idle.put(session)
+
+    def close(self):
+        """Close all idle sessions (sessions in use are returned to the pool and closed next time)."""
         while True:
             try:
-                self._run_scheduler_iteration()
-            except Exception as exc:
-                print(f"Scheduler iteration failed: {exc}")
-            time.sleep(60)  # check every minute
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
 
-    def _run_scheduler_iteration(self):
-        settings = self.db.get_settings()
-        if not settings.get("enable_email_notifications", False):
-            return
 
-        schedule_time = settings.get("email_notification_time", "09:00")
-        try:
-            schedule_hour, schedule_minute = [int(part) for part in schedule_time.split(":")]
-        except ValueError:
-            schedule_hour, schedule_minute = 9, 0
+_smtp_transport = None
+_smtp_key = None
 
-        now = datetime.now()
-        today = now.date()
-        target_datetime = now.replace(hour=schedule_hour, minute=schedule_minute, second=0, microsecond=0)
 
-        # Wait until configured time arrives
-        if now < target_datetime:
-            return
+def get_smtp_transport(settings: dict) -> SMTPTransport:
+    """Shared SMTPTransport for the configured server; the old pool is closed when SMTP settings change."""
+    global _smtp_transport, _smtp_key
+    key = tuple(settings.get(name) for name in (
+        "smtp_host", "smtp_port", "smtp_user", "smtp_password", "smtp_security", "gmail_user", "smtp_max_connections"
+    ))
+    with _senders_lock:
+        if _smtp_transport is None or key != _smtp_key:
+            if _smtp_transport is not None:
+                _smtp_transport.close()
+            _smtp_transport = SMTPTransport.from_settings(settings)
+            _smtp_key = key
+        return _smtp_transport
 
-        today_iso = today.isoformat()
-        if self._last_email_sent_date == today_iso:
-            return  # already sent today
 
-        due_invoices = self.check_due_invoices()
-        if not due_invoices:
-            return  # nothing to send
+def get_transport(settings: dict):
+    """Shared sender for the provider selected in settings (email_provider)."""
+    if settings.get("email_provider", "gmail_oauth") == "smtp":
+        return get_smtp_transport(settings)
+    GmailOAuthHelper.ensure_dependencies()
+    return get_gmail_sender(settings)
+
+
+class SettingsTransport:
+    """EmailOutbox transport that sends with the provider from the current settings."""
+    def __init__(self, db):
+        self.db = db
+
+    def send(self, subject: str, html_body: str, recipient: str, attachments=None):
+        get_transport(self.db.get_settings()).send(subject, html_body, recipient, attachments)
+
+
+class NotificationManager:
+    """Manages invoice notifications (Windows toast + email)."""
 
-        sent = self.send_email_notification(due_invoices)
-        if sent:
-            self._last_email_sent_date = today_iso
+    def __init__(self, db, outbox=None):
+        self.db = db
+        self.toaster = None  # created on first toast, so win10toast is not loaded at startup
+        self.outbox = outbox or EmailOutbox(db, SettingsTransport(db))
+
+    URGENT_DAYS = 3
+
+    @staticmethod
+    def legacy_last_digest(settings):
+        """Day of the last email from before the scheduler (setting last_email_notification_date), or None.
+
+        The old timer in main.py stored it as dd.mm.yyyy, the old NotificationManager as yyyy-mm-dd.
+        """
+        value = str(settings.get("last_email_notification_date") or "").strip()
+        for date_format in ("%d.%m.%Y", "%Y-%m-%d"):
             try:
-                self.db.update_setting("last_email_notification_date", today_iso)
-            except Exception as exc:
-                print(f"Unable to persist last_email_notification_date: {exc}")
+                return datetime.strptime(value, date_format)
+            except ValueError:
+                continue
+        return None
 
-    def check_due_invoices(self):
-        """Return list of invoices with due dates inside notification window."""
+    def send_daily_digest(self):
+        """Job for scheduler.job_scheduler: queues an email with what changed since the last digest.
+
+        Only invoices that are new in the notification window, became urgent
+        (due within URGENT_DAYS) or became overdue are listed; invoices already
+        reported in the same state are left out. The email itself is sent by
+        the outbox job (with retries). Raises when email is not configured, so
+        the scheduler tries again later and nothing is marked as reported.
+        """
+        settings = self.db.get_settings()
+        changes = self.db.get_due_invoice_changes(self._notification_days(settings), self.URGENT_DAYS)
+        if not changes:
+            return  # nothing changed
+
+        # A due date moved later only lowers the stored state, so it is reported again when it escalates
+        reportable = [invoice for invoice in changes
+                      if invoice["previous_bucket"] is None or invoice["bucket"] > invoice["previous_bucket"]]
+        # False = the same digest (same invoices and states) is already in the outbox, e.g. a retry
+        # after mark_invoices_notified failed; marking is correct then as well
+        if reportable and self.queue_email_notification(reportable) is None:
+            raise RuntimeError("Email notifications are not configured.")
+        self.db.mark_invoices_notified(changes)
+
+    def queue_email_notification(self, changes):
+        """Put the digest email for changed invoices (Database.get_due_invoice_changes rows) into the outbox.
+
+        The dedup key is built from the day, the invoices and their states, so the
+        same digest is queued once, while new changes on the same day get their own email.
+        Returns True when queued, False when this digest is already in the
+        outbox, None when email is not configured.
+        """
         settings = self.db.get_settings()
-        notification_days = settings.get("notification_days", 7)
+        recipient = self._email_recipient(settings)
+        if not recipient or not changes:
+            return None
+
+        sections = self._digest_sections(changes)
+        counts = [f"{title}: {len(items)}" for title, items in sections]
+        today = date.today().isoformat()
+        content = ",".join(f"{invoice['id']}:{invoice['bucket']}" for invoice in sorted(changes, key=lambda i: i["id"]))
+        content_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+        return self.outbox.enqueue(
+            recipient,
+            f"Upozorenje o računima – {', '.join(counts)}",
+            self._render_digest_html(sections),
+            dedup_key=f"due_invoices:{today}:{recipient}:{content_hash}",
+            digest_key=f"notifications:{today}",
+        )
+
+    @staticmethod
+    def _digest_sections(changes):
+        """Split changed invoices into (title, items) sections: new, escalated and newly overdue."""
+        new, escalated, overdue = [], [], []
+        for invoice in changes:
+            item = {"invoice": invoice, "days_until_due": invoice["days_until_due"]}
+            if invoice["bucket"] == DUE_BUCKET_OVERDUE:
+                overdue.append(item)
+            elif invoice["previous_bucket"] is None:
+                new.append(item)
+            elif invoice["bucket"] == DUE_BUCKET_URGENT:
+                escalated.append(item)
+        sections = [("Novi", new), ("Ističu uskoro", escalated), ("Dospeli", overdue)]
+        return [(title, items) for title, items in sections if items]
+
+    @staticmethod
+    def _notification_days(settings):
         try:
-            notification_days = int(notification_days)
+            return int(settings.get("notification_days", 7))
         except (TypeError, ValueError):
-            notification_days = 7
+            return 7
 
-        invoices = self.db.get_all_invoices(include_archived=False)
-        due_invoices = []
+    @staticmethod
+    def _email_recipient(settings):
+        """Recipient address if email notifications are enabled and configured, else None."""
+        if not settings.get("enable_email_notifications", False):
+            print("Email notifications are disabled.")
+            return None
 
-        today = datetime.now().date()
-        for invoice in invoices:
-            if invoice.get("is_paid"):
-                continue
+        provider_key = settings.get("email_provider", "gmail_oauth")
+        if provider_key not in ("gmail_oauth", "smtp"):
+            print(f"Email provider '{provider_key}' is not supported.")
+            return None
 
-            due_date_str = invoice.get("due_date")
-            if not due_date_str:
-                continue
+        notification_email = settings.get("notification_email")
+        if not notification_email:
+            print("Notification recipient email is not configured.")
+            return None
 
-            try:
-                due_date = datetime.strptime(due_date_str, "%d.%m.%Y").date()
-            except ValueError:
-                continue
+        return notification_email
 
-            days_until_due = (due_date - today).days
-            if 0 <= days_until_due <= notification_days:
-                due_invoices.append(
-                    {"invoice": invoice, "days_until_due": days_until_due}
-                )
+    def check_due_invoices(self):
+        """Return list of invoices with due dates inside notification window."""
+        notification_days = self._notification_days(self.db.get_settings())
+
+        due_invoices = [
+            {"invoice": invoice, "days_until_due": invoice["days_until_due"]}
+            for invoice in self.db.get_due_invoices(notification_days)
+        ]
 
         return due_invoices
 
@@ -213,18 +513,21 @@ class NotificationManager:
             message += f"\n... i još {count - 5} računa"
 
         try:
+            if self.toaster is None:
+                from win10toast import ToastNotifier
+                self.toaster = ToastNotifier()
             self.toaster.show_toast(title, message, duration=10, threaded=True)
         except Exception as exc:
             print(f"Greška pri prikazivanju notifikacije: {exc}")
 
-    def _render_email_html(self, due_invoices):
-        """Build HTML body for the email."""
+    def _render_table(self, due_invoices):
+        """HTML table rows for invoices ({"invoice": ..., "days_until_due": ...} items)."""
         rows_html = ""
         for item in due_invoices:
             invoice = item["invoice"]
             days = item["days_until_due"]
-            row_color = "#ffcccc" if days <= 3 else "#ffffcc"
-            amount = invoice.get("amount") or 0
+            row_color = "#ff9999" if days < 0 else "#ffcccc" if days <= self.URGENT_DAYS else "#ffffcc"
+            amount = invoice.get("remaining", invoice.get("amount")) or 0
             try:
                 amount_str = f"{float(amount):,.2f}"
             except (TypeError, ValueError):
@@ -240,20 +543,43 @@ class NotificationManager:
                 </tr>
             """
 
-        html_body = f"""
-            <html>
-                <body>
-                    <h2>Računi koji ističu uskoro:</h2>
+        return f"""
                     <table border="1" cellpadding="5" cellspacing="0" style="border-collapse: collapse;">
                         <tr style="background-color: #f2f2f2;">
                             <th>Dobavljač</th>
                             <th>Broj otpremnice</th>
-                            <th>Iznos (RSD)</th>
+                            <th>Preostalo (RSD)</th>
                             <th>Datum valute</th>
                             <th>Preostalo dana</th>
                         </tr>
                         {rows_html}
                     </table>
+        """
+
+    def _render_email_html(self, due_invoices):
+        """Build HTML body for the email."""
+        html_body = f"""
+            <html>
+                <body>
+                    <h2>Računi koji ističu uskoro:</h2>
+                    {self._render_table(due_invoices)}
+                    <br>
+                    <p>Molimo vas da obratite pažnju na ove račune.</p>
+                </body>
+            </html>
+        """
+        return html_body
+
+    def _render_digest_html(self, sections):
+        """Build HTML body for the digest: one table per (title, items) section."""
+        sections_html = "".join(
+            f"<h3>{title} ({len(items)}):</h3>{self._render_table(items)}" for title, items in sections
+        )
+        html_body = f"""
+            <html>
+                <body>
+                    <h2>Promene od poslednjeg obaveštenja:</h2>
+                    {sections_html}
                     <br>
                     <p>Molimo vas da obratite pažnju na ove račune.</p>
                 </body>
@@ -262,35 +588,25 @@ class NotificationManager:
         return html_body
 
     def send_email_notification(self, due_invoices):
-        """Send notification email via Gmail API."""
+        """Send notification email right away (bypasses the outbox, e.g. test email)."""
         if not due_invoices:
             return False
 
         settings = self.db.get_settings()
-        if not settings.get("enable_email_notifications", False):
-            print("Email notifications are disabled.")
-            return False
-
-        provider_key = settings.get("email_provider", "gmail_oauth")
-        if provider_key != "gmail_oauth":
-            print(f"Email provider '{provider_key}' is not supported.")
-            return False
-
-        notification_email = settings.get("notification_email")
+        notification_email = self._email_recipient(settings)
         if not notification_email:
-            print("Notification recipient email is not configured.")
             return False
 
-        if not GOOGLE_LIBRARIES_AVAILABLE:
+        if settings.get("email_provider", "gmail_oauth") == "gmail_oauth" and not GOOGLE_LIBRARIES_AVAILABLE:
             print(
                 "Google libraries are missing. Install required packages and try again."
             )
             return False
 
         try:
-            sender = GmailSender(settings)
+            sender = get_transport(settings)
         except Exception as exc:
-            print(f"Unable to initialize Gmail sender: {exc}")
+            print(f"Unable to initialize email sender: {exc}")
             return False
 
         subject = f"Upozorenje: {len(due_invoices)} račun(a) ističe uskoro!"
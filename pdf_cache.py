@@ -0,0 +1,93 @@
+# pdf_cache.py – keš generisanih PDF dokumenata po sadržaju
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+PDF_CACHE_DIR = 'pdf_dokumenti'
+PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+
+class PDFCache:
+    """PDF fajlovi u posebnom folderu, imenovani po hešu sadržaja dokumenta.
+
+    Ako se dokument (agregat iz baze, verzija šablona, podešavanja) nije
+    promenio, vraća se postojeći fajl bez ponovnog generisanja. Ukupna
+    veličina foldera je ograničena; prvo se brišu najdavnije korišćeni fajlovi.
+    """
+
+    def __init__(self, directory=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        """SHA-256 od JSON prikaza delova (redosled ključeva ne utiče na heš)"""
+        data = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def path_for(self, name, key):
+        return os.path.join(self.directory, f"{name}_{key[:16]}.pdf")
+
+    def get(self, name, key):
+        """Putanja keširanog PDF-a ili None"""
+        path = self.path_for(name, key)
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+        return None
+
+    def store(self, name, key, data):
+        """Upisuje PDF (bytes ili memoryview) u keš i vraća putanju.
+
+        Upisuje se u privremeni fajl pa se zamenjuje, da drugi proces nikad ne vidi pola fajla.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(name, key)
+        fd, temp_path = tempfile.mkstemp(prefix='.render_', suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        self.evict()
+        return path
+
+    def _touch(self, path):
+        # mtime služi kao vreme poslednjeg korišćenja za LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Briše najdavnije korišćene PDF-ove dok ukupna veličina ne padne ispod max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass  # npr. fajl je otvoren u PDF čitaču
+
+
+pdf_cache = PDFCache()
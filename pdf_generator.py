@@ -1,46 +1,246 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.units import cm, inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image, Flowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from datetime import datetime
+import io
 import os
+import shutil
+import threading
+
+from pdf_cache import pdf_cache
+from render_service import RenderCancelled
+
+
+_WINDOWS_FONTS = os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts')
+
+# Fontovi sa srpskim slovima (č, ć, š, đ, ž), redom po prioritetu: (regular, bold)
+FONT_CANDIDATES = [
+    (os.path.join(_WINDOWS_FONTS, 'arial.ttf'), os.path.join(_WINDOWS_FONTS, 'arialbd.ttf')),
+    (os.path.join(_WINDOWS_FONTS, 'ARIAL.TTF'), os.path.join(_WINDOWS_FONTS, 'ARIALBD.TTF')),
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/TTF/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/dejavu/DejaVuSans.ttf', '/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf'),
+    ('/Library/Fonts/Arial.ttf', '/Library/Fonts/Arial Bold.ttf'),
+    ('/System/Library/Fonts/Supplemental/Arial.ttf', '/System/Library/Fonts/Supplemental/Arial Bold.ttf'),
+]
+
+_registry_lock = threading.Lock()
+_fonts = None
+_sample_styles = None
+_paragraph_styles = {}
+
+
+def get_fonts():
+    """Registruje font jednom po procesu i vraća (font, font_bold, has_serbian_font)."""
+    global _fonts
+    with _registry_lock:
+        if _fonts is None:
+            _fonts = ('Helvetica', 'Helvetica-Bold', False)
+            for regular_path, bold_path in FONT_CANDIDATES:
+                if not (os.path.exists(regular_path) and os.path.exists(bold_path)):
+                    continue
+                try:
+                    pdfmetrics.registerFont(TTFont('CustomArial', regular_path))
+                    pdfmetrics.registerFont(TTFont('CustomArial-Bold', bold_path))
+                    _fonts = ('CustomArial', 'CustomArial-Bold', True)
+                    break
+                except Exception:
+                    continue
+        return _fonts
+
+
+def get_sample_styles():
+    """getSampleStyleSheet() se pravi samo jednom."""
+    global _sample_styles
+    with _registry_lock:
+        if _sample_styles is None:
+            _sample_styles = getSampleStyleSheet()
+        return _sample_styles
+
+
+def get_paragraph_style(name, **kwargs):
+    """Vraća keširan ParagraphStyle za dati naziv i parametre."""
+    key = (name, tuple(sorted(kwargs.items())))
+    style = _paragraph_styles.get(key)
+    if style is None:
+        style = ParagraphStyle(name, **kwargs)
+        with _registry_lock:
+            style = _paragraph_styles.setdefault(key, style)
+    return style
+
+
+LOGO_SIZE = 2*cm
+LOGO_DPI = 300
+_logo_cache = {}
+
+
+def get_logo_bytes(logo_path):
+    """Vraća PNG bajtove loga umanjenog na LOGO_SIZE, keširano po putanji i mtime-u fajla."""
+    try:
+        mtime = os.path.getmtime(logo_path)
+    except OSError:
+        return None
+
+    key = (logo_path, mtime)
+    with _registry_lock:
+        if key in _logo_cache:
+            return _logo_cache[key]
+
+    try:
+        from PIL import Image as PILImage
+        pixels = int(LOGO_SIZE / inch * LOGO_DPI)
+        with PILImage.open(logo_path) as img:
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA')
+            scaled = img.resize((pixels, pixels), PILImage.LANCZOS)
+            buffer = io.BytesIO()
+            scaled.save(buffer, format='PNG', optimize=True)
+        logo_bytes = buffer.getvalue()
+    except ImportError:
+        # Bez Pillow-a koristi originalni fajl, reportlab ga skalira pri crtanju
+        with open(logo_path, 'rb') as logo_file:
+            logo_bytes = logo_file.read()
+    except Exception as e:
+        print(f"Greška pri učitavanju loga: {e}")
+        logo_bytes = None
+
+    with _registry_lock:
+        # Zadrži samo aktuelnu verziju loga
+        for old_key in [k for k in _logo_cache if k[0] == logo_path]:
+            del _logo_cache[old_key]
+        _logo_cache[key] = logo_bytes
+    return logo_bytes
+
+
+REPORT_CHUNK_ROWS = 30
+
+# Povećati pri svakoj izmeni izgleda predračuna, narudžbine ili potvrde,
+# da se dokumenti iz pdf_cache ne bi koristili sa starim šablonom
+TEMPLATE_VERSION = 1
+
+# Podešavanja koja utiču na header dokumenta (samo ona ulaze u heš za keš)
+HEADER_SETTINGS = ('company_name', 'company_address', 'company_pib', 'company_bank_account', 'logo_path')
+_header_cache = {}
+
+
+def header_signature(settings):
+    """Podešavanja header-a i mtime loga; promena bilo čega od toga menja header (i heš u pdf_cache)"""
+    header = {key: settings.get(key) for key in HEADER_SETTINGS}
+    logo_path = header['logo_path']
+    header['logo_mtime'] = os.path.getmtime(logo_path) if logo_path and os.path.exists(logo_path) else None
+    return header
+
+
+class StreamingDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate koji flowable-e uzima iz generatora tek kada su potrebni,
+    pa se veliki izveštaj nikada ne drži ceo u memoriji."""
+
+    _pending = None
+    _queue = None
+
+    def build_stream(self, flowables):
+        self._pending = iter(flowables)
+        self._queue = []
+        self._refill(self._queue)
+        self.build(self._queue)
+
+    def filterFlowables(self, flowables):
+        # reportlab ovo zove i za svoju internu listu (_hanging); dopunjava se samo glavni red
+        if flowables is self._queue:
+            self._refill(flowables)
+
+    def _refill(self, flowables):
+        while self._pending is not None and len(flowables) < 2:
+            try:
+                flowables.append(next(self._pending))
+            except StopIteration:
+                self._pending = None
+
+
+class TableChunk(Flowable):
+    """Deo velike tabele (oko jedne strane redova).
+
+    Zaglavlje se crta za prvi deo i na vrhu svake strane, a deo koji se nastavlja
+    na istoj strani ga izostavlja, pa delovi izgledaju kao jedna tabela.
+    style_func(with_header, backgrounds) vraća listu komandi za TableStyle.
+    """
+
+    def __init__(self, header, rows, backgrounds, col_widths, style_func, frame_height, first=False):
+        Flowable.__init__(self)
+        self.header = header
+        self.rows = rows
+        self.backgrounds = backgrounds
+        self.col_widths = col_widths
+        self.style_func = style_func
+        self.frame_height = frame_height
+        self.first = first
+        self.hAlign = 'CENTER'
+        self._table = None
+        self._with_header = None
+
+    def _get_table(self, avail_height):
+        # Frame ima 6pt padding-a gore i dole; ostatak tolerancije za zaokruživanje
+        with_header = self.first or avail_height >= self.frame_height - 13
+        if self._table is None or with_header != self._with_header:
+            data = [self.header] + self.rows if with_header else self.rows
+            self._table = Table(data, colWidths=self.col_widths, repeatRows=1 if with_header else 0)
+            self._table.setStyle(TableStyle(self.style_func(with_header, self.backgrounds)))
+            self._with_header = with_header
+        return self._table
+
+    def wrap(self, availWidth, availHeight):
+        self.width, self.height = self._get_table(availHeight).wrap(availWidth, availHeight)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        table = self._get_table(availHeight)
+        parts = table.split(availWidth, availHeight)
+        if len(parts) < 2 or self._with_header:
+            # reportlab sam ponavlja zaglavlje (repeatRows) u nastavku
+            return parts
+        done = len(parts[0]._cellvalues)
+        rest = TableChunk(self.header, self.rows[done:], self.backgrounds[done:],
+                          self.col_widths, self.style_func, self.frame_height)
+        return [parts[0], rest]
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        self._table.drawOn(canvas, x, y, _sW)
+
+
+def row_background_commands(backgrounds, first_row):
+    """Spaja uzastopne redove iste boje u jednu BACKGROUND komandu."""
+    commands = []
+    start = None
+    for index, color in enumerate(backgrounds + [None]):
+        if start is not None and color != backgrounds[start]:
+            commands.append(('BACKGROUND', (0, first_row + start), (-1, first_row + index - 1), backgrounds[start]))
+            start = None
+        if start is None and color is not None:
+            start = index
+    return commands
 
 
 class PDFGenerator:
     def __init__(self, db):
         self.db = db
-        
-        self.has_serbian_font = False
-        self.font_name = 'Helvetica'
-        self.font_name_bold = 'Helvetica-Bold'
-        
-        font_paths = [
-            ('C:\\Windows\\Fonts\\arial.ttf', 'C:\\Windows\\Fonts\\arialbd.ttf'),
-            ('C:\\Windows\\Fonts\\ARIAL.TTF', 'C:\\Windows\\Fonts\\ARIALBD.TTF'),
-        ]
-        
-        for regular_path, bold_path in font_paths:
-            try:
-                pdfmetrics.registerFont(TTFont('CustomArial', regular_path))
-                pdfmetrics.registerFont(TTFont('CustomArial-Bold', bold_path))
-                self.has_serbian_font = True
-                self.font_name = 'CustomArial'
-                self.font_name_bold = 'CustomArial-Bold'
-                break
-            except Exception as e:
-                continue
+        self.font_name, self.font_name_bold, self.has_serbian_font = get_fonts()
+    
+    def _style(self, name, bold=False, **kwargs):
+        """Keširan stil sa fontom generatora (regular ili bold)."""
+        return get_paragraph_style(name, fontName=self._get_font(bold), **kwargs)
     
     def _get_styles(self):
-        styles = getSampleStyleSheet()
+        styles = get_sample_styles()
         
         font = self.font_name
         font_bold = self.font_name_bold
         
-        title_style = ParagraphStyle(
+        title_style = get_paragraph_style(
             'CustomTitle',
             parent=styles['Heading1'],
             fontName=font_bold,
@@ -49,7 +249,7 @@ class PDFGenerator:
             spaceAfter=20
         )
         
-        heading_style = ParagraphStyle(
+        heading_style = get_paragraph_style(
             'CustomHeading',
             parent=styles['Heading2'],
             fontName=font_bold,
@@ -57,7 +257,7 @@ class PDFGenerator:
             spaceAfter=12
         )
         
-        normal_style = ParagraphStyle(
+        normal_style = get_paragraph_style(
             'CustomNormal',
             parent=styles['Normal'],
             fontName=font,
@@ -80,13 +280,7 @@ class PDFGenerator:
         if max_width and len(text_str) <= max_width:
             return text_str
         
-        style = ParagraphStyle(
-            'cell_wrap',
-            fontName=self._get_font(),
-            fontSize=font_size,
-            leading=font_size + 1,
-            alignment=align
-        )
+        style = self._style('cell_wrap', fontSize=font_size, leading=font_size + 1, alignment=align)
         return Paragraph(text_str, style)
     
     def _format_month_year(self, date_str):
@@ -100,21 +294,74 @@ class PDFGenerator:
         except:
             return date_str
     
-    def generate_invoice_report(self, invoices):
+    def _iter_table_chunks(self, header, rows, col_widths, style_func, frame_height, progress_callback=None, total=None):
+        """Deli redove (cells, background) u TableChunk delove od REPORT_CHUNK_ROWS redova."""
+        done = 0
+        chunk_rows, chunk_backgrounds = [], []
+        first = True
+        for cells, background in rows:
+            chunk_rows.append(cells)
+            chunk_backgrounds.append(background)
+            if len(chunk_rows) >= REPORT_CHUNK_ROWS:
+                yield TableChunk(header, chunk_rows, chunk_backgrounds, col_widths, style_func, frame_height, first)
+                done += len(chunk_rows)
+                if progress_callback:
+                    progress_callback(done, total)
+                chunk_rows, chunk_backgrounds = [], []
+                first = False
+        if chunk_rows or first:
+            yield TableChunk(header, chunk_rows, chunk_backgrounds, col_widths, style_func, frame_height, first)
+            done += len(chunk_rows)
+            if progress_callback:
+                progress_callback(done, total)
+
+    def _invoice_table_style(self, with_header, backgrounds):
+        body = 1 if with_header else 0
+        commands = [
+            ('FONTNAME', (0, 0), (-1, -1), self._get_font()),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (2, body), (2, -1), 'LEFT'),
+            ('TOPPADDING', (0, body), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, body), (-1, -1), 5),
+            ('BACKGROUND', (0, body), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, body), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]
+        if with_header:
+            commands += [
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('FONTNAME', (0, 0), (-1, 0), self._get_font(bold=True)),
+                ('FONTSIZE', (0, 0), (-1, 0), 9),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ]
+        return commands + row_background_commands(backgrounds, body)
+
+    def generate_invoice_report(self, invoices, progress_callback=None, output=None):
+        """Izveštaj o računima; tabela se pravi u delovima, pa memorija ne raste sa brojem redova.
+
+        invoices može biti lista ili iterator redova sa total_paid, remaining, payment_status i
+        last_payment_date (Database.get_invoices_with_payment_summary); progress_callback(urađeno, ukupno)
+        se poziva posle svakog dela. output (putanja ili io.BytesIO) zamenjuje podrazumevani fajl.
+        """
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'racuni_izvestaj_{timestamp}.pdf'
+        filename = output or f'racuni_izvestaj_{timestamp}.pdf'
         
         from reportlab.lib.pagesizes import landscape
-        doc = SimpleDocTemplate(filename, pagesize=landscape(A4))
-        elements = []
-        
+        doc = StreamingDocTemplate(filename, pagesize=landscape(A4))
+        total = len(invoices) if hasattr(invoices, '__len__') else None
+        doc.build_stream(self._invoice_report_flowables(invoices, doc.height, progress_callback, total))
+        return filename
+    
+    def _invoice_report_flowables(self, invoices, frame_height, progress_callback, total):
         title_style, heading_style, normal_style = self._get_styles()
         
-        elements.append(Paragraph("Izveštaj o računima dobavljača", title_style))
-        elements.append(Paragraph(f"Datum: {datetime.now().strftime('%d.%m.%Y %H:%M')}", normal_style))
-        elements.append(Spacer(1, 0.5*cm))
+        yield Paragraph("Izveštaj o računima dobavljača", title_style)
+        yield Paragraph(f"Datum: {datetime.now().strftime('%d.%m.%Y %H:%M')}", normal_style)
+        yield Spacer(1, 0.5*cm)
         
-        data = [[
+        header = [
             'Datum\nfakture', 
             'Datum\nvalute', 
             'Dobavljač', 
@@ -124,149 +371,175 @@ class PDFGenerator:
             'Preostalo\n(RSD)', 
             'Status', 
             'Posl.\nuplata'
-        ]]
-        
-        for inv in invoices:
-            total_paid = inv.get('total_paid', 0)
-            remaining = inv.get('remaining', 0)
-            status = inv.get('payment_status', 'Neplaćeno')
-            
-            last_payment = self.db.get_last_payment_date(inv['id']) if hasattr(self.db, 'get_last_payment_date') else "-"
-            
-            vendor_paragraph = Paragraph(inv['vendor_name'], ParagraphStyle(
-                'cell',
-                fontName=self._get_font(),
-                fontSize=8,
-                leading=9,
-                alignment=TA_LEFT
-            ))
-            
-            delivery_note_paragraph = Paragraph(inv['delivery_note_number'], ParagraphStyle(
-                'cell',
-                fontName=self._get_font(),
-                fontSize=7,
-                leading=8,
-                alignment=TA_CENTER
-            ))
-            
-            data.append([
-                inv['invoice_date'],
-                inv['due_date'],
-                vendor_paragraph,
-                delivery_note_paragraph,
-                f"{inv['amount']:,.2f}",
-                f"{total_paid:,.2f}",
-                f"{remaining:,.2f}",
-                status,
-                last_payment if last_payment else "-"
-            ])
-        
-        table = Table(data, colWidths=[2*cm, 2*cm, 4*cm, 2.5*cm, 2.3*cm, 2.3*cm, 2.3*cm, 2*cm, 2*cm])
-        table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), self._get_font()),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (2, 1), (2, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), self._get_font(bold=True)),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 1), (-1, -1), 5),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 5),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.5*cm))
-        
-        total = sum(inv['amount'] for inv in invoices)
-        total_paid_sum = sum(inv.get('total_paid', 0) for inv in invoices)
-        remaining_sum = sum(inv.get('remaining', 0) for inv in invoices)
+        ]
         
-        status_counts = {
-            'Neplaćeno': sum(1 for inv in invoices if inv.get('payment_status', 'Neplaćeno') == 'Neplaćeno'),
-            'Delimično': sum(1 for inv in invoices if inv.get('payment_status', 'Neplaćeno') == 'Delimično'),
-            'Plaćeno': sum(1 for inv in invoices if inv.get('payment_status', 'Neplaćeno') == 'Plaćeno')
-        }
+        vendor_style = self._style('cell', fontSize=8, leading=9, alignment=TA_LEFT)
+        delivery_note_style = self._style('cell', fontSize=7, leading=8, alignment=TA_CENTER)
+        
+        totals = {'amount': 0, 'paid': 0, 'remaining': 0}
+        status_counts = {'Neplaćeno': 0, 'Delimično': 0, 'Plaćeno': 0}
+        
+        def rows():
+            for inv in invoices:
+                total_paid = inv.get('total_paid', 0)
+                remaining = inv.get('remaining', 0)
+                status = inv.get('payment_status', 'Neplaćeno')
+                
+                last_payment = inv.get('last_payment_date')
+                
+                totals['amount'] += inv['amount']
+                totals['paid'] += total_paid
+                totals['remaining'] += remaining
+                if status in status_counts:
+                    status_counts[status] += 1
+                
+                yield [
+                    inv['invoice_date'],
+                    inv['due_date'],
+                    Paragraph(inv['vendor_name'], vendor_style),
+                    Paragraph(inv['delivery_note_number'], delivery_note_style),
+                    f"{inv['amount']:,.2f}",
+                    f"{total_paid:,.2f}",
+                    f"{remaining:,.2f}",
+                    status,
+                    last_payment if last_payment else "-"
+                ], None
+        
+        yield from self._iter_table_chunks(
+            header, rows(), [2*cm, 2*cm, 4*cm, 2.5*cm, 2.3*cm, 2.3*cm, 2.3*cm, 2*cm, 2*cm],
+            self._invoice_table_style, frame_height, progress_callback, total
+        )
+        yield Spacer(1, 0.5*cm)
         
         stats_text = (
-            f"<b>Ukupan iznos:</b> {total:,.2f} RSD | "
-            f"<b>Plaćeno:</b> {total_paid_sum:,.2f} RSD | "
-            f"<b>Preostalo:</b> {remaining_sum:,.2f} RSD<br/>"
+            f"<b>Ukupan iznos:</b> {totals['amount']:,.2f} RSD | "
+            f"<b>Plaćeno:</b> {totals['paid']:,.2f} RSD | "
+            f"<b>Preostalo:</b> {totals['remaining']:,.2f} RSD<br/>"
             f"<b>Računi:</b> Neplaćeno: {status_counts['Neplaćeno']} | "
             f"Delimično: {status_counts['Delimično']} | "
             f"Plaćeno: {status_counts['Plaćeno']}"
         )
-        elements.append(Paragraph(stats_text, normal_style))
-        
-        doc.build(elements)
-        return filename
+        yield Paragraph(stats_text, normal_style)
     
-    def generate_proforma_pdf(self, proforma_id):
-        proforma = self.db.get_proforma_by_id(proforma_id)
-        items = self.db.get_proforma_items(proforma_id)
-        customer = self.db.get_customer_by_id(proforma['customer_id']) if proforma['customer_id'] else None
-        
-        total_paid = self.db.get_total_paid_proforma(proforma_id)
-        remaining = proforma['total_amount'] - total_paid
-        status = self.db.get_payment_status_proforma(proforma_id)
-        last_payment_date = self.db.get_last_payment_date_proforma(proforma_id)
-        
-        settings = self.db.get_settings()
-        company_name = settings.get('company_name', '')
-        company_address = settings.get('company_address', '')
-        company_pib = settings.get('company_pib', '')
-        company_bank_account = settings.get('company_bank_account', '')
-        logo_path = settings.get('logo_path', '')
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'predracun_{proforma["proforma_number"]}_{timestamp}.pdf'
-        
-        doc = SimpleDocTemplate(filename, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
+    # Vrsta dokumenta -> (metoda Database koja ga učitava, metoda koja ga crta)
+    DOCUMENTS = {
+        'proforma': ('load_proforma_document', 'render_proforma_pdf'),
+        'order': ('load_order_document', 'render_order_pdf'),
+        'utility_receipt': ('load_utility_receipt_document', 'render_utility_payment_receipt'),
+    }
+    
+    @staticmethod
+    def document_name(kind, document):
+        """Ime PDF fajla dokumenta bez ekstenzije"""
+        if kind == 'proforma':
+            return f"predracun_{document['proforma']['proforma_number']}"
+        if kind == 'order':
+            return f"narudzbenica_{document['order']['order_number']}"
+        bill = document['bill']
+        return f"{bill['utility_type_name'].replace(' ', '_')}_potvrda_{bill['id']}"
+    
+    @staticmethod
+    def _report_build_progress(doc, progress_callback):
+        """progress_callback(urađeno, ukupno) posle svakog flowable-a (reportlab setProgressCallBack).
+
+        Izuzetak iz njega (RenderCancelled pri otkazivanju) prekida build.
+        """
+        if not progress_callback:
+            return
+        size = {'total': None}
+
+        def on_progress(kind, value):
+            if kind == 'SIZE_EST':
+                size['total'] = value
+            elif kind == 'PROGRESS':
+                progress_callback(value, size['total'])
+
+        doc.setProgressCallBack(on_progress)
+    
+    def render_pdf_bytes(self, render, *args, **kwargs):
+        """Generiše PDF u memoriji; vraća memoryview nad bafer-om (bez kopiranja) ili None"""
+        buffer = io.BytesIO()
+        if render(*args, output=buffer, **kwargs) is None:
+            return None
+        return buffer.getbuffer()
+    
+    def _document_key(self, kind, document):
+        header = header_signature(document['settings'])
+        content = {key: value for key, value in document.items() if key != 'settings'}
+        return pdf_cache.key(kind, TEMPLATE_VERSION, self.font_name, header, content)
+    
+    def _cached_document(self, kind, document, progress_callback=None):
+        """(ime, putanja u pdf_cache, podaci).
+
+        Ako je dokument već u kešu podaci su None; inače se PDF generiše u memoriji
+        i isti bafer se upisuje u keš i vraća pozivaocu. Otkazivanje preko
+        progress_callback prekida build pre nego što se išta upiše.
+        """
+        name = self.document_name(kind, document)
+        key = self._document_key(kind, document)
+        path = pdf_cache.get(name, key)
+        if path:
+            return name, path, None
+
+        data = self.render_pdf_bytes(getattr(self, self.DOCUMENTS[kind][1]), document,
+                                     progress_callback=progress_callback)
+        if data is None:
+            return name, None, None
+        return name, pdf_cache.store(name, key, data), data
+    
+    def _save_document(self, kind, document, output_dir=None, progress_callback=None):
+        """Putanja PDF-a u pdf_cache; sa output_dir (grupni izvoz) upisuje se tamo kao <ime>.pdf"""
+        name, path, data = self._cached_document(kind, document, progress_callback)
+        if path and output_dir:
+            target = os.path.join(output_dir, f"{name}.pdf")
+            if data is None:
+                shutil.copyfile(path, target)
+            else:
+                with open(target, 'wb') as f:
+                    f.write(data)
+            return target
+        return path
+    
+    def get_document_pdf(self, kind, document_id, progress_callback=None):
+        """(ime fajla, sadržaj) PDF-a za slanje mejlom, bez privremenih fajlova; None ako dokument ne postoji"""
+        document = getattr(self.db, self.DOCUMENTS[kind][0])(document_id)
+        if not document:
+            return None
+        name, path, data = self._cached_document(kind, document, progress_callback)
+        if path is None:
+            return None
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        return f"{name}.pdf", data
+    
+    def generate_proforma_pdf(self, proforma_id, output_dir=None, progress_callback=None):
+        document = self.db.load_proforma_document(proforma_id)
+        if not document:
+            raise Exception("Predračun nije pronađen")
+        return self._save_document('proforma', document, output_dir, progress_callback)
+    
+    def render_proforma_pdf(self, document, output, progress_callback=None):
+        """PDF predračuna samo iz učitanog dokumenta (Database.load_proforma_document), bez upita ka bazi.
+
+        output je putanja ili fajl-objekat (npr. io.BytesIO); progress_callback(urađeno, ukupno)
+        se poziva posle svakog elementa dokumenta.
+        """
+        proforma = document['proforma']
+        items = document['items']
+        customer = document['customer']
+        
+        total_paid = proforma['total_paid']
+        remaining = proforma['remaining']
+        status = proforma['status']
+        last_payment_date = proforma['last_payment_date']
+        
+        doc = SimpleDocTemplate(output, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
         elements = []
         
         title_style, heading_style, normal_style = self._get_styles()
         
-        if company_name or company_address:
-            logo_image = None
-            if logo_path and os.path.exists(logo_path):
-                try:
-                    from reportlab.platypus import Image
-                    logo_image = Image(logo_path, width=2*cm, height=2*cm)
-                except Exception as e:
-                    print(f"Greška pri učitavanju loga: {e}")
-                    logo_image = None
-            
-            company_info_lines = []
-            if company_name:
-                company_info_lines.append(Paragraph(f"<b>{company_name}</b>", 
-                    ParagraphStyle('company', fontName=self._get_font(bold=True), fontSize=12, leading=14)))
-            if company_address:
-                company_info_lines.append(Paragraph(company_address, 
-                    ParagraphStyle('address', fontName=self._get_font(), fontSize=9, leading=11)))
-            if company_pib:
-                company_info_lines.append(Paragraph(f"PIB: {company_pib}", 
-                    ParagraphStyle('pib', fontName=self._get_font(), fontSize=9, leading=11)))
-            if company_bank_account:
-                company_info_lines.append(Paragraph(f"Broj računa: {company_bank_account}", 
-                    ParagraphStyle('bank', fontName=self._get_font(), fontSize=9, leading=11)))
-            
-            if logo_image:
-                header_table = Table([[company_info_lines, logo_image]], colWidths=[14*cm, 3*cm])
-            else:
-                header_table = Table([[company_info_lines, '']], colWidths=[14*cm, 3*cm])
-            
-            header_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-            ]))
-            
-            elements.append(header_table)
-            elements.append(Spacer(1, 0.5*cm))
+        elements.extend(self._create_company_header(document['settings']))
         
         elements.append(Paragraph(f"PREDRAČUN BR. {proforma['proforma_number']}", title_style))
         elements.append(Spacer(1, 0.3*cm))
@@ -391,21 +664,16 @@ class PDFGenerator:
             elements.append(Spacer(1, 0.5*cm))
             elements.append(Paragraph("<b>Napomena:</b>", normal_style))
             elements.append(Spacer(1, 0.1*cm))
-            note_para = Paragraph(proforma['notes'], ParagraphStyle(
-                'note',
-                fontName=self._get_font(),
-                fontSize=9,
-                leading=11,
-                alignment=TA_LEFT
-            ))
+            note_para = Paragraph(proforma['notes'], self._style('note', fontSize=9, leading=11, alignment=TA_LEFT))
             elements.append(note_para)
         
+        self._report_build_progress(doc, progress_callback)
         doc.build(elements)
-        return filename
+        return output
     
-    def generate_utility_report(self, bills):
+    def generate_utility_report(self, bills, output=None):
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'komunalije_izvestaj_{timestamp}.pdf'
+        filename = output or f'komunalije_izvestaj_{timestamp}.pdf'
         
         doc = SimpleDocTemplate(filename, pagesize=A4)
         elements = []
@@ -459,107 +727,110 @@ class PDFGenerator:
         doc.build(elements)
         return filename
     
-    def generate_revenue_report(self, entries, filter_info=None):
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'promet_izvestaj_{timestamp}.pdf'
-        
-        doc = SimpleDocTemplate(filename, pagesize=A4, 
-                               topMargin=1.5*cm, bottomMargin=1.5*cm,
-                               leftMargin=1.5*cm, rightMargin=1.5*cm)
-        elements = []
-        
-        title_style, heading_style, normal_style = self._get_styles()
-        
-        elements.append(Paragraph("Izveštaj o kontroli prometa", title_style))
-        elements.append(Paragraph(f"Datum: {datetime.now().strftime('%d.%m.%Y %H:%M')}", normal_style))
-        
-        if filter_info:
-            filter_text = f"Period: {filter_info['date_from']} - {filter_info['date_to']}"
-            elements.append(Paragraph(filter_text, ParagraphStyle(
-                'filter',
-                fontName=self._get_font(),
-                fontSize=9,
-                leading=11,
-                alignment=TA_CENTER,
-                textColor=colors.grey
-            )))
-        
-        elements.append(Spacer(1, 0.5*cm))
-        
-        data = [['Datum', 'Gotovina\n(RSD)', 'Kartica\n(RSD)', 'Virman\n(RSD)', 'Čekovi\n(RSD)', 'Ukupno\n(RSD)', 'Status', 'Napomena']]
-        
-        for entry in entries:
-            payment_status = entry.get('payment_status', 'Neplaćeno')
-            
-            data.append([
-                entry['date_from'],
-                f"{entry.get('cash', 0):,.2f}",
-                f"{entry.get('card', 0):,.2f}",
-                f"{entry.get('wire', 0):,.2f}",
-                f"{entry.get('checks', 0):,.2f}",
-                f"{entry['amount']:,.2f}",
-                payment_status,
-                self._wrap_text(entry['notes'] if entry['notes'] else "-", font_size=7, align=TA_LEFT)
-            ])
-        
-        table = Table(data, colWidths=[2*cm, 2*cm, 2*cm, 2*cm, 2*cm, 2.3*cm, 1.7*cm, 4*cm])
-        
-        table.setStyle(TableStyle([
+    def _revenue_table_style(self, with_header, backgrounds):
+        body = 1 if with_header else 0
+        commands = [
             ('FONTNAME', (0, 0), (-1, -1), self._get_font()),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('ALIGN', (7, 0), (7, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), self._get_font(bold=True)),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 1), (-1, -1), 5),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 5),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('TOPPADDING', (0, body), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, body), (-1, -1), 5),
+            ('BACKGROUND', (0, body), (-1, -1), colors.beige),
             ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
+            ('FONTSIZE', (0, body), (-1, -1), 7),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        ]
+        if with_header:
+            commands += [
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('FONTNAME', (0, 0), (-1, 0), self._get_font(bold=True)),
+                ('FONTSIZE', (0, 0), (-1, 0), 8),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ]
+        return commands + row_background_commands(backgrounds, body)
+
+    def generate_revenue_report(self, entries, filter_info=None, progress_callback=None, output=None):
+        """Izveštaj o prometu; kao i generate_invoice_report, tabela se pravi u delovima."""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = output or f'promet_izvestaj_{timestamp}.pdf'
         
-        for idx, entry in enumerate(entries, start=1):
-            if entry.get('payment_status') == 'Plaćeno':
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, idx), (-1, idx), colors.lightgreen)
-                ]))
+        doc = StreamingDocTemplate(filename, pagesize=A4, 
+                                   topMargin=1.5*cm, bottomMargin=1.5*cm,
+                                   leftMargin=1.5*cm, rightMargin=1.5*cm)
+        total = len(entries) if hasattr(entries, '__len__') else None
+        doc.build_stream(self._revenue_report_flowables(entries, filter_info, doc.height, progress_callback, total))
+        return filename
+    
+    def _revenue_report_flowables(self, entries, filter_info, frame_height, progress_callback, total):
+        title_style, heading_style, normal_style = self._get_styles()
         
-        elements.append(table)
-        elements.append(Spacer(1, 0.5*cm))
+        yield Paragraph("Izveštaj o kontroli prometa", title_style)
+        yield Paragraph(f"Datum: {datetime.now().strftime('%d.%m.%Y %H:%M')}", normal_style)
         
-        elements.append(Paragraph("─" * 100, normal_style))
-        elements.append(Spacer(1, 0.3*cm))
+        if filter_info:
+            filter_text = f"Period: {filter_info['date_from']} - {filter_info['date_to']}"
+            yield Paragraph(filter_text, self._style(
+                'filter', fontSize=9, leading=11, alignment=TA_CENTER, textColor=colors.grey
+            ))
         
-        total_cash = sum(e.get('cash', 0) for e in entries)
-        total_card = sum(e.get('card', 0) for e in entries)
-        total_wire = sum(e.get('wire', 0) for e in entries)
-        total_checks = sum(e.get('checks', 0) for e in entries)
-        total_revenue = sum(entry['amount'] for entry in entries)
+        yield Spacer(1, 0.5*cm)
+        
+        header = ['Datum', 'Gotovina\n(RSD)', 'Kartica\n(RSD)', 'Virman\n(RSD)', 'Čekovi\n(RSD)', 'Ukupno\n(RSD)', 'Status', 'Napomena']
+        
+        totals = {'count': 0, 'cash': 0, 'card': 0, 'wire': 0, 'checks': 0, 'amount': 0}
+        status_totals = {'Plaćeno': [0, 0], 'Neplaćeno': [0, 0]}
+        
+        def rows():
+            for entry in entries:
+                payment_status = entry.get('payment_status', 'Neplaćeno')
+                
+                totals['count'] += 1
+                for key in ('cash', 'card', 'wire', 'checks'):
+                    totals[key] += entry.get(key, 0)
+                totals['amount'] += entry['amount']
+                if entry.get('payment_status') in status_totals:
+                    status_totals[entry['payment_status']][0] += entry.get('amount', 0)
+                    status_totals[entry['payment_status']][1] += 1
+                
+                yield [
+                    entry['date_from'],
+                    f"{entry.get('cash', 0):,.2f}",
+                    f"{entry.get('card', 0):,.2f}",
+                    f"{entry.get('wire', 0):,.2f}",
+                    f"{entry.get('checks', 0):,.2f}",
+                    f"{entry['amount']:,.2f}",
+                    payment_status,
+                    self._wrap_text(entry['notes'] if entry['notes'] else "-", font_size=7, align=TA_LEFT)
+                ], colors.lightgreen if entry.get('payment_status') == 'Plaćeno' else None
+        
+        yield from self._iter_table_chunks(
+            header, rows(), [2*cm, 2*cm, 2*cm, 2*cm, 2*cm, 2.3*cm, 1.7*cm, 4*cm],
+            self._revenue_table_style, frame_height, progress_callback, total
+        )
+        yield Spacer(1, 0.5*cm)
         
-        paid_entries = [e for e in entries if e.get('payment_status') == 'Plaćeno']
-        unpaid_entries = [e for e in entries if e.get('payment_status') == 'Neplaćeno']
+        yield Paragraph("─" * 100, normal_style)
+        yield Spacer(1, 0.3*cm)
         
-        paid_amount = sum(e.get('amount', 0) for e in paid_entries)
-        unpaid_amount = sum(e.get('amount', 0) for e in unpaid_entries)
+        paid_amount, paid_count = status_totals['Plaćeno']
+        unpaid_amount, unpaid_count = status_totals['Neplaćeno']
         
         stats_text = (
             f"<b>STATISTIKA</b><br/>"
-            f"<b>Ukupno unosa:</b> {len(entries)} | "
-            f"<b>Ukupan promet:</b> {total_revenue:,.2f} RSD<br/>"
+            f"<b>Ukupno unosa:</b> {totals['count']} | "
+            f"<b>Ukupan promet:</b> {totals['amount']:,.2f} RSD<br/>"
             f"<b>Promet po vrstama:</b><br/>"
-            f"&nbsp;&nbsp;• Gotovina: {total_cash:,.2f} RSD<br/>"
-            f"&nbsp;&nbsp;• Kartica: {total_card:,.2f} RSD<br/>"
-            f"&nbsp;&nbsp;• Virman: {total_wire:,.2f} RSD<br/>"
-            f"&nbsp;&nbsp;• Čekovi: {total_checks:,.2f} RSD<br/><br/>"
+            f"&nbsp;&nbsp;• Gotovina: {totals['cash']:,.2f} RSD<br/>"
+            f"&nbsp;&nbsp;• Kartica: {totals['card']:,.2f} RSD<br/>"
+            f"&nbsp;&nbsp;• Virman: {totals['wire']:,.2f} RSD<br/>"
+            f"&nbsp;&nbsp;• Čekovi: {totals['checks']:,.2f} RSD<br/><br/>"
             f"<b>Status plaćanja:</b><br/>"
-            f"&nbsp;&nbsp;• ✅ Plaćeno: {paid_amount:,.2f} RSD ({len(paid_entries)} unosa)<br/>"
-            f"&nbsp;&nbsp;• ⚪ Neplaćeno: {unpaid_amount:,.2f} RSD ({len(unpaid_entries)} unosa)"
+            f"&nbsp;&nbsp;• ✅ Plaćeno: {paid_amount:,.2f} RSD ({paid_count} unosa)<br/>"
+            f"&nbsp;&nbsp;• ⚪ Neplaćeno: {unpaid_amount:,.2f} RSD ({unpaid_count} unosa)"
         )
         
-        stats_style = ParagraphStyle(
+        stats_style = get_paragraph_style(
             'stats',
             parent=normal_style,
             fontSize=9,
@@ -568,80 +839,31 @@ class PDFGenerator:
             spaceAfter=6
         )
         
-        elements.append(Paragraph(stats_text, stats_style))
+        yield Paragraph(stats_text, stats_style)
         
-        elements.append(Spacer(1, 0.5*cm))
+        yield Spacer(1, 0.5*cm)
         legend_text = "<i>Napomena: Zelena boja označava plaćene stavke.</i>"
-        elements.append(Paragraph(legend_text, ParagraphStyle(
-            'legend',
-            fontName=self._get_font(),
-            fontSize=8,
-            textColor=colors.grey,
-            alignment=TA_CENTER
-        )))
-        
-        doc.build(elements)
-        return filename
+        yield Paragraph(legend_text, self._style(
+            'legend', fontSize=8, textColor=colors.grey, alignment=TA_CENTER
+        ))
     
-    def generate_utility_payment_receipt(self, bill_id):
-        bill = self.db.get_utility_bill_by_id(bill_id)
+    def generate_utility_payment_receipt(self, bill_id, progress_callback=None):
+        document = self.db.load_utility_receipt_document(bill_id)
         
-        if not bill:
+        if not document:
             raise Exception("Račun nije pronađen")
+        return self._save_document('utility_receipt', document, progress_callback=progress_callback)
+    
+    def render_utility_payment_receipt(self, document, output, progress_callback=None):
+        """PDF potvrde samo iz učitanog dokumenta (Database.load_utility_receipt_document); output i progress_callback kao kod render_proforma_pdf"""
+        bill = document['bill']
         
-        settings = self.db.get_settings()
-        company_name = settings.get('company_name', '')
-        company_address = settings.get('company_address', '')
-        company_pib = settings.get('company_pib', '')
-        company_bank_account = settings.get('company_bank_account', '')
-        logo_path = settings.get('logo_path', '')
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        utility_type = bill['utility_type_name'].replace(' ', '_')
-        filename = f'{utility_type}_potvrda_{timestamp}.pdf'
-        
-        doc = SimpleDocTemplate(filename, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
+        doc = SimpleDocTemplate(output, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
         elements = []
         
         title_style, heading_style, normal_style = self._get_styles()
         
-        if company_name or company_address:
-            logo_image = None
-            if logo_path and os.path.exists(logo_path):
-                try:
-                    from reportlab.platypus import Image
-                    logo_image = Image(logo_path, width=2*cm, height=2*cm)
-                except Exception as e:
-                    print(f"Greška pri učitavanju loga: {e}")
-                    logo_image = None
-            
-            company_info_lines = []
-            if company_name:
-                company_info_lines.append(Paragraph(f"<b>{company_name}</b>", 
-                    ParagraphStyle('company', fontName=self._get_font(bold=True), fontSize=12, leading=14)))
-            if company_address:
-                company_info_lines.append(Paragraph(company_address, 
-                    ParagraphStyle('address', fontName=self._get_font(), fontSize=9, leading=11)))
-            if company_pib:
-                company_info_lines.append(Paragraph(f"PIB: {company_pib}", 
-                    ParagraphStyle('pib', fontName=self._get_font(), fontSize=9, leading=11)))
-            if company_bank_account:
-                company_info_lines.append(Paragraph(f"Broj računa: {company_bank_account}", 
-                    ParagraphStyle('bank', fontName=self._get_font(), fontSize=9, leading=11)))
-            
-            if logo_image:
-                header_table = Table([[company_info_lines, logo_image]], colWidths=[14*cm, 3*cm])
-            else:
-                header_table = Table([[company_info_lines, '']], colWidths=[14*cm, 3*cm])
-            
-            header_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-            ]))
-            
-            elements.append(header_table)
-            elements.append(Spacer(1, 0.5*cm))
+        elements.extend(self._create_company_header(document['settings']))
         
         title_text = f"{bill['utility_type_name'].upper()} - POTVRDA O PLAĆANJU"
         elements.append(Paragraph(title_text, title_style))
@@ -697,121 +919,103 @@ class PDFGenerator:
         
         elements.append(Spacer(1, 1*cm))
         footer_text = f"<i>Datum kreiranja potvrde: {datetime.now().strftime('%d.%m.%Y %H:%M')}</i>"
-        elements.append(Paragraph(footer_text, ParagraphStyle(
-            'footer',
-            fontName=self._get_font(),
-            fontSize=8,
-            textColor=colors.grey,
-            alignment=TA_CENTER
+        elements.append(Paragraph(footer_text, self._style(
+            'footer', fontSize=8, textColor=colors.grey, alignment=TA_CENTER
         )))
         
+        self._report_build_progress(doc, progress_callback)
         doc.build(elements)
-        return filename
+        return output
     
-    def _create_company_header(self):
-        """Kreira header sa company info i logom"""
-        elements = []
+    def _header_data(self, settings, details):
+        """(redovi [(tekst, stil)], PNG loga ili None) za header; keširano po header_signature i fontu.
 
-        settings = self.db.get_settings()
-        company_name = settings.get('company_name', '')
-        company_address = settings.get('company_address', '')
-        company_pib = settings.get('company_pib', '')
-        company_bank_account = settings.get('company_bank_account', '')
-        logo_path = settings.get('logo_path', '')
+        Menja se samo kad se promene podešavanja firme ili fajl loga (mtime).
+        """
+        signature = header_signature(settings)
+        key = (self.font_name, self.font_name_bold, details)
+        with _registry_lock:
+            cached = _header_cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
 
-        if company_name or company_address:
-            logo_image = None
-            if logo_path and os.path.exists(logo_path):
-                try:
-                    from reportlab.platypus import Image
-                    logo_image = Image(logo_path, width=2*cm, height=2*cm)
-                except Exception as e:
-                    print(f"Greška pri učitavanju loga: {e}")
-                    logo_image = None
+        company_name = signature['company_name'] or ''
+        company_address = (signature['company_address'] or '') if details else ''
+        company_pib = (signature['company_pib'] or '') if details else ''
+        company_bank_account = (signature['company_bank_account'] or '') if details else ''
 
-            company_info_lines = []
+        lines = []
+        if company_name or company_address:
             if company_name:
-                company_info_lines.append(Paragraph(f"<b>{company_name}</b>",
-                    ParagraphStyle('company', fontName=self._get_font(bold=True), fontSize=12, leading=14)))
+                lines.append((f"<b>{company_name}</b>", self._style('company', bold=True, fontSize=12, leading=14)))
             if company_address:
-                company_info_lines.append(Paragraph(company_address,
-                    ParagraphStyle('address', fontName=self._get_font(), fontSize=9, leading=11)))
+                lines.append((company_address, self._style('address', fontSize=9, leading=11)))
             if company_pib:
-                company_info_lines.append(Paragraph(f"PIB: {company_pib}",
-                    ParagraphStyle('pib', fontName=self._get_font(), fontSize=9, leading=11)))
+                lines.append((f"PIB: {company_pib}", self._style('pib', fontSize=9, leading=11)))
             if company_bank_account:
-                company_info_lines.append(Paragraph(f"Broj računa: {company_bank_account}",
-                    ParagraphStyle('bank', fontName=self._get_font(), fontSize=9, leading=11)))
+                lines.append((f"Broj računa: {company_bank_account}", self._style('bank', fontSize=9, leading=11)))
+        logo_bytes = get_logo_bytes(signature['logo_path']) if lines and signature['logo_path'] else None
 
-            if logo_image:
-                header_table = Table([[company_info_lines, logo_image]], colWidths=[14*cm, 3*cm])
-            else:
-                header_table = Table([[company_info_lines, '']], colWidths=[14*cm, 3*cm])
+        data = (lines, logo_bytes)
+        with _registry_lock:
+            # Po fontu i vrsti header-a čuva se samo aktuelna verzija
+            _header_cache[key] = (signature, data)
+        return data
 
-            header_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-            ]))
+    def _create_company_header(self, settings=None, details=True):
+        """Kreira header sa podacima firme i logom.
 
-            elements.append(header_table)
-            elements.append(Spacer(1, 0.5*cm))
+        details=False daje samo naziv firme i logo (npr. za narudžbine).
+        Redovi sa stilovima i logo dolaze iz _header_data (keš); ovde se prave
+        samo novi flowable-i, jer ih reportlab menja pri raspoređivanju.
+        """
+        elements = []
+
+        if settings is None:
+            settings = self.db.get_settings()
+        lines, logo_bytes = self._header_data(settings, details)
+        if not lines:
+            return elements
+
+        logo_image = ''
+        if logo_bytes:
+            logo_image = Image(io.BytesIO(logo_bytes), width=LOGO_SIZE, height=LOGO_SIZE)
+        company_info_lines = [Paragraph(text, style) for text, style in lines]
 
+        header_table = Table([[company_info_lines, logo_image]], colWidths=[14*cm, 3*cm])
+        header_table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+        ]))
+
+        elements.append(header_table)
+        elements.append(Spacer(1, 0.5*cm))
         return elements
 
     # ==================== NARUDŽBINE ====================
-    def generate_order_pdf(self, order_id):
+    def generate_order_pdf(self, order_id, output_dir=None, progress_callback=None):
         """Generiše PDF narudžbine - informativna verzija bez vendor detalja"""
 
         # Učitaj podatke
-        order = self.db.get_order_by_id(order_id)
-        if not order:
+        document = self.db.load_order_document(order_id)
+        if not document:
             print("⚠️ Narudžbina nije pronađena!")
             return None
+        return self._save_document('order', document, output_dir, progress_callback)
 
-        items = self.db.get_order_items(order_id)
-
-        # Kreiraj PDF filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"narudzbenica_{order['order_number']}_{timestamp}.pdf"
+    def render_order_pdf(self, document, output, progress_callback=None):
+        """PDF narudžbine samo iz učitanog dokumenta (Database.load_order_document); output i progress_callback kao kod render_proforma_pdf"""
+        order = document['order']
+        items = document['items']
 
-        doc = SimpleDocTemplate(filename, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
+        doc = SimpleDocTemplate(output, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
         elements = []
 
         title_style, heading_style, normal_style = self._get_styles()
 
         # ===== 1. HEADER - samo naziv firme i logo (bez PIB i broja računa) =====
-        settings = self.db.get_settings()
-        company_name = settings.get('company_name', '')
-        logo_path = settings.get('logo_path', '')
-
-        if company_name:
-            logo_image = None
-            if logo_path and os.path.exists(logo_path):
-                try:
-                    from reportlab.platypus import Image
-                    logo_image = Image(logo_path, width=2*cm, height=2*cm)
-                except Exception as e:
-                    print(f"Greška pri učitavanju loga: {e}")
-                    logo_image = None
-
-            company_info_lines = []
-            company_info_lines.append(Paragraph(f"<b>{company_name}</b>",
-                ParagraphStyle('company', fontName=self._get_font(bold=True), fontSize=12, leading=14)))
-
-            if logo_image:
-                header_table = Table([[company_info_lines, logo_image]], colWidths=[14*cm, 3*cm])
-            else:
-                header_table = Table([[company_info_lines, '']], colWidths=[14*cm, 3*cm])
-
-            header_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-            ]))
-
-            elements.append(header_table)
-            elements.append(Spacer(1, 0.5*cm))
+        elements.extend(self._create_company_header(document['settings'], details=False))
 
         # ===== 2. NASLOV =====
         elements.append(Paragraph(f"NARUDŽBINA BR. {order['order_number']}", title_style))
@@ -877,10 +1081,13 @@ class PDFGenerator:
         elements.append(item_table)
 
         # Build PDF
+        self._report_build_progress(doc, progress_callback)
         try:
             doc.build(elements)
-            print(f"✓ PDF narudžbine kreiran: {filename}")
-            return filename
+            print(f"✓ PDF narudžbine kreiran: {order['order_number']}")
+            return output
+        except RenderCancelled:
+            raise
         except Exception as e:
             print(f"✗ Greška pri kreiranju PDF-a: {e}")
             import traceback
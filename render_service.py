@@ -0,0 +1,122 @@
+# render_service.py – generisanje PDF dokumenata van Tk niti
+import queue
+import threading
+
+
+class RenderCancelled(Exception):
+    """Generisanje dokumenta je otkazano."""
+
+
+class RenderJob:
+    """Jedan posao za RenderService.
+
+    func(progress) radi u pozadinskoj niti; progress je report_progress ovog posla
+    i prosleđuje se generatorima kao progress_callback.
+    """
+
+    def __init__(self, func, on_done, on_error=None, on_progress=None):
+        self.func = func
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.progress = (0, None)
+        self._reported = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report_progress(self, done, total=None):
+        # Poziva se iz pozadinske niti; izuzetak prekida build reportlab-a
+        if self.cancelled:
+            raise RenderCancelled()
+        self.progress = (done, total)
+
+
+class RenderService:
+    """Jedna pozadinska nit koja redom generiše dokumente.
+
+    Tk se ne sme dirati iz druge niti, pa se rezultati i napredak preuzimaju
+    periodičnim root.after pozivom i svi callback-ovi se izvršavaju u Tk niti.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, name="RenderService"):
+        self.name = name
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        # Sledeća polja koristi samo Tk nit
+        self._active = []
+        self._polling = False
+
+    def submit(self, widget, func, on_done, on_error=None, on_progress=None):
+        """Pokreće func(progress) u pozadini; on_done(rezultat) se zove u Tk niti."""
+        job = RenderJob(func, on_done, on_error, on_progress)
+        self._ensure_worker()
+        self._active.append(job)
+        self._jobs.put(job)
+
+        if not self._polling:
+            self._polling = True
+            root = widget.nametowidget('.')
+            root.after(self.POLL_MS, self._poll, root)
+        return job
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            result, error = None, None
+            if job.cancelled:
+                error = RenderCancelled()
+            else:
+                try:
+                    result = job.func(job.report_progress)
+                except Exception as e:
+                    error = e
+            self._results.put((job, result, error))
+
+    def _poll(self, root):
+        while True:
+            try:
+                job, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._active.remove(job)
+            self._finish(job, result, error)
+
+        for job in self._active:
+            if job.on_progress and job.progress != job._reported:
+                job._reported = job.progress
+                job.on_progress(*job.progress)
+
+        if self._active:
+            root.after(self.POLL_MS, self._poll, root)
+        else:
+            self._polling = False
+
+    def _finish(self, job, result, error):
+        if job.cancelled or isinstance(error, RenderCancelled):
+            return
+        if error is not None:
+            if job.on_error:
+                job.on_error(error)
+            else:
+                print(f"✗ Greška u pozadinskom generisanju: {error}")
+            return
+        job.on_done(result)
+
+
+render_service = RenderService()
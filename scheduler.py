@@ -0,0 +1,216 @@
+# scheduler.py – jedan planer za periodične poslove (email, backup, održavanje...)
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def daily_at(time_key, default='09:00', enabled_key=None):
+    """Raspored 'jednom dnevno u HH:MM' (vreme iz podešavanja time_key).
+
+    Ako je posao danas već urađen, sledeće pokretanje je sutra; ako je vreme
+    prošlo a posao nije urađen, pokreće se odmah. enabled_key isključuje posao.
+    """
+    def schedule(settings, last_run, now):
+        if enabled_key and not settings.get(enabled_key, False):
+            return None
+        try:
+            hour, minute = [int(part) for part in str(settings.get(time_key) or default).split(':')]
+        except ValueError:
+            hour, minute = [int(part) for part in default.split(':')]
+        day = now.date()
+        if last_run and last_run.date() >= day:
+            day = last_run.date() + timedelta(days=1)
+        return datetime(day.year, day.month, day.day, hour, minute)
+    return schedule
+
+
+def monthly(day=1, at='07:00'):
+    """Raspored 'jednom mesečno, zadatog dana u HH:MM'"""
+    hour, minute = [int(part) for part in at.split(':')]
+
+    def schedule(settings, last_run, now):
+        run = datetime(now.year, now.month, day, hour, minute)
+        if last_run and last_run >= run:
+            year, month = (now.year + 1, 1) if now.month == 12 else (now.year, now.month + 1)
+            run = datetime(year, month, day, hour, minute)
+        return run
+    return schedule
+
+
+def every(interval, first_delay=timedelta(minutes=5)):
+    """Raspored 'na svakih interval' (timedelta); prvi put first_delay posle pokretanja."""
+    first_run = []  # računa se jednom, da ga ponovni raspored (wake) ne pomera
+
+    def schedule(settings, last_run, now):
+        if last_run:
+            return last_run + interval
+        if not first_run:
+            first_run.append(now + first_delay)
+        return first_run[0]
+    return schedule
+
+
+class Job:
+    def __init__(self, name, func, schedule, legacy_last_run=None):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.legacy_last_run = legacy_last_run
+        self.next_run = None
+        self.last_run = None
+        self.retry_at = None
+        self.status = 'čeka'
+        self.last_error = None
+        self.saved_state = None  # poslednje stanje upisano u tabelu jobs
+
+
+class JobScheduler:
+    """Pokreće registrovane poslove u jednoj pozadinskoj niti.
+
+    Poslovi su u heap-u po vremenu sledećeg pokretanja i nit spava tačno do
+    prvog. Promena podešavanja (wake) budi nit preko Condition-a i ponovo
+    računa raspored. Stanje (next_run, last_run, status) se čuva u tabeli jobs,
+    pa posao koji je propušten dok program nije radio kreće odmah po pokretanju.
+    db u start() treba da bude konekcija samo za planer (Database.worker_connection),
+    jer planer i poslovi upisuju iz njegove niti.
+    """
+
+    RETRY_DELAY = timedelta(minutes=15)
+
+    def __init__(self):
+        self.db = None
+        self._jobs = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._dirty = True
+        self._running = False
+        self._thread = None
+
+    def register(self, name, func, schedule, legacy_last_run=None):
+        """func() radi posao (izuzetak = neuspeh, ponavlja se za RETRY_DELAY); schedule vidi daily_at/monthly/every.
+
+        legacy_last_run(settings) vraća poslednje pokretanje zapamćeno pre planera
+        (datetime ili None); koristi se samo dok tabela jobs nema red za posao.
+        """
+        with self._cond:
+            self._jobs[name] = Job(name, func, schedule, legacy_last_run)
+            self._dirty = True
+            self._cond.notify()
+
+    def start(self, db):
+        with self._cond:
+            if self._running:
+                return
+            self.db = db
+            states = db.get_jobs()
+            for name, state in states.items():
+                job = self._jobs.get(name)
+                if job and state['last_run']:
+                    job.last_run = datetime.strptime(state['last_run'], DATETIME_FORMAT)
+            settings = db.get_settings()
+            for job in self._jobs.values():
+                if job.name not in states and job.legacy_last_run:
+                    job.last_run = job.legacy_last_run(settings)
+            self._running = True
+            self._dirty = True
+        self._thread = threading.Thread(target=self._loop, name="JobScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def wake(self):
+        """Ponovo izračunaj raspored (npr. posle promene podešavanja)"""
+        with self._cond:
+            self._dirty = True
+            self._cond.notify()
+
+    def run_now(self, name):
+        """Pokreni posao odmah (van rasporeda)"""
+        with self._cond:
+            self._jobs[name].retry_at = datetime.now()
+            self._dirty = True
+            self._cond.notify()
+
+    def jobs(self):
+        """Stanje poslova za prikaz: lista dict-ova"""
+        with self._cond:
+            return [{'name': job.name, 'next_run': job.next_run, 'last_run': job.last_run,
+                     'status': job.status, 'last_error': job.last_error}
+                    for job in self._jobs.values()]
+
+    def _reschedule(self):
+        # Poziva se pod self._cond
+        self._dirty = False
+        settings = self.db.get_settings()
+        now = datetime.now()
+        self._heap = []
+        for job in self._jobs.values():
+            job.next_run = job.retry_at or job.schedule(settings, job.last_run, now)
+            if job.next_run is None:
+                job.status = 'isključen'
+            else:
+                if job.status == 'isključen':
+                    job.status = 'čeka'
+                heapq.heappush(self._heap, (job.next_run, next(self._counter), job.name))
+            self._save(job)
+
+    def _save(self, job):
+        state = (job.next_run, job.last_run, job.status, job.last_error)
+        if state == job.saved_state:
+            return  # npr. wake() posle promene podešavanja koja ne menja ovaj posao
+        job.saved_state = state
+        try:
+            self.db.save_job(job.name, job.next_run, job.last_run, job.status, job.last_error)
+        except Exception as e:
+            print(f"Greška pri čuvanju stanja posla '{job.name}': {e}")
+
+    def _next_due_job(self):
+        # Čeka pod self._cond dok neki posao ne dođe na red ili dok se planer ne zaustavi
+        while self._running:
+            if self._dirty:
+                self._reschedule()
+            if not self._heap:
+                self._cond.wait()
+                continue
+            run_at = self._heap[0][0]
+            delay = (run_at - datetime.now()).total_seconds()
+            if delay <= 0:
+                return self._jobs[heapq.heappop(self._heap)[2]]
+            self._cond.wait(delay)
+        return None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                job = self._next_due_job()
+                if job is None:
+                    return
+                job.status = 'radi'
+
+            started = datetime.now()
+            try:
+                job.func()
+            except Exception as e:
+                print(f"✗ Posao '{job.name}' nije uspeo: {e}")
+                with self._cond:
+                    job.status = 'greška'
+                    job.last_error = str(e)
+                    job.retry_at = datetime.now() + self.RETRY_DELAY
+                    self._dirty = True
+            else:
+                with self._cond:
+                    job.status = 'ok'
+                    job.last_error = None
+                    job.last_run = started
+                    job.retry_at = None
+                    self._dirty = True
+
+
+job_scheduler = JobScheduler()
@@ -0,0 +1,144 @@
+# single_instance.py – samo jedan pokrenut program: lock fajl + lokalni socket za komande novog pokretanja
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+
+LOCK_FILE = 'invoices.db.lock'
+PORT_FILE = 'invoices.db.instance'
+TIMEOUT = 3
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _lock(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def parse_command(argv):
+    """Komanda iz komandne linije: --open proforma|order BROJ -> ['open', vrsta, broj], inače ['show']"""
+    if '--open' in argv:
+        position = argv.index('--open')
+        arguments = argv[position + 1:position + 3]
+        if len(arguments) == 2:
+            return ['open'] + arguments
+    return ['show']
+
+
+class SingleInstance:
+    """Zaključavanje lock fajla određuje prvo pokretanje; ono sluša komande na lokalnom socket-u.
+
+    Zaključavanje (msvcrt/fcntl) oslobađa operativni sistem i kad program padne,
+    pa zaostali fajlovi ne smetaju. Port i tajni token se upisuju u PORT_FILE;
+    novo pokretanje ga čita i preko send_command šalje komandu (npr. ['show']
+    ili ['open', 'proforma', '12']) umesto da otvori drugu konekciju na bazu,
+    drugi planer i drugu tray ikonu.
+    """
+
+    def __init__(self, lock_path=LOCK_FILE, port_path=PORT_FILE):
+        self.lock_path = lock_path
+        self.port_path = port_path
+        self._lock_file = None
+        self._server = None
+        self._token = None
+
+    def acquire(self):
+        """True ako je ovo jedino pokretanje (lock je zauzet do release ili kraja procesa)"""
+        lock_file = open(self.lock_path, 'a+')
+        try:
+            _lock(lock_file)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def serve(self, on_command):
+        """Sluša komande novih pokretanja; on_command(komanda) se poziva iz niti servera"""
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind(('127.0.0.1', 0))
+        self._server.listen(5)
+        self._token = secrets.token_hex(16)
+
+        info = {'pid': os.getpid(), 'port': self._server.getsockname()[1], 'token': self._token}
+        temp_path = self.port_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as port_file:
+            json.dump(info, port_file)
+        os.replace(temp_path, self.port_path)
+
+        threading.Thread(target=self._accept_loop, args=(self._server, on_command),
+                         name="SingleInstance", daemon=True).start()
+
+    def _accept_loop(self, server, on_command):
+        while True:
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return  # release() je zatvorio socket
+            with connection:
+                try:
+                    connection.settimeout(TIMEOUT)
+                    message = json.loads(connection.makefile('rb').readline())
+                    command = message['command']
+                    if not secrets.compare_digest(str(message.get('token')), self._token):
+                        connection.sendall(b'odbijeno\n')
+                        continue
+                    if not (isinstance(command, list) and command and all(isinstance(part, str) for part in command)):
+                        connection.sendall(b'nepoznata komanda\n')
+                        continue
+                    connection.sendall(b'ok\n')
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    print(f"Greška pri prijemu komande: {e}")
+                    continue
+            on_command(command)
+
+    def release(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.remove(self.port_path)
+            except OSError:
+                pass
+        if self._lock_file is not None:
+            try:
+                _unlock(self._lock_file)
+            except OSError:
+                pass
+            self._lock_file.close()
+            self._lock_file = None
+
+
+def send_command(command, port_path=PORT_FILE, wait=10):
+    """Šalje komandu pokrenutom programu; čeka do wait sekundi ako se on tek pokreće.
+
+    Vraća True ako je komanda primljena.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            with open(port_path, encoding='utf-8') as port_file:
+                info = json.load(port_file)
+            with socket.create_connection(('127.0.0.1', info['port']), timeout=TIMEOUT) as connection:
+                connection.sendall(json.dumps({'token': info['token'], 'command': command}).encode('utf-8') + b'\n')
+                return connection.makefile('rb').readline().strip() == b'ok'
+        except (OSError, ValueError, KeyError):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.2)
@@ -0,0 +1,204 @@
+# startup_profile.py – merenje pokretanja programa (--profile): faze, uvoz modula, opciono cProfile
+import atexit
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PROFILE_DIR = 'profil'
+TOP_IMPORTS = 30
+TOP_FUNCTIONS = 40
+
+
+class _TimedLoader:
+    """Omotač loader-a koji meri izvršavanje modula (kao -X importtime: self i ukupno)"""
+
+    def __init__(self, loader, name, profiler):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = self._profiler._import_stack()
+        depth = len(stack)
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += total
+            self._profiler._record_import(self._name, total - children, total, depth)
+
+
+class _ImportTimer:
+    """Finder na početku sys.meta_path: pronalazak prepušta ostalima, a loader-e omotava"""
+
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader, name, self._profiler)
+            return spec
+        return None
+
+
+class StartupProfiler:
+    """Beleži trajanje faza pokretanja i uvoza modula; izveštaj se upisuje pri izlasku.
+
+    Isključen je dok se ne pozove start() (main.py to radi za --profile), pa su
+    phase() i mark() tada bez troška. Faze se mogu beležiti iz bilo koje niti.
+    Uvoz modula se meri od start(); moduli učitani ranije se ne vide.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started_at = None
+        self._t0 = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._phases = []
+        self._imports = []
+        self._finder = None
+        self._cprofile = None
+        self._reported = False
+
+    def start(self, cprofile=False):
+        """Uključuje merenje; cprofile=True dodatno pokreće cProfile za glavnu nit"""
+        if self.enabled:
+            return
+        self.enabled = True
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._finder = _ImportTimer(self)
+        sys.meta_path.insert(0, self._finder)
+        if cprofile:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        atexit.register(self.write_report)
+
+    def start_from_argv(self, argv):
+        """--profile uključuje merenje, --profile-cprofile i cProfile (.pstats u folderu profil/)"""
+        cprofile = '--profile-cprofile' in argv
+        if cprofile or '--profile' in argv:
+            self.start(cprofile=cprofile)
+
+    def phase(self, name):
+        """Context manager koji beleži trajanje faze name"""
+        if not self.enabled:
+            return nullcontext()
+        return self._phase(name)
+
+    @contextmanager
+    def _phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_phase(name, started, time.perf_counter() - started)
+
+    def mark(self, name):
+        """Beleži trenutak (npr. 'prozor prikazan') bez trajanja"""
+        if self.enabled:
+            self._add_phase(name, time.perf_counter(), None)
+
+    def _add_phase(self, name, started, duration):
+        with self._lock:
+            self._phases.append((started - self._t0, duration, name, threading.current_thread().name))
+
+    def _import_stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record_import(self, name, self_time, total, depth):
+        with self._lock:
+            self._imports.append((name, self_time, total, depth))
+
+    def stop(self):
+        if self._finder is not None and self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def write_report(self, directory=PROFILE_DIR):
+        """Zaustavlja merenje i upisuje izveštaj (i .pstats za cProfile); vraća putanju izveštaja"""
+        if not self.enabled or self._reported:
+            return None
+        self._reported = True
+        self.stop()
+
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"pokretanje_{self.started_at.strftime('%Y%m%d_%H%M%S')}")
+        stats_path = None
+        if self._cprofile is not None:
+            stats_path = base + '.pstats'
+            self._cprofile.dump_stats(stats_path)
+
+        path = base + '.txt'
+        with open(path, 'w', encoding='utf-8') as report:
+            report.write(self.format_report(stats_path))
+        print(f"✓ Izveštaj o pokretanju: {path}")
+        return path
+
+    def format_report(self, stats_path=None):
+        """Izveštaj kao tekst: faze po vremenu početka, najskuplji uvozi, cProfile"""
+        with self._lock:
+            phases = sorted(self._phases)
+            imports = list(self._imports)
+
+        lines = [
+            f"Pokretanje: {self.started_at.strftime('%d.%m.%Y %H:%M:%S')}",
+            f"Python {sys.version.split()[0]} ({sys.platform}), "
+            f"{'exe' if getattr(sys, 'frozen', False) else 'skripta'}",
+            f"Trajanje merenja: {(time.perf_counter() - self._t0) * 1000:.0f} ms",
+            "",
+            "FAZE [ms od početka]",
+            f"{'početak':>9} {'trajanje':>9}  faza (nit)",
+        ]
+        for offset, duration, name, thread in phases:
+            duration_text = f"{duration * 1000:9.1f}" if duration is not None else f"{'-':>9}"
+            thread_text = '' if thread == 'MainThread' else f" ({thread})"
+            lines.append(f"{offset * 1000:9.1f} {duration_text}  {name}{thread_text}")
+
+        top_level = [item for item in imports if item[3] == 0]
+        lines += [
+            "",
+            f"UVOZ MODULA: {len(imports)} modula, ukupno "
+            f"{sum(item[2] for item in top_level) * 1000:.1f} ms",
+            f"{'self':>9} {'ukupno':>9}  modul (najskupljih {TOP_IMPORTS}, po ukupnom vremenu)",
+        ]
+        for name, self_time, total, _depth in sorted(imports, key=lambda item: item[2], reverse=True)[:TOP_IMPORTS]:
+            lines.append(f"{self_time * 1000:9.1f} {total * 1000:9.1f}  {name}")
+
+        if stats_path:
+            import io
+            import pstats
+            stream = io.StringIO()
+            stats = pstats.Stats(stats_path, stream=stream)
+            stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            lines += ["", f"CPROFILE (glavna nit, {stats_path})", stream.getvalue().strip()]
+
+        return "\n".join(lines) + "\n"
+
+
+profiler = StartupProfiler()
@@ -0,0 +1,362 @@
+# table_export.py – izvoz lista (računi, predračuni, komunalije, promet, narudžbine, šifarnici) u CSV/XLSX
+import csv
+import os
+import re
+import sqlite3
+import time
+import zipfile
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+from database import date_key
+
+FORMATS = ('csv', 'xlsx')
+CSV_DELIMITER = ';'
+FETCH_ROWS = 5000
+
+# Minimalni XLSX paket (jedan list); sadržaj lista se upisuje red po red
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_SHEET_END = '</sheetData></worksheet>'
+
+# Kontrolni znakovi koji nisu dozvoljeni u XML-u
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _last_date(column):
+    """MAX datuma 'dd.mm.yyyy' kolone, vraćen u istom formatu (za GROUP BY)"""
+    key = f"MAX({date_key(column)})"
+    return f"substr({key}, 7, 2) || '.' || substr({key}, 5, 2) || '.' || substr({key}, 1, 4)"
+
+
+def _contains(*columns):
+    """Uslov 'tekst se nalazi u bar jednoj koloni', bez obzira na velika/mala slova (i č, ć, ž...)"""
+    return '(' + ' OR '.join(f"instr(py_lower(COALESCE({column}, '')), ?) > 0" for column in columns) + ')'
+
+
+def _status_case(total, paid):
+    return f'''CASE
+                   WHEN {paid} = 0 THEN 'Neplaćeno'
+                   WHEN {paid} >= {total} THEN 'Plaćeno'
+                   ELSE 'Delimično'
+               END'''
+
+
+def _invoices_query(filters):
+    paid = 'COALESCE(p.total_paid, 0)'
+    where, params = [], []
+
+    status = filters.get('status')
+    if status:
+        where.append('payment_status = ?')
+        params.append(status)
+    due_within = filters.get('due_within')
+    if due_within is not None:
+        # Isto kao Database.get_due_invoices: neplaćeni i delimično plaćeni kojima valuta ističe
+        today = datetime.now().date()
+        where.append(f"is_paid = 0 AND remaining > 0 AND {date_key('due_date')} BETWEEN ? AND ?")
+        params += [today.strftime('%Y%m%d'), (today + timedelta(days=int(due_within))).strftime('%Y%m%d')]
+    search = filters.get('search')
+    if search:
+        search_field = filters.get('search_field')
+        where.append(_contains(search_field if search_field in ('delivery_note_number', 'vendor_name') else 'delivery_note_number'))
+        params.append(search.lower())
+
+    order = {
+        'due_date': date_key('due_date'),
+        'invoice_date': date_key('invoice_date'),
+        'vendor_name': "COALESCE(vendor_name, '')",
+        'amount': 'amount',
+    }[filters.get('order') or 'due_date']
+
+    query = f'''
+        SELECT invoice_date, due_date, vendor_name, delivery_note_number, amount,
+               total_paid, remaining, payment_status, last_payment_date, notes
+        FROM (
+            SELECT i.*,
+                   {paid} AS total_paid,
+                   i.amount - {paid} AS remaining,
+                   {_status_case('i.amount', paid)} AS payment_status,
+                   p.last_payment_date
+            FROM invoices i
+            LEFT JOIN (
+                SELECT invoice_id, SUM(payment_amount) AS total_paid, {_last_date('payment_date')} AS last_payment_date
+                FROM payments
+                GROUP BY invoice_id
+            ) p ON p.invoice_id = i.id
+            WHERE i.is_archived = 0
+        )
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY {order}
+    '''
+    return query, params
+
+
+def _proformas_query(filters):
+    paid = 'COALESCE(pp.total_paid, 0)'
+    where, params = [], []
+
+    status = filters.get('status')
+    if status:
+        where.append('status = ?')
+        params.append(status)
+    search = filters.get('search')
+    if search:
+        where.append(_contains('customer_name', 'proforma_number'))
+        params += [search.lower()] * 2
+
+    query = f'''
+        SELECT proforma_number, invoice_date, customer_name, total_amount,
+               total_paid, remaining, status, last_payment_date, notes
+        FROM (
+            SELECT pi.*,
+                   {paid} AS total_paid,
+                   pi.total_amount - {paid} AS remaining,
+                   {_status_case('pi.total_amount', paid)} AS status,
+                   pp.last_payment_date
+            FROM proforma_invoices pi
+            LEFT JOIN (
+                SELECT proforma_id, SUM(payment_amount) AS total_paid, {_last_date('payment_date')} AS last_payment_date
+                FROM proforma_payments
+                GROUP BY proforma_id
+            ) pp ON pp.proforma_id = pi.id
+            WHERE pi.is_archived = 0
+        )
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY {date_key('invoice_date')} DESC
+    '''
+    return query, params
+
+
+def _utility_bills_query(filters):
+    where, params = ['is_archived = 0'], []
+    if filters.get('status'):
+        where.append('payment_status = ?')
+        params.append(filters['status'])
+    if filters.get('type'):
+        where.append('utility_type_name = ?')
+        params.append(filters['type'])
+    if filters.get('month'):
+        where.append('substr(bill_date, 4, 2) = ?')
+        params.append(filters['month'])
+    if filters.get('year'):
+        where.append('substr(bill_date, 7, 4) = ?')
+        params.append(filters['year'])
+
+    query = f'''
+        SELECT bill_date, entry_date, utility_type_name, amount, paid_amount,
+               paid_amount - amount AS difference, payment_status, payment_date, notes
+        FROM utility_bills
+        WHERE {' AND '.join(where)}
+        ORDER BY {date_key('bill_date')} DESC
+    '''
+    return query, params
+
+
+def _revenue_query(filters):
+    where, params = [], []
+    if filters.get('date_from') and filters.get('date_to'):
+        where.append(f"{date_key('date_from')} BETWEEN ? AND ?")
+        params += [filters['date_from'].strftime('%Y%m%d'), filters['date_to'].strftime('%Y%m%d')]
+
+    query = f'''
+        SELECT date_from, cash, card, wire, checks, amount,
+               COALESCE(payment_status, 'Neplaćeno'), notes
+        FROM revenue_entries
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY {date_key('date_from')} DESC
+    '''
+    return query, params
+
+
+def _orders_query(filters):
+    where, params = ['o.is_archived = 0'], []
+    search = filters.get('search')
+    if search:
+        where.append(_contains('o.order_number', 'o.vendor_name', 'o.notes'))
+        params += [search.lower()] * 3
+
+    query = f'''
+        SELECT o.order_number, o.order_date, o.vendor_name,
+               (SELECT COUNT(*) FROM order_items oi WHERE oi.order_id = o.id),
+               o.notes
+        FROM orders o
+        WHERE {' AND '.join(where)}
+        ORDER BY {date_key('o.order_date')} DESC
+    '''
+    return query, params
+
+
+def _registry_query(table, columns):
+    def build(filters):
+        return f"SELECT {', '.join(columns)} FROM {table} ORDER BY name COLLATE NOCASE", []
+    return build
+
+
+# Vrsta liste -> (osnovno ime fajla, zaglavlje, funkcija koja od filtera pravi (upit, parametri))
+EXPORT_KINDS = {
+    'invoices': ('racuni',
+                 ('Datum fakture', 'Datum valute', 'Dobavljač', 'Br. otpremnice', 'Iznos', 'Plaćeno',
+                  'Preostalo', 'Status', 'Posl. uplata', 'Napomena'),
+                 _invoices_query),
+    'proformas': ('predracuni',
+                  ('Broj predračuna', 'Datum', 'Kupac', 'Ukupan iznos', 'Plaćeno', 'Preostalo',
+                   'Status', 'Posl. uplata', 'Napomena'),
+                  _proformas_query),
+    'utility_bills': ('komunalije',
+                      ('Datum računa', 'Datum unosa', 'Tip', 'Iznos', 'Plaćeno', 'Razlika',
+                       'Status', 'Datum plaćanja', 'Napomena'),
+                      _utility_bills_query),
+    'revenue': ('promet',
+                ('Datum', 'Gotovina (RSD)', 'Kartica (RSD)', 'Virman (RSD)', 'Čekovi (RSD)',
+                 'Ukupno (RSD)', 'Status', 'Napomena'),
+                _revenue_query),
+    'orders': ('narudzbine',
+               ('Broj narudžbine', 'Datum', 'Dobavljač', 'Broj stavki', 'Napomena'),
+               _orders_query),
+    'vendors': ('dobavljaci',
+                ('Šifra', 'Ime', 'Adresa', 'Mesto', 'PIB', 'Matični broj', 'Broj računa',
+                 'Kontakt osoba', 'Telefon', 'Email', 'Napomena'),
+                _registry_query('vendors', ('vendor_code', 'name', 'address', 'city', 'pib', 'registration_number',
+                                            'bank_account', 'contact_person', 'phone', 'email', 'notes'))),
+    'customers': ('kupci',
+                  ('Šifra', 'Ime', 'Telefon', 'PIB', 'Br. lične karte', 'Matični broj', 'Adresa', 'Mesto', 'Email',
+                   'Napomena'),
+                  _registry_query('customers', ('customer_code', 'name', 'phone', 'pib', 'id_card_number',
+                                                'registration_number', 'address', 'city', 'email', 'notes'))),
+    'articles': ('artikli',
+                 ('Šifra', 'Naziv', 'Jedinica mere', 'Cena', 'Popust %', 'Napomena'),
+                 _registry_query('articles', ('article_code', 'name', 'unit', 'price', 'discount', 'notes'))),
+}
+
+
+def _iter_rows(cursor, progress_callback):
+    """Redovi kursora u grupama od FETCH_ROWS, bez učitavanja cele liste u memoriju"""
+    done = 0
+    while True:
+        rows = cursor.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        yield from rows
+        done += len(rows)
+        if progress_callback:
+            progress_callback(done)
+
+
+def _write_csv(output, header, rows):
+    # utf-8-sig da Excel prepozna ćirilicu/latinicu sa kvačicama
+    with open(output, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, delimiter=CSV_DELIMITER)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value!r}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_XML_ILLEGAL.sub("", str(value)))}</t></is></c>'
+
+
+def _chain_header(header, rows):
+    yield header
+    yield from rows
+
+
+def _write_xlsx(output, header, rows, title):
+    """XLSX bez spoljnih paketa: list se piše direktno u zip, memorija ne raste sa brojem redova"""
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(name=escape(title)))
+        archive.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(XLSX_SHEET_START.encode('utf-8'))
+            for row in _chain_header(header, rows):
+                sheet.write(('<row>' + ''.join(map(_xlsx_cell, row)) + '</row>').encode('utf-8'))
+            sheet.write(XLSX_SHEET_END.encode('utf-8'))
+
+
+def export_table(db_path, kind, output, filters=None, progress_callback=None):
+    """Izvozi listu u CSV ili XLSX (po ekstenziji output-a) direktno iz SQL kursora.
+
+    filters su isti filteri kao u tabu (status, pretraga, period...), vidi
+    *_query funkcije. Koristi posebnu konekciju, pa može da radi u pozadinskoj niti.
+    progress_callback(broj_redova) se zove posle svake grupe od FETCH_ROWS redova.
+
+    Vraća dict sa output, rows i elapsed.
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Nepoznata vrsta liste: {kind}")
+    file_format = os.path.splitext(output)[1].lower().lstrip('.')
+    if file_format not in FORMATS:
+        raise ValueError(f"Nepodržan format izvoza: {file_format or output}")
+
+    name, header, build_query = EXPORT_KINDS[kind]
+    query, params = build_query(filters or {})
+
+    started = time.perf_counter()
+    counter = {'rows': 0}
+
+    def count(done):
+        counter['rows'] = done
+        if progress_callback:
+            progress_callback(done)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.create_function('py_lower', 1, str.lower, deterministic=True)
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = _iter_rows(cursor, count)
+        if file_format == 'csv':
+            _write_csv(output, header, rows)
+        else:
+            _write_xlsx(output, header, rows, name)
+    except BaseException:
+        # Ne ostavljaj nedovršen fajl (greška ili otkazivanje)
+        try:
+            os.remove(output)
+        except OSError:
+            pass
+        raise
+    finally:
+        conn.close()
+
+    return {'output': output, 'rows': counter['rows'], 'elapsed': time.perf_counter() - started}
+
+
+def default_output(kind, file_format):
+    """Podrazumevano ime fajla, npr. racuni_20260131_142500.csv"""
+    return f"{EXPORT_KINDS[kind][0]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_format}"
@@ -0,0 +1,173 @@
+# test_document_dispatch.py – slanje dokumenata preko SMTPTransport-a na lokalni SMTP server (bez mreže)
+import email
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from email import policy
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import document_dispatch  # noqa: E402
+from database import Database  # noqa: E402
+from notifications import SMTPTransport  # noqa: E402
+from pdf_cache import pdf_cache  # noqa: E402
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Najmanji SMTP server za testove: prima sve poruke i pamti ih u self.messages.
+
+    Broji istovremeno otvorene sesije (peak_sessions); data_delay usporava prijem
+    poruke, da bi se paralelne sesije preklopile.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, data_delay=0.0):
+        super().__init__(('127.0.0.1', 0), LocalSMTPHandler)
+        self.data_delay = data_delay
+        self.messages = []
+        self.sessions = 0
+        self.peak_sessions = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.sessions += 1
+            server.peak_sessions = max(server.peak_sessions, server.sessions)
+        try:
+            self.reply('220 localhost test SMTP')
+            envelope = {'from': None, 'to': []}
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode('ascii', 'replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+                if verb == 'EHLO':
+                    self.reply('250-localhost')
+                    self.reply('250 8BITMIME')
+                elif verb == 'HELO':
+                    self.reply('250 localhost')
+                elif verb == 'MAIL':
+                    envelope = {'from': command.split(':', 1)[1].strip(), 'to': []}
+                    self.reply('250 OK')
+                elif verb == 'RCPT':
+                    envelope['to'].append(command.split(':', 1)[1].strip().strip('<>'))
+                    self.reply('250 OK')
+                elif verb == 'DATA':
+                    self.reply('354 End data with <CR><LF>.<CR><LF>')
+                    lines = []
+                    while True:
+                        data_line = self.rfile.readline()
+                        if data_line in (b'.\r\n', b'.\n', b''):
+                            break
+                        lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                    time.sleep(server.data_delay)
+                    with server.lock:
+                        server.messages.append({'to': envelope['to'],
+                                                'message': email.message_from_bytes(b''.join(lines), policy=policy.default)})
+                    self.reply('250 OK')
+                elif verb in ('RSET', 'NOOP'):
+                    self.reply('250 OK')
+                elif verb == 'QUIT':
+                    self.reply('221 Bye')
+                    return
+                else:
+                    self.reply('502 Command not implemented')
+        finally:
+            with server.lock:
+                server.sessions -= 1
+
+
+class DocumentDispatchTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        cache_patch = mock.patch.object(pdf_cache, 'directory', os.path.join(self.temp_dir.name, 'pdf_dokumenti'))
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+        self.db = Database(os.path.join(self.temp_dir.name, 'dispatch.db'))
+        self.db.update_setting('company_name', 'Test firma')
+
+    def tearDown(self):
+        self.db.conn.close()
+        self.temp_dir.cleanup()
+
+    def start_server(self, data_delay=0.0):
+        server = LocalSMTPServer(data_delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def add_proforma(self, customer_email):
+        customer_id = self.db.add_customer(name=f"Kupac {customer_email or 'bez adrese'}", email=customer_email)
+        return self.db.add_proforma_invoice(
+            {'invoice_date': '01.02.2026', 'customer_id': customer_id, 'customer_name': 'Kupac', 'total_amount': 100},
+            [{'article_name': 'Šraf', 'article_code': 'A1', 'quantity': 2, 'price': 50, 'total': 100}],
+        )
+
+    def test_sends_pdf_and_records_each_document(self):
+        server = self.start_server()
+        with_email = self.add_proforma('kupac@example.com')
+        without_email = self.add_proforma('')
+        transport = SMTPTransport('127.0.0.1', server.port, security='none', from_address='firma@example.com',
+                                  max_connections=2, timeout=10)
+        self.addCleanup(transport.close)
+
+        result = document_dispatch.dispatch_documents(self.db, 'proforma', [with_email, without_email], transport)
+
+        self.assertEqual(result['sent'], [with_email])
+        self.assertEqual(result['skipped'], [without_email])
+        self.assertEqual(result['failed'], [])
+
+        dispatches = self.db.get_last_dispatches('proforma')
+        self.assertEqual(dispatches[with_email]['status'], document_dispatch.STATUS_SENT)
+        self.assertEqual(dispatches[with_email]['recipient'], 'kupac@example.com')
+        self.assertEqual(dispatches[without_email]['status'], document_dispatch.STATUS_NO_ADDRESS)
+        self.assertIsNone(dispatches[without_email]['recipient'])
+
+        self.assertEqual(len(server.messages), 1)
+        received = server.messages[0]
+        self.assertEqual(received['to'], ['kupac@example.com'])
+        self.assertIn('Test firma', received['message']['Subject'])
+        attachments = list(received['message'].iter_attachments())
+        self.assertEqual(len(attachments), 1)
+        self.assertEqual(attachments[0].get_content_type(), 'application/pdf')
+        self.assertTrue(attachments[0].get_filename().startswith('predracun_'))
+        self.assertTrue(attachments[0].get_content().startswith(b'%PDF'))
+
+    def test_concurrent_sends_stay_within_pool_size(self):
+        server = self.start_server(data_delay=0.2)
+        document_ids = [self.add_proforma(f"kupac{number}@example.com") for number in range(6)]
+        transport = SMTPTransport('127.0.0.1', server.port, security='none', from_address='firma@example.com',
+                                  max_connections=2, timeout=10)
+        self.addCleanup(transport.close)
+
+        with mock.patch.object(document_dispatch, 'ThreadPoolExecutor',
+                               wraps=document_dispatch.ThreadPoolExecutor) as executor:
+            result = document_dispatch.dispatch_documents(self.db, 'proforma', document_ids, transport)
+
+        self.assertEqual(sorted(result['sent']), sorted(document_ids))
+        self.assertEqual(executor.call_args.kwargs['max_workers'], transport.max_connections)
+        self.assertEqual(server.peak_sessions, transport.max_connections)
+        self.assertEqual(len(server.messages), len(document_ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# test_email_outbox.py – outbox od upisa do slanja, preko MemoryTransport umesto SMTP/Gmail-a
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import Database  # noqa: E402
+from email_outbox import EmailOutbox, MemoryTransport  # noqa: E402
+from scheduler import DATETIME_FORMAT  # noqa: E402
+
+
+class EmailOutboxTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.temp_dir.name, 'outbox.db'))
+
+    def tearDown(self):
+        self.db.conn.close()
+        self.temp_dir.cleanup()
+
+    def outbox_rows(self):
+        return [dict(row) for row in self.db.conn.execute('SELECT * FROM email_outbox ORDER BY id')]
+
+    def test_duplicate_dedup_key_is_rejected(self):
+        outbox = EmailOutbox(self.db, MemoryTransport())
+        self.assertTrue(outbox.enqueue('a@example.com', "Izveštaj", "<p>1</p>", dedup_key='dnevni:a'))
+        self.assertFalse(outbox.enqueue('a@example.com', "Izveštaj", "<p>2</p>", dedup_key='dnevni:a'))
+        self.assertEqual(len(self.outbox_rows()), 1)
+
+    def test_failed_send_backs_off_and_gives_up(self):
+        transport = MemoryTransport(fail_times=EmailOutbox.MAX_ATTEMPTS)
+        outbox = EmailOutbox(self.db, transport)
+        outbox.enqueue('a@example.com', "Obaveštenje", "<p>telo</p>")
+
+        now = datetime.now().replace(microsecond=0)
+        delays = []
+        for _ in range(EmailOutbox.MAX_ATTEMPTS):
+            self.assertEqual(outbox.flush(now), {'sent': 0, 'failed': 1})
+            next_attempt = datetime.strptime(self.outbox_rows()[0]['next_attempt'], DATETIME_FORMAT)
+            delays.append((next_attempt - now) / timedelta(minutes=1))
+            now = next_attempt
+
+        self.assertEqual(delays, [1, 2, 4, 8, 16, 32, 60, 60])
+        row = self.outbox_rows()[0]
+        self.assertEqual(row['status'], 'neuspelo')
+        self.assertEqual(row['attempts'], EmailOutbox.MAX_ATTEMPTS)
+        self.assertIsNone(self.db.get_next_email_attempt())
+        self.assertEqual(outbox.flush(now + timedelta(days=1)), {'sent': 0, 'failed': 0})
+        self.assertEqual(transport.sent, [])
+
+    def test_retry_after_failure_sends(self):
+        transport = MemoryTransport(fail_times=1)
+        outbox = EmailOutbox(self.db, transport)
+        outbox.enqueue('a@example.com', "Obaveštenje", "<p>telo</p>")
+
+        now = datetime.now().replace(microsecond=0)
+        self.assertEqual(outbox.flush(now), {'sent': 0, 'failed': 1})
+        self.assertEqual(outbox.flush(now), {'sent': 0, 'failed': 0})  # razmak još nije prošao
+        self.assertEqual(outbox.flush(now + EmailOutbox.BASE_DELAY), {'sent': 1, 'failed': 0})
+        self.assertEqual(self.outbox_rows()[0]['status'], 'poslato')
+        self.assertEqual(len(transport.sent), 1)
+
+    def test_same_digest_key_is_sent_as_one_email(self):
+        transport = MemoryTransport()
+        outbox = EmailOutbox(self.db, transport)
+        outbox.enqueue('a@example.com', "Dospeće", "<p>prvi</p>", digest_key='dospece')
+        outbox.enqueue('a@example.com', "Dospeće", "<p>drugi</p>", digest_key='dospece')
+        outbox.enqueue('a@example.com', "Drugo", "<p>posebno</p>")
+        outbox.enqueue('b@example.com', "Dospeće", "<p>treći</p>", digest_key='dospece')
+
+        result = outbox.flush(datetime.now() + timedelta(seconds=1))
+
+        self.assertEqual(result, {'sent': 3, 'failed': 0})
+        combined = [message for message in transport.sent
+                    if message['recipient'] == 'a@example.com' and message['subject'] == "Dospeće"]
+        self.assertEqual(len(combined), 1)
+        self.assertIn("<p>prvi</p>", combined[0]['html_body'])
+        self.assertIn("<p>drugi</p>", combined[0]['html_body'])
+        self.assertEqual({row['status'] for row in self.outbox_rows()}, {'poslato'})
+
+
+if __name__ == '__main__':
+    unittest.main()
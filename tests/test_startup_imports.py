@@ -0,0 +1,44 @@
+# test_startup_imports.py – pokretanje programa ne sme da učita teške pakete (vidi lazy_imports.py)
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Paketi koji se učitavaju tek pri prvoj upotrebi (PDF, Excel, Gmail, Windows notifikacije)
+LAZY_MODULES = (
+    'reportlab', 'pdf_generator', 'pandas', 'excel_import', 'pypdf',
+    'googleapiclient', 'google_auth_oauthlib', 'win10toast',
+)
+
+# Uvozi main u posebnom procesu; GUI paketi koji nisu instalirani (npr. bez Windows-a) se zamenjuju praznim modulima
+SCRIPT = """
+import json, sys, types
+for name in ('tkcalendar', 'pystray', 'PIL', 'PIL.Image', 'PIL.ImageDraw'):
+    try:
+        __import__(name)
+    except ImportError:
+        stub = types.ModuleType(name)
+        stub.DateEntry = stub.Icon = stub.Menu = stub.MenuItem = stub.Image = stub.ImageDraw = object
+        sys.modules[name] = stub
+import main
+print(json.dumps({'main': hasattr(main, 'MainApp'), 'loaded': sorted(set(sys.modules) & set(json.loads(sys.argv[1])))}))
+"""
+
+
+class StartupImportsTest(unittest.TestCase):
+    def test_heavy_modules_not_loaded_at_startup(self):
+        result = subprocess.run(
+            [sys.executable, '-c', SCRIPT, json.dumps(LAZY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, stdin=subprocess.DEVNULL, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertTrue(report['main'], result.stdout)
+        self.assertEqual(report['loaded'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()